@@ -0,0 +1,54 @@
+import os
+import zlib
+
+FONT = 'alligator'
+WIDTH = 120
+TEXTS = ['      L   O S', '            O C H O S', '                     L     O C O S']
+# Bump this if the cache file layout changes
+CACHE_VERSION = 1
+# Separates the banners in the cache file. It never shows up in figlet output
+SEPARATOR = '\f'
+
+
+# Where rendered banners are kept between runs. LOCOS_CACHE_DIR overrides the usual per-user cache directory
+def cache_dir():
+    if os.environ.get('LOCOS_CACHE_DIR'):
+        return os.environ['LOCOS_CACHE_DIR']
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'los-ochos-locos')
+
+
+# The cache file is named after everything that goes into the rendering, so changing the font, width, or text just
+# misses the cache instead of showing a stale banner
+def cache_path(font=FONT, width=WIDTH, texts=TEXTS):
+    key = repr((CACHE_VERSION, font, width, list(texts))).encode()
+    return os.path.join(cache_dir(), f'banner-{zlib.crc32(key):08x}.txt')
+
+
+# Render each of texts in a figlet font. Loading pyfiglet and the font is most of the game's start-up time, so it's
+# only done when there's no cached copy
+def render(font=FONT, width=WIDTH, texts=TEXTS):
+    path = cache_path(font, width, texts)
+    try:
+        with open(path, encoding='utf-8') as file:
+            banners = file.read().split(SEPARATOR)
+        if len(banners) == len(texts):
+            return banners
+    except (OSError, ValueError):
+        pass
+    from pyfiglet import Figlet
+    figlet = Figlet(font=font, width=width)
+    banners = [figlet.renderText(text) for text in texts]
+    # A cache that can't be written just means rendering again next time
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8', newline='') as file:
+            file.write(SEPARATOR.join(banners))
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+    return banners
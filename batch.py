@@ -0,0 +1,176 @@
+import numpy as np
+
+from card import EIGHTS, PLAYABLE, SUIT_MASKS, SUITS
+from engine import Engine, GameResult
+
+# Lookup tables as numpy arrays. Hands are uint64 card masks, exactly like Player.mask
+PLAYABLE_NP = np.array(PLAYABLE, dtype=np.uint64)
+NOT_EIGHTS = np.uint64(((1 << 52) - 1) & ~EIGHTS)
+# AIPlayer.choose_suit breaks ties in 'cdhs' order, so keep the suit masks in that order too
+CHOICE_SUITS = 'cdhs'
+CHOICE_MASKS = [np.uint64(SUIT_MASKS[suit]) for suit in CHOICE_SUITS]
+# Code of the eight of each suit, in CHOICE_SUITS order, for the top card after an eight is played
+CHOICE_CODES = np.array([28 + SUITS.index(suit) for suit in CHOICE_SUITS], dtype=np.int64)
+
+ONE = np.uint64(1)
+M1 = np.uint64(0x5555555555555555)
+M2 = np.uint64(0x3333333333333333)
+M4 = np.uint64(0x0f0f0f0f0f0f0f0f)
+H01 = np.uint64(0x0101010101010101)
+
+
+# Number of set bits in each element of a uint64 array
+def popcount(x):
+    x = x - ((x >> ONE) & M1)
+    x = (x & M2) + ((x >> np.uint64(2)) & M2)
+    x = (x + (x >> np.uint64(4))) & M4
+    return ((x * H01) >> np.uint64(56)).astype(np.int64)
+
+
+# Index of the lowest set bit in each element of a nonzero uint64 array
+def lowest_bit(x):
+    low = x & (~x + ONE)
+    return np.log2(low.astype(np.float64)).astype(np.int64)
+
+
+# Plays a batch of all-AI games in lockstep, one turn at a time across every game that's still going. Follows the same
+# rules as Engine and the same policy as AIPlayer, and consumes each game's rng in the same order as Engine does, so a
+# game seeded the same way in both comes out the same
+class BatchSimulator:
+    def __init__(self, rngs, max_turns=Engine.MAX_TURNS):
+        self.rngs = rngs
+        self.generator = None
+        # Deal every game exactly like Deck.deal_hands does: 7 cards round-robin off the end of the shuffled deck, then
+        # one card face-up
+        order = np.empty((len(rngs), 52), dtype=np.int64)
+        for game, rng in enumerate(rngs):
+            deck = list(range(52))
+            rng.shuffle(deck)
+            order[game] = deck
+        self.setup(order, max_turns)
+
+    # Faster variant that deals and reshuffles every game from one numpy Generator. The games are statistically the same
+    # as Engine's, but can't be matched up one-to-one with it
+    @classmethod
+    def from_generator(cls, generator, size, max_turns=Engine.MAX_TURNS):
+        batch = cls.__new__(cls)
+        batch.rngs = None
+        batch.generator = generator
+        batch.setup(generator.permuted(np.tile(np.arange(52), (size, 1)), axis=1), max_turns)
+        return batch
+
+    # Deal from a (games x 52) array of shuffled card indices, with the top of each deck at the end like a Deck
+    def setup(self, order, max_turns):
+        self.max_turns = max_turns
+        size = len(order)
+        bits = ONE << order.astype(np.uint64)
+        self.hands = np.zeros((size, 4), dtype=np.uint64)
+        for seat in range(4):
+            self.hands[:, seat] = np.bitwise_or.reduce(bits[:, 27 - seat::4], axis=1)
+        # The draw pile is read from position draw_pos up to draw_len, so it's stored the other way round from a Deck
+        self.draw = np.zeros((size, 52), dtype=np.int64)
+        self.draw[:, :23] = order[:, 22::-1]
+        self.draw_pos = np.zeros(size, dtype=np.int64)
+        self.draw_len = np.full(size, 23, dtype=np.int64)
+        # The discard pile is stored oldest first, with the top card at discard_len - 1. top_code accounts for the suit
+        # declared on an eight
+        self.discard = np.zeros((size, 52), dtype=np.int64)
+        self.discard[:, 0] = order[:, 23]
+        self.discard_len = np.ones(size, dtype=np.int64)
+        self.top_code = order[:, 23].copy()
+        self.player_up = np.zeros(size, dtype=np.int64)
+        self.turns = np.zeros(size, dtype=np.int64)
+        self.cards_drawn = np.zeros(size, dtype=np.int64)
+        self.reshuffles = np.zeros(size, dtype=np.int64)
+        self.winner = np.full(size, -1, dtype=np.int64)
+        # Indices of the games that are still being played
+        self.active = np.arange(size)
+
+    # Shuffle the discard piles (sans the top card) of the given games into their draw piles
+    def reshuffle(self, games):
+        if self.rngs is not None:
+            for game in games.tolist():
+                # Shuffle the same list, in the same order, that Engine.reshuffle would, then flip it so the top comes
+                # first
+                cards = self.discard[game, :self.discard_len[game] - 1].tolist()
+                self.rngs[game].shuffle(cards)
+                self.draw[game, :len(cards)] = cards[::-1]
+        else:
+            # Sort random keys to shuffle every pile at once, pushing the slots past the end of each pile to the back
+            lengths = self.discard_len[games] - 1
+            keys = self.generator.random((games.size, 52))
+            keys[np.arange(52) >= lengths[:, None]] = 2
+            self.draw[games] = np.take_along_axis(self.discard[games], np.argsort(keys, axis=1), axis=1)
+        self.draw_pos[games] = 0
+        self.draw_len[games] = self.discard_len[games] - 1
+        self.discard[games, 0] = self.discard[games, self.discard_len[games] - 1]
+        self.discard_len[games] = 1
+        self.reshuffles[games] += 1
+
+    def push_discard(self, games, cards):
+        self.discard[games, self.discard_len[games]] = cards
+        self.discard_len[games] += 1
+        self.top_code[games] = cards
+
+    # Draw until playable for each of the given games. Returns the games that ended up playing a card
+    def draw_until_playable(self, games):
+        played = []
+        while games.size:
+            # Reshuffle wherever the draw pile has run dry. Anyone with nothing left to draw afterwards passes
+            empty = games[self.draw_pos[games] == self.draw_len[games]]
+            if empty.size:
+                self.reshuffle(empty)
+                games = games[self.draw_pos[games] < self.draw_len[games]]
+            cards = self.draw[games, self.draw_pos[games]]
+            self.draw_pos[games] += 1
+            self.cards_drawn[games] += 1
+            playable = ((PLAYABLE_NP[self.top_code[games]] >> cards.astype(np.uint64)) & ONE).astype(bool)
+            self.push_discard(games[playable], cards[playable])
+            played.append(games[playable])
+            keep = games[~playable]
+            self.hands[keep, self.player_up[keep]] |= ONE << cards[~playable].astype(np.uint64)
+            games = keep
+        return np.concatenate(played) if played else games
+
+    # Play one turn in every active game
+    def step(self):
+        games = self.active
+        seats = self.player_up[games]
+        self.turns[games] += 1
+        playable = self.hands[games, seats] & PLAYABLE_NP[self.top_code[games]]
+        can_play = playable != 0
+
+        # Play the lowest non-eight if there is one, otherwise the lowest card
+        players = games[can_play]
+        options = playable[can_play]
+        non_eights = options & NOT_EIGHTS
+        options = np.where(non_eights != 0, non_eights, options)
+        cards = lowest_bit(options)
+        self.hands[players, seats[can_play]] ^= ONE << cards.astype(np.uint64)
+        self.push_discard(players, cards)
+
+        played = np.concatenate([players, self.draw_until_playable(games[~can_play])])
+
+        # ¡¡¡Los ochos son muy locos!!! The new suit is whichever suit the player holds the most of
+        eights = played[self.top_code[played] // 4 == 7]
+        if eights.size:
+            hands = self.hands[eights, self.player_up[eights]]
+            counts = np.stack([popcount(hands & mask) for mask in CHOICE_MASKS], axis=1)
+            self.top_code[eights] = CHOICE_CODES[np.argmax(counts, axis=1)]
+
+        won = played[self.hands[played, self.player_up[played]] == 0]
+        self.winner[won] = self.player_up[won]
+        self.player_up[games] = (self.player_up[games] + 1) % 4
+        self.active = games[(self.winner[games] < 0) & (self.turns[games] < self.max_turns)]
+
+    # Play every game to the end
+    def run(self):
+        while self.active.size:
+            self.step()
+        return self
+
+    # Per-game results, in the same form Engine.play returns
+    def results(self):
+        return [GameResult(None if winner < 0 else winner, turns, cards_drawn, reshuffles)
+                for winner, turns, cards_drawn, reshuffles in zip(self.winner.tolist(), self.turns.tolist(),
+                                                                  self.cards_drawn.tolist(), self.reshuffles.tolist())]
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# Compare the numpy batch simulator against the pure-Python engine. Run from the repository root:
+#     python -m benchmarks.bench_batch --games 50000 --check
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+from batch import BatchSimulator
+from engine import Engine
+from player import AIPlayer
+from tournament import game_rng
+
+
+def run_engine(seed, num_games):
+    players = [AIPlayer(i, verbose=False) for i in range(4)]
+    return [Engine(players, game_rng(seed, i)).play() for i in range(num_games)]
+
+
+def run_batch(seed, num_games, batch_size):
+    results = []
+    for start in range(0, num_games, batch_size):
+        rngs = [game_rng(seed, i) for i in range(start, min(start + batch_size, num_games))]
+        results.extend(BatchSimulator(rngs).run().results())
+    return results
+
+
+def run_generator(seed, num_games, batch_size):
+    generator = np.random.default_rng(seed)
+    results = []
+    for start in range(0, num_games, batch_size):
+        size = min(batch_size, num_games - start)
+        results.extend(BatchSimulator.from_generator(generator, size).run().results())
+    return results
+
+
+def as_tuple(result):
+    return (result.winner, result.turns, result.cards_drawn, result.reshuffles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the batch simulator against the scalar engine.')
+    parser.add_argument('--games', type=int, default=50000)
+    parser.add_argument('--batch-size', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--check', action='store_true',
+                        help='Fail if any game comes out differently in the two simulators')
+    args = parser.parse_args()
+
+    start = perf_counter()
+    scalar = run_engine(args.seed, args.games)
+    scalar_time = perf_counter() - start
+    start = perf_counter()
+    batched = run_batch(args.seed, args.games, args.batch_size)
+    batch_time = perf_counter() - start
+    start = perf_counter()
+    run_generator(args.seed, args.games, args.batch_size)
+    generator_time = perf_counter() - start
+
+    print(f'engine:           {args.games / scalar_time:10.0f} games/sec')
+    print(f'batch:            {args.games / batch_time:10.0f} games/sec ({scalar_time / batch_time:.1f}x)')
+    print(f'batch, numpy rng: {args.games / generator_time:10.0f} games/sec ({scalar_time / generator_time:.1f}x)')
+    if args.check:
+        mismatches = [i for i, (a, b) in enumerate(zip(scalar, batched)) if as_tuple(a) != as_tuple(b)]
+        if mismatches:
+            raise SystemExit(f'{len(mismatches)} games differ, first is game {mismatches[0]}: '
+                             f'{scalar[mismatches[0]]} vs {batched[mismatches[0]]}')
+        print(f'all {args.games} games match')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# Memory per table with the compact TableStore, against an Engine per table. Opens --tables tables in one store and
+# measures what they take with tracemalloc: idle (dealt and waiting, like a table between moves) and active (with a
+# listener each and some turns played, like the server's tables mid-game). Materializing a table as an Engine, which
+# is only done to render it or to start spectators on it, and keeping an Engine per table are measured on up to
+# --sample tables and shown per table, since a hundred thousand Engines is what the store is there to avoid. Run from
+# the repository root:
+#     python -m benchmarks.bench_memory --tables 100000
+import argparse
+import gc
+import tracemalloc
+
+from compact import RECORD_SIZE, TableStore
+from engine import Engine
+from rng import GameRandom
+
+
+# Stands in for a server Table: somewhere for a table's events to go
+class Listener:
+    __slots__ = ('events',)
+
+    def __init__(self):
+        self.events = 0
+
+    def on_event(self, event):
+        self.events += 1
+
+
+# Bytes allocated (and still held) by make(), which returns what to keep alive while it's measured
+def measure(make):
+    gc.collect()
+    tracemalloc.start()
+    kept = make()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return used
+
+
+def idle_store(tables, seed):
+    store = TableStore(seed)
+    store.reserve(tables)
+    for game_index in range(tables):
+        store.open(game_index)
+    return store
+
+
+# Every table with a listener and turns turns played, or as many as its game lasts
+def active_store(tables, seed, turns):
+    store = TableStore(seed)
+    store.reserve(tables)
+    listeners = []
+    for game_index in range(tables):
+        listener = Listener()
+        listeners.append(listener)
+        slot = store.open(game_index, listener.on_event)
+        for _ in range(turns):
+            if store.step(slot) is not None:
+                break
+    return store, listeners
+
+
+def materialized(store, tables):
+    return [store.materialize(slot) for slot in range(tables)]
+
+
+def engines(tables, seed, turns):
+    tables = [Engine(rng=GameRandom(seed, game_index)) for game_index in range(tables)]
+    for engine in tables:
+        engine.start()
+        for _ in range(turns):
+            if engine.step() is not None:
+                break
+    return tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure memory per table, compact and as Engines.')
+    parser.add_argument('--tables', type=int, default=100000, help='Tables in the store (default 100000)')
+    parser.add_argument('--sample', type=int, default=10000,
+                        help='Tables to measure materialized and per-Engine costs on (default 10000)')
+    parser.add_argument('--turns', type=int, default=10, help='Turns played on each active table (default 10)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    sample = min(args.sample, args.tables)
+
+    store, _ = active_store(sample, args.seed, args.turns)
+    rows = [('compact, idle', args.tables, measure(lambda: idle_store(args.tables, args.seed))),
+            ('compact, active', args.tables, measure(lambda: active_store(args.tables, args.seed, args.turns))),
+            ('materialized', sample, measure(lambda: materialized(store, sample))),
+            ('engine per table', sample, measure(lambda: engines(sample, args.seed, args.turns)))]
+
+    print(f'Record size: {RECORD_SIZE} bytes')
+    print(f'{"":<18}{"tables":>9}{"total MB":>10}{"bytes/table":>13}')
+    for name, tables, used in rows:
+        print(f'{name:<18}{tables:>9}{used / 1e6:>10.1f}{used / tables:>13.0f}')
+    compact, engine = rows[1][2] / rows[1][1], rows[3][2] / rows[3][1]
+    print(f'An active table takes {engine / compact:.0f}x less memory in the store than as an Engine')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# Load test for server.py. Starts a server (or uses one given with --server), then for each number of tables connects
+# that many bot clients, each playing game after game against three AIs, and measures what the server keeps up with:
+# games and turns per second across all tables, moves per second from the bots, and the latency of those moves (from
+# sending one to hearing back from the server about it). The most tables whose p99 latency stays under --p99 is
+# reported as what the host can sustain. With --spectators, every table also has that many spectators watching it,
+# and the deltas and keyframes they get are counted too. The server's CPU use is shown when it's started here (on
+# Linux), which with and without spectators shows what they cost. Run from the repository root:
+#     python -m benchmarks.bench_server --tables 50 200 1000 --duration 10
+#     python -m benchmarks.bench_server --tables 2000 5000 --think 2 --jobs 4
+#     python -m benchmarks.bench_server --tables 50 --spectators 0 10 100
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+from multiprocessing import Pool
+from time import perf_counter, sleep
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER = os.path.join(ROOT, 'server.py')
+# A TURN event, which is all the bots need to know of the events. Matching the bytes saves parsing every line
+TURN_EVENT = b'{"type":"event","event":[3,'
+
+
+# A client playing game after game at the table called name until stop. Plays the lowest card it can, saving eights,
+# and calls a random suit. Counts the turns it sees, its games, and its moves and their latencies, but only from
+# measure on
+async def bot(host, port, name, measure, stop, think, rng, stats):
+    reader, writer = await asyncio.open_connection(host, port)
+    join = (json.dumps({'type': 'join', 'table': name}) + '\n').encode()
+    writer.write(join)
+    sent = None
+    try:
+        while True:
+            line = await reader.readline()
+            now = perf_counter()
+            if not line or now >= stop:
+                return
+            measuring = now >= measure
+            if sent is not None:
+                if measuring:
+                    stats['latencies'].append(now - sent)
+                sent = None
+            if line.startswith(TURN_EVENT):
+                stats['turns'] += measuring
+                continue
+            if line.startswith(b'{"type":"event"'):
+                continue
+            message = json.loads(line)
+            kind = message['type']
+            if kind == 'turn' or kind == 'suit':
+                if think:
+                    await asyncio.sleep(rng.uniform(0, 2 * think))
+                if kind == 'turn':
+                    playable = message['playable']
+                    card = next((card for card in playable if card // 4 != 7), playable[0])
+                    writer.write(f'{{"type":"play","card":{card}}}\n'.encode())
+                else:
+                    writer.write(f'{{"type":"suit","suit":"{rng.choice("cdhs")}"}}\n'.encode())
+                sent = perf_counter()
+                stats['moves'] += sent >= measure
+            elif kind == 'over':
+                stats['games'] += measuring
+                writer.write(join)
+            elif kind == 'error':
+                raise RuntimeError(f'server error: {message["message"]}')
+    finally:
+        writer.close()
+
+
+# A spectator watching the table called name until stop, game after game. Between games (and before the first) there's
+# no table to watch for a moment, so it tries again shortly
+async def spectator(host, port, name, measure, stop, stats):
+    reader, writer = await asyncio.open_connection(host, port)
+    watch = (json.dumps({'type': 'watch', 'table': name}) + '\n').encode()
+    writer.write(watch)
+    try:
+        while True:
+            line = await reader.readline()
+            now = perf_counter()
+            if not line or now >= stop:
+                return
+            if line.startswith(b'{"type":"delta"'):
+                stats['deltas'] += now >= measure
+            elif line.startswith(b'{"type":"keyframe"'):
+                stats['keyframes'] += now >= measure
+            elif line.startswith(b'{"type":"over"') or line.startswith(b'{"type":"error"'):
+                await asyncio.sleep(0.01)
+                writer.write(watch)
+    finally:
+        writer.close()
+
+
+async def run_bots(host, port, tables, spectators, warmup, duration, think, job, level):
+    stats = {'games': 0, 'turns': 0, 'moves': 0, 'latencies': [], 'deltas': 0, 'keyframes': 0}
+    start = perf_counter()
+    measure, stop = start + warmup, start + warmup + duration
+    rng = random.Random(job)
+    # Connect in waves so the server's listen backlog isn't overrun
+    tasks = []
+    for i in range(tables):
+        # Tables left over from the last level might still be wrapping up, so every level has its own names
+        name = f'load {level}.{job}.{i}'
+        tasks.append(asyncio.ensure_future(bot(host, port, name, measure, stop, think, random.Random(rng.random()),
+                                               stats)))
+        for _ in range(spectators):
+            tasks.append(asyncio.ensure_future(spectator(host, port, name, measure, stop, stats)))
+        if i % 100 == 99 or spectators:
+            await asyncio.sleep(0.01)
+    await asyncio.gather(*tasks)
+    return stats
+
+
+def _run_bots(args):
+    return asyncio.run(run_bots(*args))
+
+
+# Everything the bots measured at one number of tables, merged across the processes they ran in
+def measure(host, port, tables, spectators, jobs, warmup, duration, think, level):
+    shares = [tables // jobs + (i < tables % jobs) for i in range(jobs)]
+    tasks = [(host, port, share, spectators, warmup, duration, think, i, level)
+             for i, share in enumerate(shares) if share]
+    if len(tasks) == 1:
+        results = [_run_bots(tasks[0])]
+    else:
+        with Pool(len(tasks)) as pool:
+            results = pool.map(_run_bots, tasks)
+    stats = {'games': 0, 'turns': 0, 'moves': 0, 'latencies': [], 'deltas': 0, 'keyframes': 0}
+    for result in results:
+        for key in stats:
+            stats[key] += result[key]
+    return stats
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+# CPU seconds process has used so far, or None where there's no /proc to ask
+def cpu_time(process):
+    try:
+        with open(f'/proc/{process.pid}/stat') as file:
+            fields = file.read().rsplit(')', 1)[1].split()
+    except (OSError, AttributeError):
+        return None
+    # utime and stime, the 14th and 15th fields counting the pid and the command
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+# Start a server on a free port. Returns the process and the port
+def start_server():
+    process = subprocess.Popen([sys.executable, SERVER, '--port', '0', '--seed', '0'], cwd=ROOT,
+                               stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith('Serving on '):
+        process.kill()
+        raise RuntimeError(f'server did not start: {line!r}')
+    return process, int(line.split()[2].rsplit(':', 1)[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the network server with bot clients.')
+    parser.add_argument('--tables', type=int, nargs='+', default=[50, 200, 1000],
+                        help='Numbers of tables (one bot each) to try, in order')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds to measure each number of tables for')
+    parser.add_argument('--warmup', type=float, default=2, help='Seconds to let each number of tables settle first')
+    parser.add_argument('--think', type=float, default=0,
+                        help='Average seconds a bot thinks before each move (default 0: as fast as it can)')
+    parser.add_argument('--spectators', type=int, nargs='+', default=[0],
+                        help='Numbers of spectators per table to try with each number of tables (default 0)')
+    parser.add_argument('--p99', type=float, default=50, help='p99 move latency in ms a host has to stay under')
+    parser.add_argument('--jobs', type=int, default=1, help='Processes to run the bots in')
+    parser.add_argument('--server', default=None, metavar='HOST:PORT',
+                        help='Server to test (default: start one here)')
+    args = parser.parse_args()
+
+    process = None
+    if args.server:
+        host, _, port = args.server.rpartition(':')
+        port = int(port)
+    else:
+        process, port = start_server()
+        host = '127.0.0.1'
+    try:
+        # The most tables that kept p99 under the limit, by spectators per table
+        sustained = {}
+        print(f'{"tables":>8}{"watching":>10}{"games/sec":>12}{"turns/sec":>12}{"moves/sec":>12}{"p50 ms":>10}'
+              f'{"p99 ms":>10}{"deltas/sec":>12}{"keyframes":>11}{"server cpu":>12}')
+        levels = [(tables, spectators) for tables in args.tables for spectators in args.spectators]
+        for level, (tables, spectators) in enumerate(levels):
+            cpu, start = cpu_time(process), perf_counter()
+            stats = measure(host, port, tables, spectators, max(args.jobs, 1), args.warmup, args.duration, args.think,
+                            level)
+            used = cpu_time(process)
+            load = f'{(used - cpu) / (perf_counter() - start):.0%}' if used is not None else '-'
+            p50 = 1000 * percentile(stats['latencies'], 0.5)
+            p99 = 1000 * percentile(stats['latencies'], 0.99)
+            print(f'{tables:>8}{tables * spectators:>10}{stats["games"] / args.duration:>12.1f}'
+                  f'{stats["turns"] / args.duration:>12.0f}{stats["moves"] / args.duration:>12.0f}{p50:>10.2f}'
+                  f'{p99:>10.2f}{stats["deltas"] / args.duration:>12.0f}{stats["keyframes"]:>11}{load:>12}',
+                  flush=True)
+            if p99 <= args.p99:
+                sustained[spectators] = max(tables, sustained.get(spectators, 0))
+            # Let the server finish off the tables the bots walked away from
+            sleep(1)
+        print(f'Sustained tables (p99 under {args.p99:g} ms): ' + (', '.join(
+            f'{tables} with {spectators} spectators per table' if len(args.spectators) > 1 else str(tables)
+            for spectators, tables in sustained.items()) or 'none tried'))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
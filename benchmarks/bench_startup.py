@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# Time how long the entry point takes to start, with and without a cached banner. Run from the repository root:
+#     python -m benchmarks.bench_startup --runs 20
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from statistics import median
+from time import perf_counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINT = os.path.join(ROOT, 'los-ochos-locos.py')
+# Load the entry point without running main() and show the welcome screen, which is everything before the first prompt
+WELCOME = (f'path = {ENTRY_POINT!r}; entry_point = {{"__name__": "bench"}}; '
+           'exec(compile(open(path).read(), path, "exec"), entry_point); entry_point["print_welcome"]()')
+# What the welcome screen used to cost: load pyfiglet and the font, and render all three banners
+UNCACHED = ('from pyfiglet import Figlet; import banner; f = Figlet(font=banner.FONT, width=banner.WIDTH); '
+            '[f.renderText(text) for text in banner.TEXTS]')
+
+
+# Wall time of one run of the interpreter with args, in milliseconds
+def time_run(args, env):
+    start = perf_counter()
+    subprocess.run([sys.executable] + args, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, check=True)
+    return 1000 * (perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark start-up time.')
+    parser.add_argument('--runs', type=int, default=20, help='Runs per case (the median is reported)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache:
+        env = dict(os.environ, LOCOS_CACHE_DIR=cache)
+
+        # Every cold run gets an empty cache, so it has to render with pyfiglet and write the cache file
+        def cold():
+            for name in os.listdir(cache):
+                os.remove(os.path.join(cache, name))
+            return time_run(['-c', WELCOME], env)
+
+        cases = {
+            'interpreter': lambda: time_run(['-c', 'pass'], env),
+            'pyfiglet render (uncached)': lambda: time_run(['-c', UNCACHED], env),
+            'welcome, cold cache': cold,
+            'welcome, warm cache': lambda: time_run(['-c', WELCOME], env),
+            '--simulate 0 --jobs 1': lambda: time_run([ENTRY_POINT, '--simulate', '0', '--jobs', '1'], env),
+        }
+        results = {}
+        for name, case in cases.items():
+            case()
+            results[name] = {'median_ms': round(median(case() for _ in range(args.runs)), 1)}
+
+    json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'runs': args.runs,
+               'results': results}, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# Throughput benchmarks for the engine's hot paths, with results as JSON. Run from the repository root:
+#     python -m benchmarks.suite                      # print results
+#     python -m benchmarks.suite --check              # also fail on a regression against the stored baseline
+# Every benchmark is timed alongside a fixed reference workload, and compared with the baseline relative to it, so a
+# slower machine (or one that's busier for a while) doesn't show up as a regression
+#     python -m benchmarks.suite --update-baseline    # store these results as the new baseline
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+from time import perf_counter
+
+from card import CARDS
+from deck import Deck
+from engine import Engine
+from game import Game
+from player import AIPlayer
+from renderer import FrameRenderer
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+SEED = 1234
+
+
+# Fixed hands and top cards for the card and player benchmarks
+def sample_positions(count=64):
+    rng = random.Random(SEED)
+    positions = []
+    for _ in range(count):
+        cards = rng.sample(CARDS, 12)
+        player = AIPlayer(0, verbose=False)
+        player.hand = cards[1:1 + rng.randint(1, 11)]
+        positions.append((player, cards[0]))
+    return positions
+
+
+def bench_plays_on():
+    pairs = [(a, b) for a in CARDS[::3] for b in CARDS[::2]]
+
+    def run():
+        for card, top in pairs:
+            card.plays_on(top)
+    return run, len(pairs)
+
+
+def bench_playable_cards():
+    positions = sample_positions()
+
+    def run():
+        for player, top in positions:
+            player.playable_cards(top)
+    return run, len(positions)
+
+
+def bench_can_play():
+    positions = sample_positions()
+
+    def run():
+        for player, top in positions:
+            player.can_play(top)
+    return run, len(positions)
+
+
+def bench_choose_suit():
+    positions = sample_positions()
+
+    def run():
+        for player, top in positions:
+            player.choose_suit(None)
+    return run, len(positions)
+
+
+def bench_deck_shuffle():
+    rng = random.Random(SEED)
+    deck = Deck()
+
+    def run():
+        deck.shuffle(rng)
+    return run, 1
+
+
+def bench_deal_hands():
+    rng = random.Random(SEED)
+
+    def run():
+        deck = Deck()
+        deck.shuffle(rng)
+        deck.deal_hands()
+    return run, 1
+
+
+def bench_draw_and_add():
+    deck = Deck()
+    pile = Deck([])
+
+    # Move the whole deck onto another pile and back again, one card at a time
+    def run():
+        for _ in range(52):
+            pile.add_card(deck.draw_card())
+        for _ in range(52):
+            deck.add_card(pile.draw_card())
+    return run, 104
+
+
+# A full deck sitting on the discard pile gets turned into the draw pile, then dealt back out onto the discard pile
+def bench_reshuffle():
+    engine = Engine(rng=random.Random(SEED))
+    engine.draw.cards, engine.discard.cards = [], engine.draw.cards
+
+    def run():
+        engine.reshuffle()
+        while engine.draw.cards:
+            engine.discard.add_card(engine.draw.draw_card())
+    return run, 1
+
+
+# Seeds of the games that draw the most cards, out of the first pool games from SEED
+def draw_heavy_seeds(count=8, pool=400):
+    drawn = {}
+    for seed in range(SEED, SEED + pool):
+        drawn[seed] = Engine(rng=random.Random(seed)).play().cards_drawn
+    return sorted(drawn, key=drawn.get, reverse=True)[:count]
+
+
+# Long games where players spend most of their turns drawing and the piles get reshuffled again and again. Measured in
+# cards drawn
+def bench_draw_heavy_games():
+    seeds = draw_heavy_seeds()
+    players = [AIPlayer(i, verbose=False) for i in range(4)]
+    cards_drawn = sum(Engine(players, random.Random(seed)).play().cards_drawn for seed in seeds)
+
+    def run():
+        for seed in seeds:
+            Engine(players, random.Random(seed)).play()
+    return run, cards_drawn
+
+
+def bench_ai_game():
+    players = [AIPlayer(i, verbose=False) for i in range(4)]
+    games = iter(range(1 << 62))
+
+    def run():
+        Engine(players, random.Random(SEED + next(games))).play()
+    return run, 1
+
+
+def bench_draw_game():
+    game = Game(1)
+    game.rng = random.Random(SEED)
+    game.start()
+    game.renderer = FrameRenderer(open(os.devnull, 'w'))
+    game.set_message('Benchmarking the renderer.', 'Press enter to continue...')
+
+    # Forget the last frame every time, so each call draws a full frame rather than an empty diff
+    def run():
+        game.renderer.invalidate()
+        game.draw_game()
+    return run, 1
+
+
+# Plain interpreter work with nothing to do with the game: dict updates, float arithmetic, and a sort
+def bench_reference():
+    rng = random.Random(SEED)
+    values = [rng.random() for _ in range(256)]
+
+    def run():
+        totals = {}
+        for i, value in enumerate(values):
+            totals[i & 63] = totals.get(i & 63, 0.0) + value
+        sorted(values)
+    return run, 1
+
+
+BENCHMARKS = {
+    'card.plays_on': bench_plays_on,
+    'player.playable_cards': bench_playable_cards,
+    'player.can_play': bench_can_play,
+    'ai.choose_suit': bench_choose_suit,
+    'deck.shuffle': bench_deck_shuffle,
+    'deck.deal_hands': bench_deal_hands,
+    'deck.draw_card+add_card': bench_draw_and_add,
+    'engine.reshuffle': bench_reshuffle,
+    'engine.draw_heavy_games': bench_draw_heavy_games,
+    'engine.ai_game': bench_ai_game,
+    'game.draw_game': bench_draw_game,
+}
+
+
+# Calls of run that take at least min_time seconds
+def calls_for(run, min_time):
+    run()
+    calls = 1
+    while True:
+        start = perf_counter()
+        for _ in range(calls):
+            run()
+        if perf_counter() - start >= min_time:
+            return calls
+        calls *= 2
+
+
+# Best operations/sec over several repeats of at least min_time seconds each, for the benchmark and for the reference
+# workload, timed in turns so both see the machine the same way
+def measure(setup, repeats=5, min_time=0.2):
+    timings = []
+    for run, ops_per_call in (setup(), bench_reference()):
+        timings.append([run, ops_per_call, calls_for(run, min_time), 0.0])
+    for _ in range(repeats):
+        for timing in timings:
+            run, ops_per_call, calls, best = timing
+            start = perf_counter()
+            for _ in range(calls):
+                run()
+            timing[3] = max(best, calls * ops_per_call / (perf_counter() - start))
+    return timings[0][3], timings[1][3]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the game engine.')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline results to compare against')
+    parser.add_argument('--update-baseline', action='store_true', help='Save these results as the baseline')
+    parser.add_argument('--check', action='store_true',
+                        help='Exit with an error if anything is slower than the baseline by more than --tolerance')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown as a fraction of baseline throughput, relative to the reference workload '
+                             '(default 0.25)')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--retries', type=int, default=2,
+                        help='Times to measure a benchmark again before calling it a regression (default 2)')
+    parser.add_argument('--filter', default='', help='Only run benchmarks whose names contain this')
+    args = parser.parse_args()
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+
+    results = {}
+    regressions = []
+    for name, setup in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        # A slowdown that's real is there every time, so one that's past the tolerance is measured again before it
+        # counts, and the best measurement is kept
+        for attempt in range(args.retries + 1):
+            ops_per_sec, reference = measure(setup, args.repeats)
+            result = {'ops_per_sec': round(ops_per_sec, 1), 'relative': round(ops_per_sec / reference, 6)}
+            if not baseline or name not in baseline:
+                break
+            result['baseline_ops_per_sec'] = baseline[name]['ops_per_sec']
+            # Baselines from before there was a reference workload can only be compared directly
+            if 'relative' in baseline[name]:
+                result['ratio'] = round(result['relative'] / baseline[name]['relative'], 3)
+            else:
+                result['ratio'] = round(result['ops_per_sec'] / baseline[name]['ops_per_sec'], 3)
+            if name not in results or result['ratio'] > results[name]['ratio']:
+                results[name] = result
+            if result['ratio'] >= 1 - args.tolerance:
+                break
+        else:
+            regressions.append(name)
+        results.setdefault(name, result)
+
+    report = {'python': platform.python_version(), 'machine': platform.machine(), 'seed': SEED,
+              'results': results, 'regressions': regressions}
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    if args.update_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump({'python': report['python'], 'machine': report['machine'], 'results': results}, file, indent=2)
+            file.write('\n')
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,48 +1,92 @@
 from colorama import Fore, Style
 
+# Suits in deck order. A card's index is (num_rank - 1) * 4 + the position of its suit here, so index order is rank order
+SUITS = 'cshd'
+RANKS = {1: 'A', 10: 'T', 11: 'J', 12: 'Q', 13: 'K'}
+# Spades yellow, hearts red, clubs green, diamonds blue
+SUIT_COLORS = {'s': Fore.LIGHTYELLOW_EX, 'h': Fore.RED, 'c': Fore.GREEN, 'd': Style.BRIGHT + Fore.BLUE}
+SUIT_SYMBOLS = {'s': '♠', 'h': '♥', 'c': '♣', 'd': '♦'}
 
+
+def card_index(num_rank, suit):
+    return (num_rank - 1) * 4 + SUITS.index(suit)
+
+
+# PLAYABLE[code] is a bitmask of the card indices that can be played on a top card with that code
+PLAYABLE = []
+for top_code in range(52):
+    mask = 0
+    for index in range(52):
+        if index // 4 == 7 or index // 4 == top_code // 4 or index % 4 == top_code % 4:
+            mask |= 1 << index
+    PLAYABLE.append(mask)
+del top_code, mask, index
+
+# Bitmasks of every card in each suit, and of the four eights
+SUIT_MASKS = {suit: sum(1 << (num_rank * 4 + i) for num_rank in range(13)) for i, suit in enumerate(SUITS)}
+EIGHTS = 0b1111 << 28
+
+# Number of cards in a bitmask
+if hasattr(int, 'bit_count'):
+    popcount = int.bit_count
+else:
+    def popcount(mask):
+        return bin(mask).count('1')
+
+
+# Cards are immutable and interned, so there's only ever one object for each of the 52 cards (plus one for each suit an
+# eight can be declared as). Anything with a suit of '0' is a wildcard used to describe user input and isn't interned
 class Card:
+    __slots__ = ('num_rank', 'suit', 'rank', 'index', 'code', 'base', '_plays_on', '_str', '_suit_str')
+
     SPADES = Fore.LIGHTYELLOW_EX + '[s]pades ♠' + Style.RESET_ALL
     HEARTS = Fore.RED + '[h]earts ♥' + Style.RESET_ALL
     CLUBS = Fore.GREEN + '[c]lubs ♣' + Style.RESET_ALL
     DIAMONDS = Style.BRIGHT + Fore.BLUE + '[d]iamonds ♦' + Style.RESET_ALL
 
-    def __init__(self, num_rank=0, suit='0'):
-        self.num_rank = num_rank
-        self.suit = suit
-        # Give the correct rank to ace, jack, queen, and king
-        if num_rank == 1:
-            self.rank = 'A'
-        elif num_rank == 10:
-            self.rank = 'T'
-        elif num_rank == 11:
-            self.rank = 'J'
-        elif num_rank == 12:
-            self.rank = 'Q'
-        elif num_rank == 13:
-            self.rank = 'K'
+    _interned = {}
+    _declared = {}
+
+    def __new__(cls, num_rank=0, suit='0'):
+        card = cls._interned.get((num_rank, suit))
+        if card is None:
+            card = cls._build(num_rank, suit, -1, -1)
+        return card
+
+    @classmethod
+    def _build(cls, num_rank, suit, index, code):
+        card = object.__new__(cls)
+        card.num_rank = num_rank
+        card.suit = suit
+        # Give the correct rank to ace, ten, jack, queen, and king
+        card.rank = RANKS.get(num_rank, str(num_rank))
+        # index identifies the physical card, code identifies the rank and suit it plays as
+        card.index = index
+        card.code = code
+        card.base = card
+        # _plays_on[code] says whether this card can be played on a top card with that code
+        card._plays_on = tuple(num_rank == 8 or top_code // 4 + 1 == num_rank or
+                               (suit != '0' and SUITS[top_code % 4] == suit) for top_code in range(52))
+        # String representation should be snazzy, and str should only be used for terminal UI stuff
+        if suit in SUIT_COLORS:
+            card._str = SUIT_COLORS[suit] + card.rank + SUIT_SYMBOLS[suit] + Style.RESET_ALL
+            card._suit_str = SUIT_COLORS[suit] + SUIT_SYMBOLS[suit] + Style.RESET_ALL
         else:
-            self.rank = str(num_rank)
+            card._str = card.rank
+            card._suit_str = Style.BRIGHT + card.rank + Style.RESET_ALL
+        return card
+
+    # Fetch a card by its index
+    @staticmethod
+    def from_index(index):
+        return CARDS[index]
 
-    # String representation should be snazzy, and str should only be used for terminal UI stuff
     def __str__(self):
-        # Spades yellow, hearts red, clubs green, diamonds blue
-        card_str = ''
-        if self.suit == 's':
-            card_str = Fore.LIGHTYELLOW_EX + self.rank + '♠' + Style.RESET_ALL
-        elif self.suit == 'h':
-            card_str = Fore.RED + self.rank + '♥' + Style.RESET_ALL
-        elif self.suit == 'c':
-            card_str = Fore.GREEN + self.rank + '♣' + Style.RESET_ALL
-        elif self.suit == 'd':
-            card_str = Style.BRIGHT + Fore.BLUE + self.rank + '♦' + Style.RESET_ALL
-        else:
-            card_str = str(self.rank)
-        return card_str
+        return self._str
 
     # Equality is determined by rank and suit
     def __eq__(self, other):
-        return (self.rank == other.rank and self.suit == other.suit) or (self.rank == other.rank and self.suit == '0')
+        return self is other or (self.rank == other.rank and (self.suit == other.suit or self.suit == '0'))
 
     # Less than is determined by rank
     def __lt__(self, other):
@@ -53,25 +97,56 @@ class Card:
         return hash((self.rank, self.suit))
 
     def __copy__(self):
-        return Card(self.num_rank, self.suit)
+        return self
+
+    # Keep interning intact across pickling (e.g. when sending cards to worker processes)
+    def __reduce__(self):
+        if self.base is not self:
+            return (Card.declare, (self.base, self.suit))
+        return (Card, (self.num_rank, self.suit))
+
+    # An eight that's been played with a new suit declared. The card keeps its identity (index and base) but plays as
+    # the declared suit
+    def declare(self, suit):
+        base = self.base
+        if suit == base.suit:
+            return base
+        card = Card._declared.get((base.index, suit))
+        if card is None:
+            card = Card._build(base.num_rank, suit, base.index, card_index(base.num_rank, suit))
+            card.base = base
+            Card._declared[(base.index, suit)] = card
+        return card
 
     def get_suit(self):
-        # Spades yellow, hearts red, clubs green, diamonds blue
-        card_str = ''
-        if self.suit == 's':
-            card_str = Fore.LIGHTYELLOW_EX + '♠' + Style.RESET_ALL
-        elif self.suit == 'h':
-            card_str = Fore.RED + '♥' + Style.RESET_ALL
-        elif self.suit == 'c':
-            card_str = Fore.GREEN + '♣' + Style.RESET_ALL
-        elif self.suit == 'd':
-            card_str = Style.BRIGHT + Fore.BLUE + '♦' + Style.RESET_ALL
-        else:
-            card_str = Style.BRIGHT + str(self.rank) + Style.RESET_ALL
-        return card_str
+        return self._suit_str
 
     def plays_on(self, other_card):
-        if self.rank == '8' or self.suit == other_card.suit or self.rank == other_card.rank:
-            return True
-        else:
-            return False
+        return self._plays_on[other_card.code]
+
+
+# The 52 interned cards in index order
+CARDS = []
+for num_rank in range(1, 14):
+    for suit in SUITS:
+        CARDS.append(Card._build(num_rank, suit, len(CARDS), len(CARDS)))
+        Card._interned[(num_rank, suit)] = CARDS[-1]
+del num_rank, suit
+
+
+# Bitmask of a collection of cards
+def mask_of(cards):
+    mask = 0
+    for card in cards:
+        mask |= 1 << card.index
+    return mask
+
+
+# Cards in a bitmask, in rank order
+def cards_in(mask):
+    cards = []
+    while mask:
+        low = mask & -mask
+        cards.append(CARDS[low.bit_length() - 1])
+        mask ^= low
+    return cards
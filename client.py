@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# Thin terminal client for server.py. Keeps track of the game from the server's events, prints what happens, and asks
+# for a card when it's your turn:
+#     python client.py --port 8808
+#     python client.py --port 8808 --table friday --humans 2
+import argparse
+import asyncio
+import json
+import sys
+
+from colorama import Style, init
+
+from card import CARDS, SUITS, Card
+from events import DEAL, DRAW, NONE, PASS, PLAY, RESHUFFLE, START, SUIT, VICTORY
+
+RANKS = {'a': 1, 't': 10, 'j': 11, 'q': 12, 'k': 13}
+
+
+# What the client knows of the game: its own hand, the top card, and how many cards everyone else is holding
+class View:
+    def __init__(self, seat):
+        self.seat = seat
+        self.hand = []
+        self.counts = [0] * 4
+        self.top = None
+        self.draw = 52
+        self.discard = 0
+
+    def apply(self, kind, seat, card, arg):
+        if kind == DEAL or kind == DRAW:
+            self.counts[seat] += 1
+            self.draw -= 1
+            if card != NONE:
+                self.hand.append(CARDS[card])
+                self.hand.sort(key=lambda card: card.index)
+        elif kind == START:
+            self.top = CARDS[card]
+            self.draw -= 1
+            self.discard = 1
+        elif kind == PLAY:
+            self.top = CARDS[card]
+            self.discard += 1
+            self.counts[seat] -= 1
+            if seat == self.seat:
+                self.hand.remove(self.top)
+        elif kind == SUIT:
+            self.top = self.top.declare(SUITS[arg])
+        elif kind == RESHUFFLE:
+            self.draw, self.discard = self.discard - 1, 1
+
+
+def seat_name(view, seat):
+    return 'You' if seat == view.seat else f'Player {seat + 1}'
+
+
+# Print what an event means to this player. Deals aren't worth a line each
+def describe(view, kind, seat, card, arg):
+    if kind == START:
+        print(f'Your hand: {" ".join(str(card) for card in view.hand)}')
+        print(f'Starting card: {view.top}')
+    elif kind == PLAY:
+        print(f'{seat_name(view, seat)} played {CARDS[card]}')
+    elif kind == DRAW and seat == view.seat:
+        print(f'You drew {CARDS[card]}')
+    elif kind == SUIT:
+        print(f'{seat_name(view, seat)} called {view.top.get_suit()}')
+    elif kind == RESHUFFLE:
+        print('The discard pile was shuffled into the draw pile')
+    elif kind == PASS:
+        print(f'{seat_name(view, seat)} passed')
+    elif kind == VICTORY:
+        print(f'{Style.BRIGHT}{seat_name(view, seat)} won!{Style.RESET_ALL}')
+
+
+# The card typed in (like 'qh', '10s', or just '5' if there's only one 5 to play), or None
+def parse_card(text, playable):
+    text = text.strip().lower().replace('10', 't')
+    if not text:
+        return None
+    rank = RANKS.get(text[0]) or (int(text[0]) if text[0].isdigit() else None)
+    suit = text[-1] if len(text) > 1 else None
+    matches = [card for card in playable if card.num_rank == rank and (suit is None or card.suit == suit)]
+    return matches[0] if len(matches) == 1 else None
+
+
+async def read_line(prompt):
+    print(prompt, end=' ', flush=True)
+    # input() would block the event loop, and with it the connection
+    line = await asyncio.get_running_loop().run_in_executor(None, sys.stdin.readline)
+    if not line:
+        raise EOFError
+    return line
+
+
+async def play(host, port, table, humans):
+    reader, writer = await asyncio.open_connection(host, port)
+
+    def send(message):
+        writer.write((json.dumps(message) + '\n').encode())
+
+    join = {'type': 'join', 'table': table}
+    if humans is not None:
+        join['humans'] = humans
+    send(join)
+    view = None
+    while True:
+        line = await reader.readline()
+        if not line:
+            print('Server closed the connection')
+            return
+        message = json.loads(line)
+        kind = message['type']
+        if kind == 'seated':
+            view = View(message['seat'])
+            print(f'Seated at table {message["table"]} as player {view.seat + 1}. Waiting for the game to start...')
+        elif kind == 'event':
+            view.apply(*message['event'])
+            describe(view, *message['event'])
+        elif kind == 'turn':
+            playable = [CARDS[index] for index in message['playable']]
+            others = ', '.join(f'player {seat + 1}: {count}' for seat, count in enumerate(view.counts)
+                               if seat != view.seat)
+            print(f'\nTop card: {view.top}   Draw pile: {view.draw}   Cards held by {others}')
+            print(f'Your hand: {" ".join(str(card) for card in view.hand)}')
+            card = None
+            while card is None:
+                card = parse_card(await read_line(f'Play a card ({" ".join(str(card) for card in playable)}):'),
+                                  playable)
+            send({'type': 'play', 'card': card.index})
+        elif kind == 'suit':
+            suit = None
+            while suit not in ('c', 'd', 'h', 's'):
+                suit = (await read_line(f'Call a suit: {Card.SPADES}, {Card.HEARTS}, {Card.CLUBS}, or '
+                                        f'{Card.DIAMONDS}:')).strip().lower()[:1]
+            send({'type': 'suit', 'suit': suit})
+        elif kind == 'over':
+            if message['winner'] is None:
+                print('The game hit the turn limit with nobody out')
+            writer.close()
+            return
+        elif kind == 'error':
+            print(f'Server: {message["message"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play Los Ochos Locos on a server.')
+    parser.add_argument('--host', default='127.0.0.1', help='Server address (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8808, help='Server port (default 8808)')
+    parser.add_argument('--table', default=None, help='Table to join or open (default: a new table against AIs)')
+    parser.add_argument('--humans', type=int, help='Players a new --table waits for (default 1). Joining a table that\'s '
+                                                   'waiting, it can be left out, and has to match the table if not')
+    args = parser.parse_args()
+    init()
+    try:
+        asyncio.run(play(args.host, args.port, args.table, args.humans))
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except ConnectionError as error:
+        sys.exit(f'Could not reach the server: {error}')
+
+
+if __name__ == '__main__':
+    main()
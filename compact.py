@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# Game state for hosting lots of tables at once. An Engine is a few kilobytes of Python objects (players, decks, lists
+# of cards, a history), which adds up at a hundred thousand tables. A TableStore keeps every table in a handful of flat
+# arrays, a fixed RECORD_SIZE bytes per table, and plays the same rules on them directly: the same deals and
+# reshuffles as an Engine with a GameRandom, the same AI, the same events. An Engine or a Game is only built from a
+# table (materialize()) when something needs to render it. Run it on its own to check it plays every game exactly like
+# the Engine:
+#     python compact.py --check --games 20000
+import argparse
+from array import array
+from time import perf_counter
+
+from card import CARDS, EIGHTS, PLAYABLE, SUIT_MASKS, SUITS, popcount
+from engine import Engine, GameResult
+from events import DEAL, DRAW, NONE, PASS, PLAY, RESHUFFLE, STACK, START, SUIT, TURN, VICTORY, Event
+from rng import GameRandom
+
+# Bytes per table: four hand masks, the card region, the five one-byte fields, the four counters, and the game index
+RECORD_SIZE = 4 * 8 + 52 + 5 + 4 * 2 + 8
+# Seat that's won, while nobody has
+NO_WINNER = 255
+# Codes the AI's suit calls play as, in the order AIPlayer.choose_suit tries them
+AI_CALLS = [(SUIT_MASKS[suit], 28 + SUITS.index(suit)) for suit in 'cdhs']
+
+
+# Every table is a slot in the arrays. Its two piles share one 52-byte region of cards: the draw pile from the start
+# with its top at draw_size - 1, and the discard pile from the end backwards with its top at 52 - discard_size. Hands
+# and piles never hold more than 52 cards between them, so the piles never meet. Cards in the piles are card indices
+# (eights as themselves), and the code the top card plays as, which is where a called suit lives, is kept in top.
+# Every deal and reshuffle is worked out from the store's seed and the table's game index, like GameRandom does for an
+# Engine.
+#
+# Slots are reused once closed. Events go to the listener set for a slot, if any, and otherwise cost nothing
+class TableStore:
+    def __init__(self, seed=0, max_turns=Engine.MAX_TURNS):
+        self.seed = seed
+        self.max_turns = max_turns
+        self.hands = array('Q')
+        self.cards = bytearray()
+        self.draw_size = bytearray()
+        self.discard_size = bytearray()
+        self.top = bytearray()
+        self.player_up = bytearray()
+        self.winner = bytearray()
+        self.turns = array('H')
+        self.cards_drawn = array('H')
+        self.reshuffles = array('H')
+        self.shuffles = array('H')
+        self.game_index = array('Q')
+        self.free = []
+        self.listeners = {}
+
+    def __len__(self):
+        return len(self.top) - len(self.free)
+
+    # Make room for count more tables up front, so the arrays don't overshoot when they grow
+    def reserve(self, count):
+        count -= len(self.free)
+        if count <= 0:
+            return
+        start = len(self.top)
+        self.hands.extend(array('Q', bytes(32 * count)))
+        self.cards.extend(bytes(52 * count))
+        for field in (self.draw_size, self.discard_size, self.top, self.player_up, self.winner):
+            field.extend(bytes(count))
+        for field in (self.turns, self.cards_drawn, self.reshuffles, self.shuffles):
+            field.extend(array('H', bytes(2 * count)))
+        self.game_index.extend(array('Q', bytes(8 * count)))
+        self.free.extend(range(start + count - 1, start - 1, -1))
+
+    # Open a table for game game_index of the store's seed, dealt and with its first card turned up. Returns its slot
+    def open(self, game_index, listener=None):
+        if not self.free:
+            self.reserve(max(len(self.top), 16))
+        slot = self.free.pop()
+        if listener is not None:
+            self.listeners[slot] = listener
+        self.game_index[slot] = game_index
+        self.turns[slot] = self.cards_drawn[slot] = self.reshuffles[slot] = self.shuffles[slot] = 0
+        self.player_up[slot] = 0
+        self.winner[slot] = NO_WINNER
+        self.deal(slot)
+        return slot
+
+    def close(self, slot):
+        self.listeners.pop(slot, None)
+        self.free.append(slot)
+
+    def emit(self, slot, kind, seat=NONE, card=NONE, arg=0):
+        listener = self.listeners.get(slot)
+        if listener is not None:
+            listener(Event(kind, seat, card, arg))
+
+    # The next shuffle of a table's game, the same one its GameRandom would do
+    def shuffle(self, slot, cards):
+        rng = GameRandom(self.seed, self.game_index[slot])
+        rng.shuffles = self.shuffles[slot]
+        rng.shuffle(cards)
+        self.shuffles[slot] += 1
+
+    # Shuffle, deal seven cards to each seat round the table off the top of the pile, and turn the next card up. Same
+    # as Engine.start
+    def deal(self, slot):
+        deck = list(range(52))
+        self.shuffle(slot, deck)
+        hands = [0] * 4
+        dealt = []
+        for _ in range(7):
+            for seat in range(4):
+                index = deck.pop()
+                hands[seat] |= 1 << index
+                dealt.append((seat, index))
+        self.hands[4 * slot:4 * slot + 4] = array('Q', hands)
+        top = deck.pop()
+        base = 52 * slot
+        self.cards[base:base + len(deck)] = bytes(deck)
+        self.cards[base + 51] = top
+        self.draw_size[slot] = len(deck)
+        self.discard_size[slot] = 1
+        self.top[slot] = top
+        if slot in self.listeners:
+            for seat, index in dealt:
+                self.emit(slot, DEAL, seat, index)
+            # The Engine announces the pile before turning the top card up
+            self.emit(slot, STACK, card=top)
+            self.emit_stack(slot)
+            self.emit(slot, START, card=top)
+
+    def emit_stack(self, slot):
+        base = 52 * slot
+        for index in reversed(self.cards[base:base + self.draw_size[slot]]):
+            self.emit(slot, STACK, card=index)
+
+    # Index of the top card of the discard pile
+    def top_card(self, slot):
+        return self.cards[52 * slot + 52 - self.discard_size[slot]]
+
+    def hand(self, slot, seat):
+        return self.hands[4 * slot + seat]
+
+    # Cards the player up can play, as a mask
+    def playable(self, slot):
+        return self.hands[4 * slot + self.player_up[slot]] & PLAYABLE[self.top[slot]]
+
+    def out_of_turns(self, slot):
+        return self.turns[slot] >= self.max_turns
+
+    def result(self, slot, winner):
+        return GameResult(winner, self.turns[slot], self.cards_drawn[slot], self.reshuffles[slot])
+
+    def begin_turn(self, slot):
+        self.turns[slot] += 1
+        self.emit(slot, TURN, self.player_up[slot])
+
+    # The player up plays the card with index index, which has to be one of playable()
+    def play(self, slot, index):
+        up = self.player_up[slot]
+        self.hands[4 * slot + up] &= ~(1 << index)
+        self.discard_size[slot] += 1
+        self.cards[52 * slot + 52 - self.discard_size[slot]] = index
+        self.top[slot] = index
+        self.emit(slot, PLAY, up, index)
+
+    # Everything under the top card of the discard pile, shuffled, becomes the draw pile, which has to be empty. Same
+    # as Engine.reshuffle
+    def reshuffle(self, slot):
+        base = 52 * slot
+        size = self.discard_size[slot]
+        pile = list(self.cards[base + 53 - size:base + 52])[::-1]
+        self.cards[base + 51] = self.cards[base + 52 - size]
+        self.shuffle(slot, pile)
+        self.cards[base:base + len(pile)] = bytes(pile)
+        self.draw_size[slot] = len(pile)
+        self.discard_size[slot] = 1
+        self.reshuffles[slot] += 1
+        if slot in self.listeners:
+            self.emit(slot, RESHUFFLE, self.player_up[slot])
+            self.emit_stack(slot)
+
+    # The player up draws until a card comes up that plays, and plays it. Returns False if they had to pass instead
+    def draw_until_playable(self, slot):
+        up = self.player_up[slot]
+        base = 52 * slot
+        cards = self.cards
+        draw_size = self.draw_size
+        listener = self.listeners.get(slot)
+        playable = PLAYABLE[self.top[slot]]
+        drawn = 0
+        while True:
+            if not draw_size[slot]:
+                self.reshuffle(slot)
+                # Every other card is in somebody's hand, so there's nothing left to draw
+                if not draw_size[slot]:
+                    self.cards_drawn[slot] += drawn
+                    return False
+            size = draw_size[slot] - 1
+            draw_size[slot] = size
+            index = cards[base + size]
+            drawn += 1
+            if listener is not None:
+                listener(Event(DRAW, up, index, 0))
+            if playable >> index & 1:
+                self.cards_drawn[slot] += drawn
+                size = self.discard_size[slot] + 1
+                self.discard_size[slot] = size
+                cards[base + 52 - size] = index
+                self.top[slot] = index
+                if listener is not None:
+                    listener(Event(PLAY, up, index, 0))
+                return True
+            self.hands[4 * slot + up] |= 1 << index
+
+    def pass_turn(self, slot):
+        self.emit(slot, PASS, self.player_up[slot])
+
+    # Call a suit ('c', 'd', 'h', or 's') for the eight the player up just played
+    def declare(self, slot, suit):
+        self.top[slot] = 28 + SUITS.index(suit)
+        self.emit(slot, SUIT, self.player_up[slot], arg=SUITS.index(suit))
+
+    # The game's over if the player up went out, otherwise the next player is up. Returns a GameResult if it's over
+    def end_turn(self, slot):
+        up = self.player_up[slot]
+        if not self.hands[4 * slot + up]:
+            self.winner[slot] = up
+            self.emit(slot, VICTORY, up)
+            return self.result(slot, up)
+        self.player_up[slot] = (up + 1) % 4
+        return None
+
+    # What AIPlayer would play from playable: the lowest card, saving eights for when nothing else plays
+    @staticmethod
+    def ai_card(playable):
+        if playable & ~EIGHTS:
+            playable &= ~EIGHTS
+        return (playable & -playable).bit_length() - 1
+
+    # What AIPlayer would call with this hand: the suit it holds the most of
+    @staticmethod
+    def ai_suit(hand):
+        best, best_count = None, -1
+        for mask, code in AI_CALLS:
+            count = popcount(hand & mask)
+            if count > best_count:
+                best, best_count = code, count
+        return SUITS[best - 28]
+
+    # Play a turn for the player up with the AI, like Engine.step. Returns a GameResult once the game's over. This is
+    # begin_turn, play or draw_until_playable, declare, and end_turn in one, with the AI's choices worked out in line
+    def step(self, slot):
+        turns = self.turns
+        if turns[slot] >= self.max_turns:
+            return self.result(slot, None)
+        turns[slot] += 1
+        up = self.player_up[slot]
+        listener = self.listeners.get(slot)
+        if listener is not None:
+            listener(Event(TURN, up, NONE, 0))
+        hands = self.hands
+        seat = 4 * slot + up
+        playable = hands[seat] & PLAYABLE[self.top[slot]]
+        if playable:
+            if playable & ~EIGHTS:
+                playable &= ~EIGHTS
+            low = playable & -playable
+            hands[seat] ^= low
+            index = low.bit_length() - 1
+            size = self.discard_size[slot] + 1
+            self.discard_size[slot] = size
+            self.cards[52 * slot + 52 - size] = index
+            self.top[slot] = index
+            if listener is not None:
+                listener(Event(PLAY, up, index, 0))
+        elif not self.draw_until_playable(slot):
+            self.pass_turn(slot)
+            return self.end_turn(slot)
+        if self.top[slot] // 4 == 7:
+            self.declare(slot, self.ai_suit(hands[seat]))
+        if not hands[seat]:
+            self.winner[slot] = up
+            if listener is not None:
+                listener(Event(VICTORY, up, NONE, 0))
+            return self.result(slot, up)
+        self.player_up[slot] = (up + 1) % 4
+        return None
+
+    # Play the game out with the AI, like Engine.play. Returns its GameResult. With nobody listening for events, which is
+    # how bulk simulations run, the whole game is played in local variables and written back to the slot at the end
+    def play_out(self, slot):
+        if slot in self.listeners:
+            while True:
+                result = self.step(slot)
+                if result is not None:
+                    return result
+        cards = self.cards
+        base = 52 * slot
+        hands = list(self.hands[4 * slot:4 * slot + 4])
+        draw_size, discard_size = self.draw_size[slot], self.discard_size[slot]
+        top, up, turns = self.top[slot], self.player_up[slot], self.turns[slot]
+        max_turns = self.max_turns
+        drawn = 0
+        winner = None
+        while turns < max_turns:
+            turns += 1
+            hand = hands[up]
+            playable = hand & PLAYABLE[top]
+            if playable:
+                if playable & ~EIGHTS:
+                    playable &= ~EIGHTS
+                low = playable & -playable
+                hand ^= low
+                index = low.bit_length() - 1
+            else:
+                # Draw until something plays, reshuffling (with the slot up to date for it) when the pile runs out
+                playable = PLAYABLE[top]
+                index = None
+                while True:
+                    if not draw_size:
+                        self.discard_size[slot] = discard_size
+                        self.reshuffle(slot)
+                        draw_size, discard_size = self.draw_size[slot], 1
+                        if not draw_size:
+                            break
+                    draw_size -= 1
+                    index = cards[base + draw_size]
+                    drawn += 1
+                    if playable >> index & 1:
+                        break
+                    hand |= 1 << index
+                    index = None
+                if index is None:
+                    hands[up] = hand
+                    up = (up + 1) % 4
+                    continue
+            discard_size += 1
+            cards[base + 52 - discard_size] = top = index
+            if index // 4 == 7:
+                best = -1
+                for mask, code in AI_CALLS:
+                    count = popcount(hand & mask)
+                    if count > best:
+                        best, top = count, code
+            hands[up] = hand
+            if not hand:
+                winner = up
+                break
+            up = (up + 1) % 4
+        self.hands[4 * slot:4 * slot + 4] = array('Q', hands)
+        self.draw_size[slot], self.discard_size[slot] = draw_size, discard_size
+        self.top[slot], self.player_up[slot], self.turns[slot] = top, up, turns
+        self.cards_drawn[slot] += drawn
+        if winner is not None:
+            self.winner[slot] = winner
+        return self.result(slot, winner)
+
+    # Build a table object with slot's position, for rendering it or playing it on the usual way. table is an Engine or
+    # a Game to put the position on (a fresh all-AI Engine if it's None). Nothing's shared, so changes to the table
+    # don't come back to the store
+    def materialize(self, slot, table=None):
+        if table is None:
+            table = Engine(max_turns=self.max_turns)
+        base = 52 * slot
+        table.draw.cards = [CARDS[index] for index in self.cards[base:base + self.draw_size[slot]]]
+        discard = [CARDS[index] for index in reversed(self.cards[base + 52 - self.discard_size[slot]:base + 52])]
+        if self.top[slot] // 4 == 7:
+            discard[-1] = discard[-1].declare(SUITS[self.top[slot] % 4])
+        table.discard.cards = discard
+        table.player_up = self.player_up[slot]
+        table.turns = self.turns[slot]
+        table.cards_drawn = self.cards_drawn[slot]
+        table.reshuffles = self.reshuffles[slot]
+        table.rng = GameRandom(self.seed, self.game_index[slot])
+        table.rng.shuffles = self.shuffles[slot]
+        table.dealt = True
+        for seat, player in enumerate(table.players):
+            player.mask = self.hands[4 * slot + seat]
+        # Seat the players last, so anything they set up when they sit down sees the whole position
+        for player in table.players:
+            player.sit(table)
+        return table
+
+
+def as_tuple(result):
+    return (result.winner, result.turns, result.cards_drawn, result.reshuffles)
+
+
+# Play games [0, games) of seed in a store and with the Engine, and check they all come out the same. Every tenth game
+# is also materialized partway through and played out from there as an Engine, which has to end the same way too, and
+# another tenth are played with a listener, which has to hear the same events as an Engine's subscriber. Returns the
+# number of games that didn't match, and the games/sec of each (playing them straight through, without the extras)
+def check(games, seed=0):
+    store = TableStore(seed)
+    store.reserve(1)
+    start = perf_counter()
+    compact_results = []
+    for game_index in range(games):
+        slot = store.open(game_index)
+        compact_results.append(as_tuple(store.play_out(slot)))
+        store.close(slot)
+    compact_time = perf_counter() - start
+    start = perf_counter()
+    engine_results = [as_tuple(Engine(rng=GameRandom(seed, game_index)).play()) for game_index in range(games)]
+    engine_time = perf_counter() - start
+    mismatches = sum(a != b for a, b in zip(compact_results, engine_results))
+    for game_index in range(0, games, 10):
+        slot = store.open(game_index)
+        result = None
+        for _ in range(game_index % 40):
+            result = store.step(slot)
+            if result is not None:
+                break
+        engine = store.materialize(slot)
+        mismatches += as_tuple(result or store.play_out(slot)) != engine_results[game_index]
+        mismatches += result is None and as_tuple(engine.play()) != engine_results[game_index]
+        store.close(slot)
+    for game_index in range(5, games, 10):
+        heard = []
+        slot = store.open(game_index, heard.append)
+        mismatches += as_tuple(store.play_out(slot)) != engine_results[game_index]
+        store.close(slot)
+        mismatches += list(Engine(rng=GameRandom(seed, game_index)).events()) != heard
+    return mismatches, games / compact_time, games / engine_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the compact table store against the Engine.')
+    parser.add_argument('--check', action='store_true', help='Play games both ways and compare them')
+    parser.add_argument('--games', type=int, default=5000, help='Games to play (default 5000)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if not args.check:
+        parser.error('nothing to do (try --check)')
+    mismatches, compact_rate, engine_rate = check(args.games, args.seed)
+    print(f'compact: {compact_rate:8.0f} games/sec')
+    print(f'engine:  {engine_rate:8.0f} games/sec')
+    print(f'{args.games - mismatches} of {args.games} games match' if mismatches else f'all {args.games} games match')
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,58 @@
-from card import Card
+from card import CARDS
 import random
 
 
+# A pile of cards kept as a stack, with the top card at the end of the list so drawing and adding are both O(1)
 class Deck:
     def __init__(self, cards=None):
         if cards is not None:
             self.cards = cards
         else:
-            # Instantiate a standard 52-card deck
-            self.cards = []
-            for num_rank in range(1, 14):
-                for suit in ['c', 's', 'h', 'd']:
-                    card = Card(num_rank, suit)
-                    self.cards.append(card)
+            # Start from a standard 52-card deck
+            self.cards = list(CARDS)
 
     def __len__(self):
         return len(self.cards)
 
-    # Shuffle the deck
-    def shuffle(self):
-        random.shuffle(self.cards)
+    # The card on top of the pile
+    @property
+    def top(self):
+        return self.cards[-1]
 
-    # Deal four hands with seven cards each
-    def deal_hands(self):
-        hands = [self.cards[0:28:4], self.cards[1:28:4], self.cards[2:28:4], self.cards[3:28:4]]
-        self.cards = self.cards[28:]
+    @top.setter
+    def top(self, card):
+        self.cards[-1] = card
+
+    # Shuffle the deck, optionally with a caller-supplied random number generator
+    def shuffle(self, rng=random):
+        rng.shuffle(self.cards)
+
+    # Deal hand_size cards to each of num_players hands, one at a time round the table, straight off the top of the pile
+    def deal_hands(self, num_players=4, hand_size=7):
+        hands = [[] for _ in range(num_players)]
+        cards = self.cards
+        for _ in range(hand_size):
+            for hand in hands:
+                hand.append(cards.pop())
         return hands
 
     # Take a card from the top of a pile (pop from the stack)
     def draw_card(self):
-        return self.cards.pop(0)
+        return self.cards.pop()
 
     # Add a card to the top of a pile (push to the stack)
     def add_card(self, card):
-        self.cards.insert(0, card)
\ No newline at end of file
+        self.cards.append(card)
+
+    # Turn everything under the top card of discard into this pile, which has to be empty. The two piles just trade
+    # lists and the top card goes back on discard, so nothing is copied. Eights go back in as themselves, no matter what
+    # suit they were declared as
+    def refill(self, discard):
+        if self.cards:
+            raise ValueError('only an empty pile can be refilled')
+        self.cards, discard.cards = discard.cards, self.cards
+        discard.cards.append(self.cards.pop())
+        cards = self.cards
+        for i, card in enumerate(cards):
+            if card.base is not card:
+                cards[i] = card.base
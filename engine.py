@@ -0,0 +1,201 @@
+import random
+
+from card import SUITS
+from deck import Deck
+from events import (DEAL, DRAW, NONE, PASS, PLAY, RESHUFFLE, STACK, START, SUIT, TURN, VICTORY, Event)
+from player import AIPlayer
+
+
+# Summary of a finished game. The winner is None if the game hit the turn limit
+class GameResult:
+    def __init__(self, winner, turns, cards_drawn, reshuffles):
+        self.winner = winner
+        self.turns = turns
+        self.cards_drawn = cards_drawn
+        self.reshuffles = reshuffles
+
+    def __repr__(self):
+        return f'GameResult(winner={self.winner}, turns={self.turns}, cards_drawn={self.cards_drawn}, reshuffles={self.reshuffles})'
+
+
+# Headless game engine. Plays by the same rules as Game.play, but never renders anything or waits on input() between
+# turns, so it can be used to simulate AI-only games in bulk. Everything that happens is published as an Event, either
+# to subscribers or through the events() generator
+class Engine:
+    # Under the AI policy a handful of eights can get passed around the table forever, so cap the game length
+    MAX_TURNS = 1000
+
+    # max_turns can be None for no limit
+    def __init__(self, players=None, rng=None, max_turns=MAX_TURNS):
+        # Default to a table of four AI players
+        if players is None:
+            players = [AIPlayer(i, verbose=False) for i in range(4)]
+        self.players = players
+        self.rng = rng if rng is not None else random
+        self.draw = Deck()
+        self.discard = Deck([])
+        self.player_up = 0
+        # Public record of every turn: (seat, number of cards drawn, card played or None for a pass)
+        self.history = []
+        self.subscribers = []
+        # Set once the cards are out, so a game restored from a snapshot doesn't get dealt again
+        self.dealt = False
+        self.max_turns = max_turns
+        self.turns = 0
+        self.cards_drawn = 0
+        self.reshuffles = 0
+
+    # Players write to the UI through this callback, but there's no UI to write to
+    def set_message(self, *messages, **kwargs):
+        pass
+
+    # Human players read their moves through this, but there's nobody to read them from, so the AI plays for them. Game
+    # reads them from its input (see inputs.py)
+    def read_move(self):
+        return None
+
+    # Have callback called with every Event from now on
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+
+    def emit(self, kind, seat=NONE, card=NONE, arg=0):
+        if self.subscribers:
+            event = Event(kind, seat, card, arg)
+            for callback in self.subscribers:
+                callback(event)
+
+    # Announce the order of the whole draw pile, top first
+    def emit_stack(self):
+        if self.subscribers:
+            for card in reversed(self.draw.cards):
+                self.emit(STACK, card=card.index)
+
+    # Seat the players and deal their hands
+    def deal_hands(self):
+        self.draw.shuffle(self.rng)
+        hands = self.draw.deal_hands()
+        for i, hand in enumerate(hands):
+            self.players[i].sit(self)
+            self.players[i].hand = hand
+        if self.subscribers:
+            for i in range(len(hands[0])):
+                for seat, hand in enumerate(hands):
+                    self.emit(DEAL, seat, hand[i].index)
+            self.emit_stack()
+
+    # Deal the hands and place one card face-up in the discard pile
+    def start(self):
+        self.deal_hands()
+        self.discard.add_card(self.draw.draw_card())
+        self.emit(START, card=self.discard.top.index)
+        self.dealt = True
+
+    # Shuffle the discard pile (sans the top card) and turn it into the draw pile, in place
+    def reshuffle(self):
+        self.draw.refill(self.discard)
+        self.draw.shuffle(self.rng)
+        self.reshuffles += 1
+        self.emit(RESHUFFLE, self.player_up)
+        self.emit_stack()
+
+    # Draw until a playable card comes up, then play it. Returns False if the player had to pass instead
+    def draw_until_playable(self, player):
+        # Work on the pile lists directly: this is the hottest loop in a long game. A reshuffle trades the lists around,
+        # so they have to be picked up again after one
+        draw = self.draw.cards
+        discard = self.discard.cards
+        while True:
+            if not draw:
+                self.reshuffle()
+                draw = self.draw.cards
+                discard = self.discard.cards
+                # Every other card is in somebody's hand, so there's nothing left to draw
+                if not draw:
+                    return False
+            new_card = draw.pop()
+            self.cards_drawn += 1
+            if self.subscribers:
+                self.emit(DRAW, self.player_up, new_card.index)
+            if new_card.plays_on(discard[-1]):
+                discard.append(new_card)
+                if self.subscribers:
+                    self.emit(PLAY, self.player_up, new_card.index)
+                return True
+            player.add_card(new_card)
+
+    # Play out a single turn for the player who's up
+    def take_turn(self):
+        player = self.players[self.player_up]
+        self.turns += 1
+        # Checking for subscribers here saves building events nobody's listening for in bulk simulations
+        if self.subscribers:
+            self.emit(TURN, self.player_up)
+        cards_drawn = self.cards_drawn
+        top = self.discard.cards[-1]
+        if player.can_play(top):
+            self.discard.cards.append(player.play_card(self.set_message, top))
+            if self.subscribers:
+                self.emit(PLAY, self.player_up, self.discard.cards[-1].index)
+        elif not self.draw_until_playable(player):
+            self.history.append((self.player_up, self.cards_drawn - cards_drawn, None))
+            self.emit(PASS, self.player_up)
+            return
+        discard = self.discard.cards
+        # ¡¡¡Los ochos son muy locos!!!
+        if discard[-1].num_rank == 8:
+            suit = player.choose_suit(self.set_message)
+            discard[-1] = discard[-1].declare(suit)
+            self.emit(SUIT, self.player_up, arg=SUITS.index(suit))
+        self.history.append((self.player_up, self.cards_drawn - cards_drawn, discard[-1]))
+
+    def result(self, winner):
+        return GameResult(winner, self.turns, self.cards_drawn, self.reshuffles)
+
+    # Whether the turn limit has been reached
+    def out_of_turns(self):
+        return self.max_turns is not None and self.turns >= self.max_turns
+
+    # Finish the turn just taken: the game's over if the player went out, otherwise the next player is up. Returns a
+    # GameResult if the game's over
+    def end_turn(self):
+        if self.players[self.player_up].mask == 0:
+            self.emit(VICTORY, self.player_up)
+            return self.result(self.player_up)
+        self.player_up = (self.player_up + 1) % 4
+        return None
+
+    # Play the next turn. Returns a GameResult if that ended the game, or if the turn limit has been reached
+    def step(self):
+        if self.out_of_turns():
+            return self.result(None)
+        self.take_turn()
+        return self.end_turn()
+
+    # Core game loop. Returns a GameResult once a player runs out of cards or the turn limit is reached
+    def play(self):
+        if not self.dealt:
+            self.start()
+        while True:
+            result = self.step()
+            if result is not None:
+                return result
+
+    # Play the game, yielding each Event as it happens. The GameResult is the generator's return value
+    def events(self):
+        buffer = []
+        self.subscribe(buffer.append)
+        try:
+            if not self.dealt:
+                self.start()
+            result = None
+            while result is None:
+                yield from buffer
+                buffer.clear()
+                result = self.step()
+            yield from buffer
+            return result
+        finally:
+            self.unsubscribe(buffer.append)
@@ -0,0 +1,137 @@
+import struct
+from collections import namedtuple
+
+from card import CARDS, SUITS
+
+# Every event is four small numbers: what happened, to which seat, with which card, and one extra kind-specific value
+Event = namedtuple('Event', ['kind', 'seat', 'card', 'arg'])
+
+# Event kinds
+DEAL = 0        # card is dealt into seat's hand
+STACK = 1       # card goes onto the bottom of the draw pile (sent for the whole pile, top first, after dealing and
+                # after every reshuffle)
+START = 2       # card is flipped off the top of the draw pile to start the discard pile
+TURN = 3        # seat is up
+PLAY = 4        # seat plays card onto the discard pile
+DRAW = 5        # seat draws card. Only the player who drew gets to know which card it was
+SUIT = 6        # seat declares the suit SUITS[arg] for the eight on top of the discard pile
+RESHUFFLE = 7   # the discard pile (sans the top card) is cleared out to be shuffled into the draw pile for seat
+PASS = 8        # seat has nothing to play and nothing to draw, so passes
+VICTORY = 9     # seat is out of cards and wins
+
+KIND_NAMES = ['DEAL', 'STACK', 'START', 'TURN', 'PLAY', 'DRAW', 'SUIT', 'RESHUFFLE', 'PASS', 'VICTORY']
+# Seat/card value for events that don't have one
+NONE = 255
+
+EVENT = struct.Struct('4B')
+MAGIC = b'LOCOLOG1'
+
+
+def describe(event):
+    card = '' if event.card == NONE else f' {CARDS[event.card].rank}{CARDS[event.card].suit}'
+    arg = f' {SUITS[event.arg]}' if event.kind == SUIT else ''
+    seat = '' if event.seat == NONE else f' seat {event.seat + 1}'
+    return f'{KIND_NAMES[event.kind]}{seat}{card}{arg}'
+
+
+# Subscriber that appends events to a log file, buffering them in memory and writing them out in large blocks
+class EventLogWriter:
+    def __init__(self, path, buffer_size=1 << 16):
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+
+    def __call__(self, event):
+        self.buffer += EVENT.pack(*event)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Every event in a log file, in order
+def read_events(path):
+    with open(path, 'rb') as file:
+        data = file.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f'{path} is not an event log')
+    return [Event._make(fields) for fields in EVENT.iter_unpack(memoryview(data)[len(MAGIC):])]
+
+
+# Rebuilds positions by applying events to a table (anything with players, draw, discard, and player_up, like an
+# Engine). A DEAL after the previous game's events starts the table over, so a log can hold any number of games
+class Replayer:
+    def __init__(self, table):
+        self.table = table
+        self.dealing = False
+        self.winner = None
+        self.handlers = [self.deal, self.stack, self.start, self.turn, self.play, self.draw, self.suit,
+                         self.reshuffle, self.ignore, self.victory]
+
+    def apply(self, event):
+        self.handlers[event.kind](event)
+
+    def replay(self, events):
+        for event in events:
+            self.handlers[event.kind](event)
+        return self.table
+
+    def deal(self, event):
+        if not self.dealing:
+            self.dealing = True
+            self.winner = None
+            for player in self.table.players:
+                player.table = self.table
+                player.mask = 0
+            self.table.draw.cards = []
+            self.table.discard.cards = []
+            self.table.player_up = 0
+        self.table.players[event.seat].add_card(CARDS[event.card])
+
+    def stack(self, event):
+        # STACK comes top first, so each card goes under the ones already there
+        self.table.draw.cards.insert(0, CARDS[event.card])
+
+    def start(self, event):
+        self.dealing = False
+        self.table.discard.add_card(self.table.draw.draw_card())
+
+    def turn(self, event):
+        self.dealing = False
+        self.table.player_up = event.seat
+
+    def play(self, event):
+        card = CARDS[event.card]
+        self.table.players[event.seat].remove_card(card)
+        self.table.discard.add_card(card)
+
+    def draw(self, event):
+        self.table.players[event.seat].add_card(self.table.draw.draw_card())
+
+    def suit(self, event):
+        self.table.discard.top = self.table.discard.top.declare(SUITS[event.arg])
+
+    def reshuffle(self, event):
+        self.table.draw.cards = []
+        self.table.discard.cards = self.table.discard.cards[-1:]
+
+    def ignore(self, event):
+        pass
+
+    def victory(self, event):
+        self.winner = event.seat
@@ -1,39 +1,67 @@
-from os import name, system
+from time import monotonic
 
 from colorama import Fore, Style, init
 
-from card import Card
-from deck import Deck
+from card import CARDS, Card
+from engine import Engine
+from events import DRAW, PASS, PLAY, RESHUFFLE, SUIT, TURN, VICTORY
+from inputs import terminal_input
 from message import Message
 from player import AIPlayer, HumanPlayer
+from renderer import FrameRenderer
+import snapshot
 
 
-class Game:
+# Terminal version of the game. The rules come from Engine, and the UI is just one more subscriber to its events
+class Game(Engine):
     def __init__(self, num_human_players=1, debug=False):
         # Initialize colorama to enable styled terminal output on Windows
         init()
-        self.num_human_players = num_human_players
-        self.players = []
+        players = []
         for i in range(4):
             if i < num_human_players:
-                self.players.append(HumanPlayer(i))
+                players.append(HumanPlayer(i))
             else:
-                self.players.append(AIPlayer(i, verbose=debug))
+                players.append(AIPlayer(i, verbose=debug))
+        # Humans can break an endless run of eights, so there's no turn limit
+        super().__init__(players, max_turns=None)
+        self.num_human_players = num_human_players
         self.debug = debug
         self.messages = [Message()]
-        self.draw = Deck()
-        self.discard = Deck([])
-        self.player_up = 0
         self.secret = False
+        self.renderer = FrameRenderer()
+        # If set, the game is checkpointed here at the start of every turn
+        self.save_path = None
+        # Cards drawn so far by the player who's up
+        self.turn_draws = 0
+        # Where the players' answers come from (see inputs.py)
+        self.input = terminal_input()
+        # Seconds a human gets for a turn before the AI takes it for them, or None for no limit
+        self.turn_time = None
+        # Seconds to show a status message before moving on without waiting for enter, or None to wait
+        self.auto_advance = None
+        # When the clock of the human who's up runs out, and whether it has
+        self.deadline = None
+        self.timed_out = False
+        self.handlers = {TURN: self.on_turn, DRAW: self.on_draw, PLAY: self.on_play, SUIT: self.on_suit,
+                         RESHUFFLE: self.on_reshuffle, PASS: self.on_pass, VICTORY: self.on_victory}
+        self.subscribe(self.on_event)
 
-    # Clear the screen with the appropriate terminal command for the system
-    def clear(self):
-        # Don't clear the screen in debug mode. This helps with debugging because it enables scrollback to see snapshots of game state change
-        if not self.debug:
-            if name == 'nt':
-                system('cls')
-            else:
-                system('clear')
+    # Save the current position as a one-snapshot file
+    def save(self, path):
+        snapshot.save(self, path)
+
+    # Load a game from a snapshot file and pick it up where it left off
+    @classmethod
+    def load(cls, path, debug=False, index=0):
+        with snapshot.SnapshotReader(path) as reader:
+            record = reader[index]
+        game = cls(snapshot.unpack_header(record)[1], debug)
+        snapshot.restore(game, record)
+        # Checkpoints are taken once a turn has started, and resuming starts that turn again
+        game.turns = max(game.turns - 1, 0)
+        game.dealt = True
+        return game
 
     # Renders a list of Message objects inside in a nice little box
     def render_ui_messages(self, messages, render_strs=[''] * 9, width=80, margin_left=10):
@@ -49,7 +77,7 @@ class Game:
     # Render a player's hand with cards if they're up and *'s if they're not
     def render_ui_hand(self, player, render_strs=[''] * 5, width=25, margin_left=10):
         padded_hand = []
-        hand = sorted([card for card in self.players[player].hand], key=lambda x: x.num_rank)
+        hand = self.players[player].hand
         if len(hand) > 12:
             half_cards = int(len(hand) / 2)
         else:
@@ -84,7 +112,7 @@ class Game:
         render_strs[0] += '╓─────────────╖'
         render_strs[1] += '║ Dicard Pile ║'
         render_strs[2] += '║' + \
-            Message(str(self.discard.cards[0])).center(13) + '║'
+            Message(str(self.discard.top)).center(13) + '║'
         render_strs[3] += '╙─────────────╜'
         render_strs[4] += '               '
         render_strs[5] += '╓─────────────╖'
@@ -114,148 +142,155 @@ class Game:
             self.messages = messages_list
         self.draw_game()
 
-    # Draw the visual elements
-    def draw_game(self):
-        self.clear()
-        # Helper method to print out a list of strings
-        def render(render_strs):
-            for render_str in render_strs:
-                print(render_str)
-
+    # Build the whole screen as a list of lines
+    def compose_frame(self):
         # Draw titlebar
-        print(' ' * 40, '╓───────────────────────────────────────────────────────╖')
-        print(' ' * 40, f'║                  {Style.BRIGHT}{Fore.GREEN}¡Los {Fore.LIGHTRED_EX}Ochos {Fore.WHITE}Locos!{Style.RESET_ALL}                    ║')
-        print(' ' * 40, '╙───────────────────────────────────────────────────────╜')
+        frame = [' ' * 40 + ' ╓───────────────────────────────────────────────────────╖',
+                 ' ' * 40 + f' ║                  {Style.BRIGHT}{Fore.GREEN}¡Los {Fore.LIGHTRED_EX}Ochos {Fore.WHITE}Locos!{Style.RESET_ALL}                    ║',
+                 ' ' * 40 + ' ╙───────────────────────────────────────────────────────╜']
 
         # Render the players' hands
         render_strs = [''] * 5
         render_strs = self.render_ui_hand(0, render_strs, margin_left=0)
         for player in range(1,4):
             render_strs = self.render_ui_hand(player, render_strs)
-        render(render_strs)
-        print()
+        frame.extend(render_strs)
+        frame.append('')
 
         # Render the card piles and the gameplay messages side by side
-        render(self.render_ui_messages(self.messages, self.render_ui_piles(), 103, 10))
-        print()
+        frame.extend(self.render_ui_messages(self.messages, self.render_ui_piles(), 103, 10))
+        frame.append('')
 
         if self.debug:
-            print('========================================================================')
-            print('DRAW:')
-            print(''.join(str(card) for card in self.draw.cards))
-            print('DISCARD:')
-            print(''.join(str(card) for card in self.discard.cards))
+            frame.append('========================================================================')
+            # Enough to deal this game again with --seed and --game-index
+            if hasattr(self.rng, 'game_index'):
+                frame.append(f'SEED: {self.rng.seed} GAME INDEX: {self.rng.game_index}')
+            frame.append('DRAW:')
+            frame.append(''.join(str(card) for card in reversed(self.draw.cards)))
+            frame.append('DISCARD:')
+            frame.append(''.join(str(card) for card in reversed(self.discard.cards)))
             for i in range(4):
-                print('PLAYER', i + 1, 'HAND:')
-                print(''.join(str(card) for card in self.players[i].hand))
-    
+                frame.append(f'PLAYER {i + 1} HAND:')
+                frame.append(''.join(str(card) for card in self.players[i].hand))
+        return frame
 
-    # Callback for the players to claim victory
-    def player_victory(self, player_num):
-        self.secret = True
-        self.set_message(f'{Style.BRIGHT}Player {player_num + 1} wins!!!{Style.RESET_ALL}')
-        input()
-        exit()
+    # Draw the visual elements. Only the lines that changed since the last frame get redrawn
+    def draw_game(self):
+        # Don't redraw in place in debug mode. This helps with debugging because it enables scrollback to see snapshots of game state change
+        if self.debug:
+            print('\n'.join(self.compose_frame()))
+        else:
+            self.renderer.render(self.compose_frame())
+
+    # Wait for the player who's up to enter a line, for as long as their turn clock has left. Returns None once it's
+    # run out (or the input has, which is the same as nobody answering), and from then on until the end of the turn,
+    # which the AI plays for them
+    def read_move(self):
+        if self.timed_out:
+            return None
+        try:
+            line = self.input.read_line(None if self.deadline is None else max(self.deadline - monotonic(), 0))
+        except EOFError:
+            line = None
+        self.timed_out = line is None
+        return line
 
-    # Deal hands to players
-    def deal_hands(self):
-        self.draw.shuffle()
-        hands = self.draw.deal_hands()
-        for i, hand in enumerate(hands):
-            self.players[i].hand = hand
+    # Wait for enter on a status message, or for auto_advance seconds. There's nothing to wait for once input runs out
+    def pause(self):
+        try:
+            self.input.read_line(self.auto_advance)
+        except EOFError:
+            pass
+
+    # Show what's happening as the engine reports it
+    def on_event(self, event):
+        handler = self.handlers.get(event.kind)
+        if handler is not None:
+            handler(event.seat, event)
 
-    # Increment/rollover the player_up variable and prevent peeking betwixt human players
-    def next_player(self):
-        last_player_up = self.player_up
-        self.player_up += 1
-        if self.player_up == 4:
-            self.player_up = 0
-        if self.num_human_players > 1 and self.players[self.player_up].is_human:
+    def on_turn(self, seat, event):
+        if self.save_path:
+            self.save(self.save_path)
+        self.turn_draws = 0
+        player = self.players[seat]
+        # Start the clock on a human's turn
+        self.deadline = monotonic() + self.turn_time if player.is_human and self.turn_time is not None else None
+        self.timed_out = False
+        # Prevent peeking betwixt human players
+        if self.turns > 1 and self.num_human_players > 1 and player.is_human:
             self.secret = True
-            self.set_message(*[f'Player {min(last_player_up + 1, self.num_human_players)}, quit peeking!',
-                                f'Player {self.player_up + 1}, you\'re up!',
+            self.set_message(*[f'Player {min((seat - 1) % 4 + 1, self.num_human_players)}, quit peeking!',
+                                f'Player {seat + 1}, you\'re up!',
                                 'Press enter when ready...'])
-            input()
+            # If they're not there, their hand stays hidden while the AI plays it
+            self.secret = self.read_move() is None
+        if self.timed_out:
+            self.set_message(f'Player {seat + 1} is out of time, so the AI takes their turn.')
+        elif player.can_play(self.discard.top):
+            self.set_message(f'{Style.BRIGHT}Player {seat + 1}, you\'re up!{Style.RESET_ALL}',
+                                'Choose a card to play. You can use the numbers 2-10, as well as letters A, J, Q, and K.',
+                                f'You can include the first letter of the suit: {Card.SPADES}, {Card.HEARTS}, {Card.CLUBS}, or {Card.DIAMONDS}.',
+                                f'You have {self.turn_time:g} seconds.' if self.deadline is not None else '',
+                                f'Playable cards: ' + ''.join(str(card) for card in player.playable_cards(self.discard.top)))
+        # If the player can't play, then they'll draw until they can
+        elif player.is_human:
+            self.set_message(f'{Style.BRIGHT}No cards can play.{Style.RESET_ALL} Press enter to draw.')
+            self.read_move()
+
+    def on_draw(self, seat, event):
+        self.turn_draws += 1
+        new_card = CARDS[event.card]
+        if self.players[seat].is_human and not new_card.plays_on(self.discard.top):
+            self.set_message(f'You draw {str(new_card)}. Press enter to draw again.')
+            self.read_move()
+
+    def on_play(self, seat, event):
+        if self.timed_out:
+            self.secret = True
+            self.set_message(f'Player {seat + 1} ran out of time, so the AI plays {str(CARDS[event.card])} for them.',
+                                'Press enter to continue...')
+            self.pause()
+            self.secret = False
+        elif self.turn_draws:
+            card_or_cards = 'cards' if self.turn_draws > 1 else 'card'
+            self.secret = True
+            self.set_message(f'Player {seat + 1} draws a total of {self.turn_draws} {card_or_cards} and plays a {str(CARDS[event.card])}.',
+                                'Press enter to continue...')
+            self.pause()
+            self.secret = False
+        elif not self.players[seat].is_human:
+            self.secret = True
+            self.set_message(f'Player {seat + 1} plays {str(CARDS[event.card])}.',
+                                'Press enter to continue...')
+            self.pause()
             self.secret = False
 
-    # Core game loop
-    def play(self):
-        # Start a game by dealing the hands and placing one card face-up in the discard pile
-        self.deal_hands()
-        self.discard.add_card(self.draw.draw_card())
-        # Keep going until a player runs out of cards
-        while all(len(player.hand) > 0 for player in self.players):
-            # Check if player can play
-            if self.players[self.player_up].can_play(self.discard.cards[0]):
-                self.set_message(f'{Style.BRIGHT}Player {self.player_up + 1}, you\'re up!{Style.RESET_ALL}',
-                                    'Choose a card to play. You can use the numbers 2-10, as well as letters A, J, Q, and K.',
-                                    f'You can include the first letter of the suit: {Card.SPADES}, {Card.HEARTS}, {Card.CLUBS}, or {Card.DIAMONDS}.',
-                                    '',
-                                    f'Playable cards: ' + ''.join(str(card) for card in self.players[self.player_up].playable_cards(self.discard.cards[0])))
-                self.discard.add_card(self.players[self.player_up].play_card(self.set_message, self.discard.cards[0]))
-                if not self.players[self.player_up].is_human:
-                    self.secret = True
-                    self.set_message(f'Player {self.player_up + 1} plays {str(self.discard.cards[0])}.',
-                                        'Press enter to continue...')
-                    input()
-                    self.secret = False
-                # ¡¡¡Los ochos son muy locos!!!
-                if self.discard.cards[0].num_rank == 8:
-                    self.discard.cards[0].suit = self.players[self.player_up].choose_suit(self.set_message)
-                    self.secret = True
-                    self.set_message(f'Player {self.player_up + 1} chooses {self.discard.cards[0].get_suit()} as the new suit!',
-                                        'Press enter to continue...')
-                    self.secret = False
-                    input()
-            # If the player can't play, then draw until they can
-            else:
-                if self.players[self.player_up].is_human:
-                    self.set_message(f'{Style.BRIGHT}No cards can play.{Style.RESET_ALL} Press enter to draw.')
-                    input()
-                cards_drawn = 0
-                while True:
-                    # Make sure there are cards available to draw
-                    if len(self.draw.cards) > 0:
-                        new_card = self.draw.draw_card()
-                        cards_drawn += 1
-                        if new_card.plays_on(self.discard.cards[0]):
-                            self.discard.add_card(new_card)
-                            self.secret = True
-                            if cards_drawn > 1:
-                                card_or_cards = 'cards'
-                            else:
-                                card_or_cards = 'card'
-                            self.set_message(f'Player {self.player_up + 1} draws a total of {cards_drawn} {card_or_cards} and plays a {str(new_card)}.',
-                                                'Press enter to continue...')
-                            input()
-                            if self.discard.cards[0].num_rank == 8:
-                                self.discard.cards[0].suit = self.players[self.player_up].choose_suit(self.set_message)
-                                self.secret = True
-                                self.set_message(f'Player {self.player_up + 1} chooses {self.discard.cards[0].get_suit()} as the new suit!',
-                                                    'Press enter to continue...')
-                                self.secret = False
-                                input()
-                            self.secret = False
-                            break
-                        else:
-                            self.players[self.player_up].hand.append(new_card)
-                            if self.players[self.player_up].is_human:
-                                self.set_message(f'You draw {str(new_card)}. Press enter to draw again.')
-                                input()
+    # ¡¡¡Los ochos son muy locos!!!
+    def on_suit(self, seat, event):
+        self.secret = True
+        self.set_message(f'Player {seat + 1} chooses {self.discard.top.get_suit()} as the new suit!',
+                            'Press enter to continue...')
+        self.secret = False
+        self.pause()
 
-                    else:
-                        # Shuffle the discard pile (sans the top card) and turn it into the draw pile if the draw pile is empty
-                        if not self.players[self.player_up].is_human:
-                            self.secret = True
-                        self.set_message('Shuffling deck. Press enter to continue...')
-                        input()
-                        self.secret = False
-                        self.draw = Deck(self.discard.cards[1:])
-                        self.draw.shuffle()
-                        self.discard.cards = [self.discard.cards[0]]
-            # Rotate to the next player
-            self.next_player()
-            
-        # Looks like somebody won!
-        self.player_victory(self.player_up - 1)
-            
\ No newline at end of file
+    # The discard pile (sans the top card) was shuffled into a new draw pile
+    def on_reshuffle(self, seat, event):
+        if not self.players[seat].is_human:
+            self.secret = True
+        self.set_message('Shuffling deck. Press enter to continue...')
+        self.pause()
+        self.secret = False
+
+    def on_pass(self, seat, event):
+        self.secret = True
+        self.set_message(f'Player {seat + 1} has nothing to play and nothing to draw, so they pass.',
+                            'Press enter to continue...')
+        self.pause()
+        self.secret = False
+
+    # Looks like somebody won!
+    def on_victory(self, seat, event):
+        self.secret = True
+        self.set_message(f'{Style.BRIGHT}Player {seat + 1} wins!!!{Style.RESET_ALL}')
+        self.pause()
@@ -0,0 +1,209 @@
+from card import PLAYABLE, SUIT_MASKS, SUITS, mask_of, popcount
+from events import DRAW, PASS, PLAY, RESHUFFLE, START, SUIT, TURN
+from player import AIPlayer
+
+FULL_DECK = (1 << 52) - 1
+# Rounds of fitting the per-location weights to the hand sizes when probabilities are recomputed
+FIT_ROUNDS = 8
+
+
+# Indices of the cards in a mask
+def indices(mask):
+    result = []
+    while mask:
+        low = mask & -mask
+        result.append(low.bit_length() - 1)
+        mask ^= low
+    return result
+
+
+# What one seat can work out about the cards it can't see, from public information only: what's been played, who drew
+# and on what, and which suits were called. Opponents' draws only say that they drew, never what. Everything is kept as
+# bitmasks that each event changes in place, so keeping up costs a few mask operations per event no matter how long the
+# game has gone on.
+#
+# The key fact is that a player who draws had nothing playable on the top card. Once they've kept a card they drew, the
+# only thing known about the whole hand is that none of it plays on the top card they drew on, so that's what their
+# impossible mask becomes; a player who draws one card and plays it keeps everything known before as well
+class Inference:
+    def __init__(self, table, seat):
+        self.table = table
+        self.seat = seat
+        self.opponents = [(seat + i) % 4 for i in range(1, 4)]
+        # Cards face-up in the discard pile
+        discard = table.discard.cards
+        self.seen = mask_of(card.base for card in discard)
+        self.top_index = discard[-1].base.index if discard else 0
+        self.top = discard[-1].code if discard else 0
+        # impossible[seat] is a mask of cards that seat can't be holding
+        self.impossible = [0, 0, 0, 0]
+        # Draws so far this turn by the player who's up
+        self.turn_draws = 0
+        # Bumped on every change, so cached probabilities know when they're stale
+        self.version = 0
+        self.cache_version = -1
+        self.groups = []
+        self.handlers = {START: self.on_start, TURN: self.on_turn, PLAY: self.on_play, DRAW: self.on_draw,
+                         SUIT: self.on_suit, RESHUFFLE: self.on_reshuffle, PASS: self.on_pass}
+        table.subscribe(self.on_event)
+
+    def on_event(self, event):
+        handler = self.handlers.get(event.kind)
+        if handler is not None:
+            handler(event)
+            self.version += 1
+
+    def on_start(self, event):
+        self.seen |= 1 << event.card
+        self.top_index = self.top = event.card
+
+    def on_turn(self, event):
+        self.turn_draws = 0
+
+    def on_draw(self, event):
+        if event.seat != self.seat:
+            self.impossible[event.seat] |= PLAYABLE[self.top]
+        self.turn_draws += 1
+
+    def on_play(self, event):
+        # A player who drew before playing kept every card they drew but the last
+        if event.seat != self.seat and self.turn_draws > 1:
+            self.impossible[event.seat] = PLAYABLE[self.top]
+        self.seen |= 1 << event.card
+        self.top_index = self.top = event.card
+
+    def on_pass(self, event):
+        if event.seat != self.seat:
+            if self.turn_draws:
+                self.impossible[event.seat] = PLAYABLE[self.top]
+            else:
+                self.impossible[event.seat] |= PLAYABLE[self.top]
+
+    def on_suit(self, event):
+        self.top = 28 + event.arg
+
+    # Everything under the top card goes back into the draw pile, out of sight
+    def on_reshuffle(self, event):
+        self.seen = 1 << self.top_index
+
+    # Cards this seat can't account for: not in its hand and not face-up
+    def unseen(self):
+        return FULL_DECK & ~self.seen & ~self.table.players[self.seat].mask
+
+    # Masks of the cards each opponent (and the draw pile) could be holding
+    def eligible(self):
+        unseen = self.unseen()
+        masks = [unseen & ~self.impossible[opponent] for opponent in self.opponents]
+        masks.append(unseen if len(self.table.draw) else 0)
+        return masks
+
+    def sizes(self):
+        players = self.table.players
+        return [players[opponent].hand_size() for opponent in self.opponents] + [len(self.table.draw)]
+
+    # Unseen cards grouped by where they could be: each of the three opponents (in seat order after this one) and the
+    # draw pile. Within a group every card has the same chance of being in each location: a weight per location,
+    # normalized over the group's locations, with the weights fitted so each location's expected number of cards matches
+    # its actual size. There are at most 15 groups, so this costs the same however many cards are unseen, and it's only
+    # redone after something has changed. Returns [(mask, [probability per location])]
+    def probability_groups(self):
+        if self.cache_version == self.version:
+            return self.groups
+        eligible = self.eligible()
+        sizes = self.sizes()
+        groups = []
+        for locations in range(1, 16):
+            mask = self.unseen()
+            for location in range(4):
+                mask &= eligible[location] if locations >> location & 1 else ~eligible[location]
+            if mask:
+                groups.append((mask, popcount(mask), [location for location in range(4) if locations >> location & 1]))
+        weights = [1.0 if size else 0.0 for size in sizes]
+        for _ in range(FIT_ROUNDS):
+            expected = [0.0] * 4
+            for mask, count, locations in groups:
+                total = sum(weights[location] for location in locations)
+                if total:
+                    for location in locations:
+                        expected[location] += count * weights[location] / total
+            weights = [weights[location] * sizes[location] / expected[location] if expected[location] else 0.0
+                       for location in range(4)]
+        self.groups = []
+        for mask, count, locations in groups:
+            total = sum(weights[location] for location in locations)
+            probabilities = [0.0] * 4
+            if total:
+                for location in locations:
+                    probabilities[location] = weights[location] / total
+            self.groups.append((mask, probabilities))
+        self.cache_version = self.version
+        return self.groups
+
+    # Chance that seat is holding the card with the given index
+    def probability(self, seat, index):
+        location = self.opponents.index(seat)
+        for mask, probabilities in self.probability_groups():
+            if mask >> index & 1:
+                return probabilities[location]
+        return 0.0
+
+    # Chance that seat is holding at least one of the cards in mask (treating the cards as independent)
+    def holds_any(self, seat, mask):
+        location = self.opponents.index(seat)
+        miss = 1.0
+        for group_mask, probabilities in self.probability_groups():
+            count = popcount(group_mask & mask)
+            if count:
+                miss *= (1.0 - probabilities[location]) ** count
+        return 1.0 - miss
+
+    # Chance that seat has something to play on a top card with the given code
+    def can_play(self, seat, code):
+        return self.holds_any(seat, PLAYABLE[code])
+
+    # Deal the unseen cards out at random in a way that fits everything known: every opponent gets the right number of
+    # cards, none of them impossible, and the rest go in the draw pile. The most constrained opponents are dealt first.
+    # Returns the four hands (this seat's real one included) and the draw pile, or None if no deal turned up in tries
+    def sample(self, rng, tries=20):
+        eligible = self.eligible()
+        sizes = self.sizes()
+        order = sorted(range(3), key=lambda location: popcount(eligible[location]) - sizes[location])
+        for _ in range(tries):
+            remaining = self.unseen()
+            hands = [0, 0, 0, 0]
+            for location in order:
+                pool = indices(remaining & eligible[location])
+                if len(pool) < sizes[location]:
+                    break
+                for index in rng.sample(pool, sizes[location]):
+                    hands[self.opponents[location]] |= 1 << index
+                remaining &= ~hands[self.opponents[location]]
+            else:
+                hands[self.seat] = self.table.players[self.seat].mask
+                draw = indices(remaining)
+                rng.shuffle(draw)
+                return hands, draw
+        return None
+
+
+# AI player that keeps track of what the others can't be holding, and calls suits the next player is unlikely to be able
+# to follow. Everything else is the same as AIPlayer
+class InferenceAIPlayer(AIPlayer):
+    # How many of its own cards in a suit the player will give up to make the next player likelier to have to draw
+    RISK_WEIGHT = 8.0
+
+    def __init__(self, player_num, **kwargs):
+        super().__init__(player_num, verbose=kwargs.get('verbose', False))
+        self.inference = None
+
+    def sit(self, table):
+        super().sit(table)
+        self.inference = Inference(table, self.player_num)
+
+    def choose_suit(self, set_message):
+        next_seat = (self.player_num + 1) % 4
+
+        def value(suit):
+            risk = self.inference.can_play(next_seat, 28 + SUITS.index(suit))
+            return popcount(self.mask & SUIT_MASKS[suit]) - self.RISK_WEIGHT * risk
+        return max('cdhs', key=value)
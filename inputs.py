@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# Where the terminal game's input comes from. Game and HumanPlayer ask for a line with a timeout instead of calling
+# input(), so nobody can hold the game up for longer than their clock: a human who doesn't answer in time has the AI
+# take their turn, and status messages can move on by themselves (see Game.read_move and Game.pause). There are three
+# sources, all with read_line(timeout):
+#     TerminalInput   the terminal or a pipe, waited on with a selector (POSIX)
+#     BlockingInput   plain input(), with no time limits, where stdin can't be waited on (Windows consoles)
+#     ScriptedInput   a list of lines, with None for a player who doesn't answer, for scripted games
+# Run it on its own to check that a table of humans who never answer plays the same games as the AI:
+#     python inputs.py --check --games 50
+import argparse
+import codecs
+import contextlib
+import io
+import os
+import selectors
+import sys
+from itertools import repeat
+from time import monotonic, perf_counter
+
+
+# Lines from the terminal (or whatever's piped in). The file descriptor is read directly, since lines already sitting in
+# sys.stdin's buffer would be invisible to the selector. That also means anything read through sys.stdin (like input())
+# can swallow lines meant for a TerminalInput, so everything a game reads has to go through the same one
+class TerminalInput:
+    def __init__(self, stream=None):
+        self.stream = stream
+        # Set up on the first read, so a game that's never waited on input doesn't need a stdin
+        self.fd = None
+        self.selector = None
+        self.decoder = None
+        self.buffer = ''
+        self.ended = False
+
+    # The next line, without its newline, or None if timeout seconds go by first (None waits as long as it takes). Raises
+    # EOFError once the input has run out, like input()
+    def read_line(self, timeout=None):
+        if self.selector is None:
+            stream = self.stream if self.stream is not None else sys.stdin
+            self.fd = stream.fileno()
+            self.decoder = codecs.getincrementaldecoder(getattr(stream, 'encoding', None) or 'utf-8')('replace')
+            # select() is the one selector that takes regular files too, for input redirected from one
+            self.selector = selectors.SelectSelector()
+            self.selector.register(self.fd, selectors.EVENT_READ)
+        deadline = None if timeout is None else monotonic() + timeout
+        while '\n' not in self.buffer:
+            if self.ended:
+                if not self.buffer:
+                    raise EOFError
+                line, self.buffer = self.buffer, ''
+                return line
+            if not self.selector.select(None if deadline is None else max(deadline - monotonic(), 0)):
+                return None
+            data = os.read(self.fd, 4096)
+            self.buffer += self.decoder.decode(data, final=not data)
+            self.ended = not data
+        line, self.buffer = self.buffer.split('\n', 1)
+        return line.rstrip('\r')
+
+
+# input(), for consoles that can't be waited on with a timeout. A timeout is ignored, so there's no clock
+class BlockingInput:
+    def read_line(self, timeout=None):
+        return input()
+
+
+# Lines from a list (or any iterable), for scripted games. None stands for a player who doesn't answer: a read with a
+# timeout times out on it straight away, and a read without one goes on to the next line
+class ScriptedInput:
+    def __init__(self, lines):
+        self.lines = iter(lines)
+
+    def read_line(self, timeout=None):
+        for line in self.lines:
+            if line is not None:
+                return line
+            if timeout is not None:
+                return None
+        raise EOFError
+
+
+# The input for a game at this terminal
+def terminal_input():
+    return BlockingInput() if os.name == 'nt' else TerminalInput()
+
+
+# Play games [0, games) of seed as Games with four human seats that never answer, each one on a turn clock and with
+# status messages moving on by themselves, and as all-AI Engines. The humans' clocks run out every turn, so the AI
+# plays for them and the games have to come out the same. Returns the number that didn't, and the Games' games/sec
+def check(games, seed=0):
+    from engine import Engine
+    from game import Game
+    from rng import GameRandom
+    mismatches = 0
+    start = perf_counter()
+    for game_index in range(games):
+        game = Game(4)
+        game.rng = GameRandom(seed, game_index)
+        game.max_turns = Engine.MAX_TURNS
+        game.input = ScriptedInput(repeat(None))
+        game.turn_time = game.auto_advance = 30
+        game.renderer.stream = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = game.play()
+        expected = Engine(rng=GameRandom(seed, game_index)).play()
+        mismatches += (result.winner, result.turns) != (expected.winner, expected.turns)
+    return mismatches, games / (perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that players who time out are played for by the AI.')
+    parser.add_argument('--check', action='store_true', help='Play silent human tables against the AI and compare')
+    parser.add_argument('--games', type=int, default=50, help='Games to play (default 50)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if not args.check:
+        parser.error('nothing to do (try --check)')
+    mismatches, rate = check(args.games, args.seed)
+    print(f'{rate:.1f} games/sec')
+    print(f'{args.games - mismatches} of {args.games} games match' if mismatches else f'all {args.games} games match')
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+import random
+from math import log, sqrt
+from time import perf_counter
+
+from card import CARDS, EIGHTS, PLAYABLE, SUIT_MASKS, SUITS, mask_of, popcount
+from inference import Inference
+from player import AIPlayer
+from state import encode_play
+
+FULL_DECK = (1 << 52) - 1
+# Moves are encoded as small ints: (code the top card plays as << 6) | card index. Drawing until playable is one move
+DRAW = -1
+# Playouts that run longer than this are scored as nobody winning
+MAX_PLAYOUT_TURNS = 300
+EXPLORATION = 0.7
+
+
+# Public record of a turn (as kept in a table's history) turned into the move it corresponds to
+def history_move(drew, card):
+    if drew or card is None:
+        return DRAW
+    return encode_play(card.index, card.code)
+
+
+# The suit AIPlayer.choose_suit would pick for a hand
+def default_suit_code(hand):
+    best_suit, best_count = 'c', -1
+    for suit in 'cdhs':
+        count = popcount(hand & SUIT_MASKS[suit])
+        if count > best_count:
+            best_suit, best_count = suit, count
+    return 28 + SUITS.index(best_suit)
+
+
+# Every move a hand can make on a top card with the given code. Eights can be played as any of the four suits
+def legal_moves(hand, top):
+    playable = hand & PLAYABLE[top]
+    if not playable:
+        return [DRAW]
+    moves = []
+    while playable:
+        low = playable & -playable
+        index = low.bit_length() - 1
+        if low & EIGHTS:
+            moves.extend(encode_play(index, 28 + suit) for suit in range(4))
+        else:
+            moves.append(encode_play(index, index))
+        playable ^= low
+    return moves
+
+
+# One guess at the hidden information: every hand and the draw pile are filled in. Cards are plain indices and hands
+# are masks, so playouts never touch Card, Deck, or any UI objects
+class Determinization:
+    __slots__ = ('hands', 'draw', 'discard', 'top_index', 'top', 'player_up', 'winner', 'turns')
+
+    def __init__(self, hands, draw, discard, top_index, top, player_up):
+        self.hands = hands
+        # The draw pile is drawn from the end of the list. The discard pile doesn't include the top card, whose index is
+        # top_index and which plays as the code top
+        self.draw = draw
+        self.discard = discard
+        self.top_index = top_index
+        self.top = top
+        self.player_up = player_up
+        self.winner = None
+        self.turns = 0
+
+    def legal_moves(self):
+        return legal_moves(self.hands[self.player_up], self.top)
+
+    # Play out a move for the player who's up, then pass the turn
+    def apply(self, move, rng):
+        seat = self.player_up
+        if move == DRAW:
+            playable = PLAYABLE[self.top]
+            while True:
+                if not self.draw:
+                    # Shuffle the discard pile (sans the top card) into the draw pile
+                    self.draw, self.discard = self.discard, self.draw
+                    rng.shuffle(self.draw)
+                    if not self.draw:
+                        break
+                index = self.draw.pop()
+                if playable >> index & 1:
+                    self.discard.append(self.top_index)
+                    self.top_index = index
+                    self.top = index if index // 4 != 7 else default_suit_code(self.hands[seat])
+                    break
+                self.hands[seat] |= 1 << index
+        else:
+            index = move & 63
+            self.hands[seat] &= ~(1 << index)
+            self.discard.append(self.top_index)
+            self.top_index = index
+            self.top = move >> 6
+            if not self.hands[seat]:
+                self.winner = seat
+        self.player_up = (seat + 1) % 4
+        self.turns += 1
+
+    # Finish the game with every player following the AIPlayer policy. Returns the winner, or None for a stalemate
+    def playout(self, rng):
+        hands = self.hands
+        while self.winner is None and self.turns < MAX_PLAYOUT_TURNS:
+            playable = hands[self.player_up] & PLAYABLE[self.top]
+            if not playable:
+                self.apply(DRAW, rng)
+                continue
+            if playable & ~EIGHTS:
+                playable &= ~EIGHTS
+            index = (playable & -playable).bit_length() - 1
+            seat = self.player_up
+            if index // 4 == 7:
+                self.apply(encode_play(index, default_suit_code(hands[seat] & ~(1 << index))), rng)
+            else:
+                self.apply(encode_play(index, index), rng)
+        return self.winner
+
+
+# Deal out the cards player can't see at random, with every opponent's hand the right size, as a position with player up.
+# With an Inference, the deal also keeps to what's known about the opponents' hands whenever it can
+def determinize(player, rng, inference=None):
+    table = player.table
+    top = table.discard.top
+    discard = [card.base.index for card in table.discard.cards[:-1]]
+    deal = inference.sample(rng) if inference is not None else None
+    if deal is not None:
+        hands, cards = deal
+        return Determinization(hands, cards, discard, top.base.index, top.code, player.player_num)
+    unseen = FULL_DECK & ~player.mask & ~mask_of(table.discard.cards)
+    cards = [index for index in range(52) if unseen >> index & 1]
+    rng.shuffle(cards)
+    hands = []
+    for seat, other in enumerate(table.players):
+        if seat == player.player_num:
+            hands.append(player.mask)
+        else:
+            hand = 0
+            for index in cards[:other.hand_size()]:
+                hand |= 1 << index
+            hands.append(hand)
+            del cards[:other.hand_size()]
+    return Determinization(hands, cards, discard, top.base.index, top.code, player.player_num)
+
+
+# Search tree node. player is the seat that made the move leading here, and wins counts the playouts that seat won
+class Node:
+    __slots__ = ('player', 'children', 'visits', 'wins', 'avails')
+
+    def __init__(self, player):
+        self.player = player
+        self.children = {}
+        self.visits = 0
+        self.wins = 0
+        self.avails = 1
+
+
+# AI player that picks moves with single-observer information set Monte Carlo tree search. Each iteration deals the
+# unseen cards out at random, consistent with what this player can see, and searches that deal. Searching stops when
+# either the time limit or the playout limit is reached, and the part of the tree below the moves actually made is
+# kept for the next turn
+class SearchAIPlayer(AIPlayer):
+    def __init__(self, player_num, time_limit=0.5, playouts=None, rng=None, inference=False, **kwargs):
+        super().__init__(player_num, verbose=kwargs.get('verbose', False))
+        # Whether to deal the hidden cards to fit what can be inferred about the opponents' hands
+        self.use_inference = inference
+        self.inference = None
+        self.time_limit = time_limit
+        self.max_playouts = playouts
+        self.rng = rng if rng is not None else random.Random()
+        self.root = None
+        self.root_table = None
+        self.history_seen = 0
+        self.pending_suit = None
+        # Running totals for reporting playouts/sec
+        self.playouts = 0
+        self.search_time = 0.0
+
+    def playout_rate(self):
+        return self.playouts / self.search_time if self.search_time else 0.0
+
+    def sit(self, table):
+        super().sit(table)
+        if self.use_inference:
+            self.inference = Inference(table, self.player_num)
+
+    def determinize(self, rng):
+        return determinize(self, rng, self.inference)
+
+    # Follow the moves made since this player's last turn down the tree, or start over if they weren't explored
+    def advance_root(self):
+        history = self.table.history
+        if self.root is None or self.root_table is not self.table or len(history) < self.history_seen:
+            return Node(None)
+        node = self.root
+        for seat, drew, card in history[self.history_seen:]:
+            node = node.children.get(history_move(drew, card))
+            if node is None:
+                return Node(None)
+        return node
+
+    def iterate(self, root, state, rng):
+        node = root
+        path = [root]
+        while state.winner is None:
+            moves = state.legal_moves()
+            untried = [move for move in moves if move not in node.children]
+            if untried:
+                move = rng.choice(untried)
+                child = node.children[move] = Node(state.player_up)
+                for other in moves:
+                    if other in node.children:
+                        node.children[other].avails += 1
+                child.avails = 1
+                state.apply(move, rng)
+                path.append(child)
+                break
+            best, best_score = None, -1.0
+            for move in moves:
+                child = node.children[move]
+                child.avails += 1
+                score = child.wins / child.visits + EXPLORATION * sqrt(log(child.avails) / child.visits)
+                if score > best_score:
+                    best, best_score = move, score
+            state.apply(best, rng)
+            node = node.children[best]
+            path.append(node)
+        winner = state.playout(rng)
+        for node in path:
+            node.visits += 1
+            if winner is not None and node.player == winner:
+                node.wins += 1
+
+    def search(self, card_up):
+        root = self.advance_root()
+        legal = legal_moves(self.mask, card_up.code)
+        if len(legal) == 1:
+            return root, legal[0]
+        start = perf_counter()
+        deadline = start + self.time_limit if self.time_limit else None
+        playouts = 0
+        while (self.max_playouts is None or playouts < self.max_playouts) and \
+                (deadline is None or perf_counter() < deadline):
+            self.iterate(root, self.determinize(self.rng), self.rng)
+            playouts += 1
+        elapsed = perf_counter() - start
+        self.playouts += playouts
+        self.search_time += elapsed
+        self.print_message(f'Player {self.player_num + 1} searched {playouts} playouts '
+                           f'({playouts / max(elapsed, 1e-9):.0f}/sec)')
+        move = max(legal, key=lambda move: root.children[move].visits if move in root.children else -1)
+        return root, move
+
+    def play_card(self, set_message, card_up):
+        root, move = self.search(card_up)
+        # Keep the subtree below this move, and remember where the history was so the next turn can pick up from it
+        self.root = root.children.get(move) or Node(self.player_num)
+        self.root_table = self.table
+        self.history_seen = len(self.table.history) + 1
+        card = CARDS[move & 63]
+        if card.num_rank == 8:
+            self.pending_suit = SUITS[(move >> 6) % 4]
+        self.remove_card(card)
+        return card
+
+    def choose_suit(self, set_message):
+        # Eights picked by the search come with a suit. Eights that were drawn use the usual heuristic
+        if self.pending_suit is not None:
+            suit, self.pending_suit = self.pending_suit, None
+            return suit
+        return super().choose_suit(set_message)
@@ -2,27 +2,63 @@
 
 import sys
 import argparse
-from game import Game
-from pyfiglet import Figlet
+from os import cpu_count
 from colorama import Style, Fore
 from os import name, system
+import banner
+
+# The game, the search AI, the profiler, and the simulator are imported where they're used, so a run only pays to load
+# what it needs
 
 
 def print_welcome():
     if name == 'nt':
         system('cls')
     else:
-        system('clear')
-    f = Figlet(font='alligator', width=120)
+        print('\033[2J\033[H', end='')
+    los, ochos, locos = banner.render()
     print(Style.BRIGHT + Fore.LIGHTRED_EX +
           '\n' + '-' * 110 + '\n' + Style.RESET_ALL)
-    print(f'{Style.BRIGHT}{Fore.GREEN}{f.renderText("      L   O S")}{Style.RESET_ALL}')
-    print(f'{Style.BRIGHT}{Fore.LIGHTRED_EX}{f.renderText("            O C H O S")}{Style.RESET_ALL}')
-    print(f'{Style.BRIGHT}{Fore.WHITE}{f.renderText("                     L     O C O S")}{Style.RESET_ALL}')
+    print(f'{Style.BRIGHT}{Fore.GREEN}{los}{Style.RESET_ALL}')
+    print(f'{Style.BRIGHT}{Fore.LIGHTRED_EX}{ochos}{Style.RESET_ALL}')
+    print(f'{Style.BRIGHT}{Fore.WHITE}{locos}{Style.RESET_ALL}')
     print(Style.BRIGHT + Fore.LIGHTGREEN_EX +
           '\n' + '-' * 110 + '\n' + Style.RESET_ALL)
 
 
+# Human seats come first, so only the AI seats can be handed to the search AI
+def check_search_seats(parser, search_seats, num_human_players):
+    human_seats = sorted(seat + 1 for seat in search_seats if seat < num_human_players)
+    if human_seats:
+        parser.error(f'--search-ai seats must be AI seats, but seat{"s" if len(human_seats) > 1 else ""} '
+                     f'{", ".join(map(str, human_seats))} {"are" if len(human_seats) > 1 else "is"} human '
+                     f'with {num_human_players} human player{"s" if num_human_players > 1 else ""}')
+
+
+def start_game(game, search_seats, search_options, args):
+    for seat in search_seats:
+        from ismcts import SearchAIPlayer
+        player = SearchAIPlayer(seat, **search_options)
+        # A resumed game already has its cards out, so the new player takes over the old one's hand
+        if game.dealt:
+            player.sit(game)
+            player.mask = game.players[seat].mask
+        game.players[seat] = player
+    if not (args.profile or args.profile_out):
+        game.play()
+        return
+    from profiler import Profiler
+    profiler = Profiler()
+    profiler.instrument(game)
+    try:
+        game.play()
+    finally:
+        profiler.uninstrument()
+        print(profiler.summary())
+        if args.profile_out:
+            profiler.dump(args.profile_out)
+
+
 def main():
     # Check for command-line arguments
     parser = argparse.ArgumentParser(
@@ -31,11 +67,69 @@ def main():
                         choices=range(1,5), metavar='1-4', help='Set number of human players')
     parser.add_argument('-D', '--debug', action='store_true',
                         help='Run in debug mode')
+    parser.add_argument('--no-banner', action='store_true',
+                        help='Skip the welcome banner')
     parser.add_argument('--test', action='store_true',
                         help='Jump straight to current test')
+    parser.add_argument('--simulate', type=int, metavar='N',
+                        help='Simulate N all-AI games and print statistics instead of playing')
+    parser.add_argument('--jobs', type=int, default=cpu_count() or 1, metavar='K',
+                        help='Number of worker processes for --simulate (default: all cores)')
+    parser.add_argument('--seed', type=int,
+                        help='Random seed for the deal, or for --simulate (default: random, or 0 for --simulate)')
+    parser.add_argument('--game-index', type=int, metavar='N',
+                        help='Deal game N of --seed, or start --simulate at game N so a run can be split up (default 0)')
+    parser.add_argument('--save', metavar='PATH',
+                        help='Checkpoint the game to PATH at the start of every turn')
+    parser.add_argument('--resume', metavar='PATH',
+                        help='Resume a game checkpointed with --save (and keep checkpointing to it)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Time decisions, drawing, reshuffles, rendering, and input, and print a summary at exit')
+    parser.add_argument('--profile-out', metavar='PATH',
+                        help='Also write profile results to PATH (JSON if it ends in .json, otherwise collapsed stacks)')
+    parser.add_argument('--turn-time', type=float, metavar='SECONDS',
+                        help='Time a human gets per turn before the AI takes it for them (default: no limit)')
+    parser.add_argument('--auto-advance', type=float, metavar='SECONDS',
+                        help='Move on from status messages after SECONDS instead of waiting for enter')
+    parser.add_argument('--search-ai', nargs='+', default=[], type=int, choices=range(1, 5), metavar='1-4',
+                        help='Seats to give the tree search AI instead of the basic AI')
+    parser.add_argument('--search-time', type=float, default=0.5, metavar='SECONDS',
+                        help='Time the search AI gets per move (0 for no limit)')
+    parser.add_argument('--search-playouts', type=int, metavar='N',
+                        help='Maximum playouts the search AI runs per move')
+    parser.add_argument('--search-inference', action='store_true',
+                        help='Have the search AI only consider hands the other players could actually be holding')
     args = parser.parse_args(sys.argv[1:])
+    search_seats = [seat - 1 for seat in args.search_ai]
+    search_options = {'time_limit': args.search_time or None, 'playouts': args.search_playouts,
+                      'inference': args.search_inference, 'verbose': args.debug}
+    if search_seats and not search_options['time_limit'] and not search_options['playouts']:
+        parser.error('the search AI needs a --search-time or --search-playouts budget')
+    if args.players in range(1, 5) and args.simulate is None and not args.resume:
+        check_search_seats(parser, search_seats, args.players)
+
+    # Bulk simulation skips the UI entirely
+    if args.simulate is not None:
+        from tournament import simulate
+        simulate(args.simulate, max(args.jobs, 1), args.seed or 0, search_seats=search_seats,
+                 search_options=search_options, start=args.game_index or 0)
+        return
+
+    from game import Game
+    if args.resume:
+        game = Game.load(args.resume, args.debug)
+        check_search_seats(parser, search_seats, game.num_human_players)
+        game.save_path = args.resume
+        game.turn_time, game.auto_advance = args.turn_time, args.auto_advance
+        start_game(game, search_seats, search_options, args)
+        return
+
+    if not args.no_banner:
+        print_welcome()
 
-    print_welcome()
+    # The game reads from the same input as the menu, so nothing typed (or piped in) ahead is lost between the two
+    from inputs import terminal_input
+    source = terminal_input()
 
     # Set number of players
     try:
@@ -43,8 +137,8 @@ def main():
         if args.players in range(1, 5):
             num_players = args.players
         else:
-            num_players = input(
-                'Enter 1-4 for number of human players (default 1):')
+            print('Enter 1-4 for number of human players (default 1):', end='', flush=True)
+            num_players = source.read_line()
             num_players = int(num_players[0])
             # If the user gave invalid input or no input, use the default
             if num_players not in range(1, 5):
@@ -52,9 +146,17 @@ def main():
     # Either the user pressed enter for the default, or they can't even be trusted to type in an integer and probably don't have any friends, so just do a 1-player game
     except Exception:
         num_players = 1
+    check_search_seats(parser, search_seats, num_players)
 
     game = Game(num_players, args.debug)
-    game.play()
+    game.input = source
+    # Every deal comes from a seed and a game index, so any game can be dealt again with --seed and --game-index
+    from rng import GameRandom
+    from random import getrandbits
+    game.rng = GameRandom(args.seed if args.seed is not None else getrandbits(32), args.game_index or 0)
+    game.save_path = args.save
+    game.turn_time, game.auto_advance = args.turn_time, args.auto_advance
+    start_game(game, search_seats, search_options, args)
 
 
 if __name__ == '__main__':
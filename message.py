@@ -1,15 +1,18 @@
 from re import compile
 
+# Regex to strip color formatting
+REGEX = compile(r'(\x9B|\x1B\[)[0-?]*[ -\/]*[@-~]')
+
 
 # Class for printing messages containing unicode characters with correct space justification
 class Message:
     def __init__(self, message=''):
         self.message = message
         self.length = len(message)
+        # Width on screen, worked out once since messages get re-rendered on every frame
+        self.width = len(self.bare_str())
 
     def bare_str(self):
-        # Regex to strip color formatting
-        REGEX = compile(r'(\x9B|\x1B\[)[0-?]*[ -\/]*[@-~]')
         bare_str = REGEX.sub('', self.message)
         # Convert to ASCII to get rid of the unicode characters
         bare_str = bare_str.encode('ascii', errors='replace')
@@ -17,21 +20,15 @@ class Message:
 
     # Generate string left justified, taking ANSI codes and unicode into account
     def ljust(self, width):
-        padded_str = self.message
-        if len(self.bare_str()) < width:
-            for i in range(width - len(self.bare_str()) - 2):
-                padded_str += ' '
-        return padded_str
+        if self.width < width:
+            return self.message + ' ' * (width - self.width - 2)
+        return self.message
 
     # Generate string centered, taking ANSI codes and unicode into account
     def center(self, width):
-        padded_str = self.message
-        if len(self.bare_str()) < width:
-            # Handle odd numbers
-            if (width - len(self.bare_str())) % 2 != 0:
-                padded_str += ' '
-            else:
-                padded_str = ' ' + padded_str + ' '
-            for i in range(0, width - len(self.bare_str()) - 2, 2):
-                padded_str = ' ' + padded_str + ' '
-        return padded_str
+        if self.width < width:
+            padding = max(0, (width - self.width - 1) // 2)
+            # Odd amounts of padding put the extra space on the right
+            left = padding if (width - self.width) % 2 != 0 else padding + 1
+            return ' ' * left + self.message + ' ' * (padding + 1)
+        return self.message
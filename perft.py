@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# Move generation counter, after chess engines' perft. From a seeded deal, walks every legal sequence of actions to a
+# fixed depth with every card in sight, and counts the positions at each depth. Known counts are kept in perft.json as
+# regression fixtures for the rules, and nodes/sec is the benchmark for the move generator:
+#     python perft.py --seed 0 --depth 8
+#     python perft.py --seed 0 --game-index 3 --turns 40 --depth 10
+#     python perft.py --verify
+import argparse
+import json
+import os
+import sys
+from time import perf_counter
+
+from engine import Engine
+from state import DRAW, PASS, GameState, describe
+from tournament import game_rng
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perft.json')
+# What's counted at each depth: every position, and the actions that got to them that won the game, drew a card,
+# drew into a reshuffle, passed, or called a suit with an eight
+STATS = ['nodes', 'wins', 'draws', 'reshuffles', 'passes', 'suit_calls']
+
+
+# The GameState in game game_index of seed after the deal and turns turns of AI play, which is a way to start from later
+# in a game, with reshuffles and nearly empty hands in reach. Returns None if the game ends before then
+def deal(seed, game_index, turns=0):
+    engine = Engine(rng=game_rng(seed, game_index))
+    engine.start()
+    for _ in range(turns):
+        if engine.step() is not None:
+            return None
+    return GameState.from_table(engine)
+
+
+# Walk every sequence of actions from state to depth, adding what's found at ply p (1 for the first action) to
+# counts[stat][p - 1]. A play that empties a hand ends the game, so nothing is walked past it
+def walk(state, depth, counts, ply=1):
+    nodes, wins, draws, reshuffles, passes, suit_calls = (counts[stat] for stat in STATS)
+    i = ply - 1
+    for action in state.legal_actions():
+        nodes[i] += 1
+        if action == DRAW:
+            draws[i] += 1
+            if state.reshuffle_due():
+                reshuffles[i] += 1
+        elif action == PASS:
+            passes[i] += 1
+        elif (action & 63) // 4 == 7:
+            suit_calls[i] += 1
+        state.apply(action)
+        if state.winner is not None:
+            wins[i] += 1
+        elif depth > 1:
+            walk(state, depth - 1, counts, ply + 1)
+        state.undo()
+
+
+def perft(seed, game_index, depth, turns=0):
+    counts = {stat: [0] * depth for stat in STATS}
+    walk(deal(seed, game_index, turns), depth, counts)
+    return counts
+
+
+# Nodes under each first action, for narrowing down where two move generators disagree
+def divide(seed, game_index, depth, turns=0):
+    state = deal(seed, game_index, turns)
+    for action in state.legal_actions():
+        counts = {stat: [0] * depth for stat in STATS}
+        state.apply(action)
+        if depth == 1:
+            total = 1
+        elif state.winner is not None:
+            # The game's over, so there's nothing at depth
+            total = 0
+        else:
+            walk(state, depth - 1, counts)
+            total = counts['nodes'][depth - 2]
+        state.undo()
+        print(f'{describe(action):<8}{total}')
+
+
+def print_counts(counts, elapsed):
+    print(f'{"depth":>5}' + ''.join(f'{stat:>14}' for stat in STATS))
+    for i in range(len(counts['nodes'])):
+        print(f'{i + 1:>5}' + ''.join(f'{counts[stat][i]:>14}' for stat in STATS))
+    total = sum(counts['nodes'])
+    print(f'{total} nodes in {elapsed:.2f} sec ({total / max(elapsed, 1e-9):.0f} nodes/sec)')
+
+
+# Check every fixture against a fresh count. Returns True if they all match
+def verify(path):
+    with open(path) as file:
+        fixtures = json.load(file)['positions']
+    ok = True
+    total, start = 0, perf_counter()
+    for fixture in fixtures:
+        counts = perft(fixture['seed'], fixture['game_index'], fixture['depth'], fixture['turns'])
+        total += sum(counts['nodes'])
+        wrong = [stat for stat in STATS if counts[stat] != fixture[stat]]
+        ok = ok and not wrong
+        print(f'seed {fixture["seed"]} game {fixture["game_index"]} turns {fixture["turns"]} depth {fixture["depth"]}: '
+              + (f'MISMATCH in {", ".join(wrong)}' if wrong else 'ok'))
+    elapsed = perf_counter() - start
+    print(f'{total} nodes in {elapsed:.2f} sec ({total / max(elapsed, 1e-9):.0f} nodes/sec)')
+    return ok
+
+
+# Recount every fixture and write the counts back, for after a deliberate change to the rules. Fixtures that start
+# partway through a game also depend on the AI's moves up to that point, so a change to AIPlayer needs this too
+def update(path):
+    with open(path) as file:
+        fixtures = json.load(file)
+    for fixture in fixtures['positions']:
+        fixture.update(perft(fixture['seed'], fixture['game_index'], fixture['depth'], fixture['turns']))
+    # One fixture per line keeps the file readable and its diffs small
+    with open(path, 'w') as file:
+        file.write('{"positions": [\n' + ',\n'.join(f'  {json.dumps(fixture)}' for fixture in fixtures['positions'])
+                   + '\n]}\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Count the legal action sequences from a seeded deal.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the deal')
+    parser.add_argument('--game-index', type=int, default=0, help='Game of --seed to deal')
+    parser.add_argument('--turns', type=int, default=0, help='Start after this many turns of AI play')
+    parser.add_argument('--depth', type=int, default=8, help='Number of actions to look ahead')
+    parser.add_argument('--divide', action='store_true', help='Show the nodes at --depth under each first action')
+    parser.add_argument('--verify', action='store_true', help='Check the counts against the fixtures and exit')
+    parser.add_argument('--update-fixtures', action='store_true', help='Recount the fixtures and save the new counts')
+    parser.add_argument('--fixtures', default=FIXTURES_PATH, help='Fixture file (default perft.json)')
+    args = parser.parse_args()
+    if args.update_fixtures:
+        update(args.fixtures)
+    if args.verify or args.update_fixtures:
+        sys.exit(0 if verify(args.fixtures) else 1)
+    if deal(args.seed, args.game_index, args.turns) is None:
+        parser.error(f'game {args.game_index} of seed {args.seed} is over before {args.turns} turns')
+    if args.divide:
+        divide(args.seed, args.game_index, args.depth, args.turns)
+        return
+    start = perf_counter()
+    counts = perft(args.seed, args.game_index, args.depth, args.turns)
+    print_counts(counts, perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
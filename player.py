@@ -1,4 +1,4 @@
-from card import Card
+from card import CARDS, EIGHTS, PLAYABLE, SUIT_MASKS, Card, cards_in, mask_of, popcount
 from colorama import Style
 
 
@@ -6,13 +6,38 @@ from colorama import Style
 class Player:
     def __init__(self, player_num):
         self.player_num = player_num
-        self.hand = []
+        # The hand is kept as a bitmask of card indices
+        self.mask = 0
+        # The Game or Engine this player is seated at
+        self.table = None
+
+    # Called when the player takes a seat at a table (a Game or an Engine), before any cards are dealt or restored
+    def sit(self, table):
+        self.table = table
+
+    # List view of the hand, in rank order
+    @property
+    def hand(self):
+        return cards_in(self.mask)
+
+    @hand.setter
+    def hand(self, cards):
+        self.mask = mask_of(cards)
+
+    def hand_size(self):
+        return popcount(self.mask)
+
+    def add_card(self, card):
+        self.mask |= 1 << card.index
+
+    def remove_card(self, card):
+        self.mask &= ~(1 << card.index)
 
     def can_play(self, other_card):
-        return any(card.plays_on(other_card) for card in self.hand)
+        return self.mask & PLAYABLE[other_card.code] != 0
 
     def playable_cards(self, other_card):
-        return sorted([card for card in self.hand if card.plays_on(other_card)], key=lambda x: x.num_rank)
+        return cards_in(self.mask & PLAYABLE[other_card.code])
 
 # Class for human player
 class HumanPlayer(Player):
@@ -21,7 +46,8 @@ class HumanPlayer(Player):
         self.is_human = True
 
     # Parse input to determine play choice
-    # Returns the Card object in question and removes it from its hand
+    # Returns the Card object in question and removes it from its hand. If the player's clock runs out first, the AI
+    # picks the card for them
     def play_card(self, set_message, card_up):
         # Filtering constants
         VALID_CHARS = ['2', '3', '4', '5', '6', '7',
@@ -54,16 +80,19 @@ class HumanPlayer(Player):
         while True:
             num_rank = 0
             suit = '0'
+            line = self.table.read_move()
+            if line is None:
+                return AIPlayer.play_card(self, set_message, card_up)
             try:
                 # Convert 10's to t's, 1's to a's, and uppercase to lowercase. Anything valid will be matched to VALID_CHARS
-                discard_input = [char for char in input().lower().replace('10', 't').replace('1', 'a')
+                discard_input = [char for char in line.lower().replace('10', 't').replace('1', 'a')
                                 if char in VALID_CHARS]
                 num_rank = get_num_rank(discard_input[0])
                 suit = get_suit(discard_input[-1])
                 for card in self.playable_cards(card_up):
                     # Rank needs to match. Suit only needs to match if specified
                     if num_rank == card.num_rank and (suit == '0' or suit == card.suit):
-                        self.hand.remove(card)
+                        self.remove_card(card)
                         return card
                 # Card wasn't in playable_cards, do error handling
                 for card in self.hand:
@@ -80,17 +109,17 @@ class HumanPlayer(Player):
             except IndexError:
                 set_message('You must enter a card to play.', replace_line=6)        
 
+    # Same as the AI if the player's clock runs out
     def choose_suit(self, set_message):
+        set_message(f'Select a new suit: {Card.SPADES}, {Card.HEARTS}, {Card.CLUBS}, or {Card.DIAMONDS}.')
         while True:
-            try:
-                set_message(f'Select a new suit: {Card.SPADES}, {Card.HEARTS}, {Card.CLUBS}, or {Card.DIAMONDS}.')
-                suit_input = input().lower()[0]
-                if suit_input in ['c', 'd', 'h', 's']:
-                    return suit_input
-                else:
-                    raise Exception
-            except Exception:
-                set_message(f'{Style.BRIGHT}Invalid input.{Style.RESET_ALL} Enter one of the following: c, d, h, or s.', replace_line=1)
+            line = self.table.read_move()
+            if line is None:
+                return AIPlayer.choose_suit(self, set_message)
+            suit_input = line.strip().lower()[:1]
+            if suit_input in ['c', 'd', 'h', 's']:
+                return suit_input
+            set_message(f'{Style.BRIGHT}Invalid input.{Style.RESET_ALL} Enter one of the following: c, d, h, or s.', replace_line=1)
             
 
 # Class for AI player
@@ -106,19 +135,13 @@ class AIPlayer(Player):
             print(*message)
 
     def play_card(self, set_message, card_up):
-        playable_cards = self.playable_cards(card_up)
-        if len(playable_cards) > 1:
-            # Try to avoid wasting an 8 if possible
-            for card in playable_cards:
-                if card.num_rank != 8:
-                    self.hand.remove(card)
-                    return card
-        # If there's only one option (or all options or 8's), take it
-        self.hand.remove(playable_cards[0])
-        return playable_cards[0]
+        playable = self.mask & PLAYABLE[card_up.code]
+        # Try to avoid wasting an 8 if possible. If the only options are 8's, play the lowest card
+        if playable & ~EIGHTS:
+            playable &= ~EIGHTS
+        low = playable & -playable
+        self.mask ^= low
+        return CARDS[low.bit_length() - 1]
 
     def choose_suit(self, set_message):
-        suit_counts = {'c': 0, 'd': 0, 'h': 0, 's': 0}
-        for card in self.hand:
-            suit_counts[card.suit] += 1
-        return max(suit_counts, key=suit_counts.get)
\ No newline at end of file
+        return max('cdhs', key=lambda suit: popcount(self.mask & SUIT_MASKS[suit]))
\ No newline at end of file
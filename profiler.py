@@ -0,0 +1,106 @@
+import json
+from time import perf_counter
+
+from events import DRAW, TURN
+
+
+# Lightweight timers and counters for a Game. Nothing is touched until instrument() wraps the methods worth timing, so a
+# game that isn't being profiled pays nothing for any of this
+class Profiler:
+    def __init__(self):
+        # Frames of [name, start time, time spent in children]
+        self.stack = []
+        # name -> [calls, total time, self time]
+        self.timers = {}
+        # 'outer;inner' call path -> self time, for flame graphs
+        self.paths = {}
+        self.counters = {'can_play calls': 0, 'playable_cards calls': 0, 'cards drawn': 0, 'turns': 0}
+        # (object, attribute) for every method wrapped on an object, to be taken off again in uninstrument()
+        self.restore = []
+
+    def enter(self, name):
+        self.stack.append([name, perf_counter(), 0.0])
+
+    def exit(self):
+        name, start, child_time = self.stack.pop()
+        elapsed = perf_counter() - start
+        if self.stack:
+            self.stack[-1][2] += elapsed
+        timer = self.timers.setdefault(name, [0, 0.0, 0.0])
+        timer[0] += 1
+        timer[1] += elapsed
+        timer[2] += elapsed - child_time
+        path = ';'.join(frame[0] for frame in self.stack) + (';' if self.stack else '') + name
+        self.paths[path] = self.paths.get(path, 0.0) + elapsed - child_time
+
+    # Wrap func so every call to it is timed under name
+    def wrap(self, name, func):
+        def timed(*args, **kwargs):
+            self.enter(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.exit()
+        return timed
+
+    # Wrap func so every call to it adds one to counter
+    def count(self, counter, func):
+        counters = self.counters
+
+        def counted(*args, **kwargs):
+            counters[counter] += 1
+            return func(*args, **kwargs)
+        return counted
+
+    # Put wrapper(method) on obj in place of its method attribute
+    def patch(self, obj, attribute, wrapper):
+        setattr(obj, attribute, wrapper(getattr(obj, attribute)))
+        self.restore.append((obj, attribute))
+
+    # Time the parts of a game where wall time goes: decisions, drawing, reshuffling, rendering, and waiting on input, and
+    # count the hand queries (the engine asks can_play every turn, and the UI and the AI ask playable_cards)
+    def instrument(self, game):
+        for name in ('play', 'draw_until_playable', 'reshuffle', 'draw_game'):
+            self.patch(game, name, lambda method, name=name: self.wrap(name, method))
+        for player in game.players:
+            for name in ('play_card', 'choose_suit'):
+                self.patch(player, name,
+                           lambda method, name=name: self.wrap(f'player {player.player_num + 1} {name}', method))
+            for name in ('can_play', 'playable_cards'):
+                self.patch(player, name, lambda method, name=name: self.count(f'{name} calls', method))
+        self.patch(game.input, 'read_line', lambda method: self.wrap('input', method))
+        game.subscribe(self.on_event)
+
+    # The wrappers are all set on the objects themselves, so taking them off uncovers the methods they wrapped
+    def uninstrument(self):
+        for obj, attribute in reversed(self.restore):
+            delattr(obj, attribute)
+        self.restore = []
+
+    def on_event(self, event):
+        if event.kind == DRAW:
+            self.counters['cards drawn'] += 1
+        elif event.kind == TURN:
+            self.counters['turns'] += 1
+
+    def summary(self):
+        turns = max(self.counters['turns'], 1)
+        lines = ['', f'{"Timer":<28}{"calls":>8}{"total s":>11}{"self s":>11}{"ms/turn":>10}']
+        for name, (calls, total, self_time) in sorted(self.timers.items(), key=lambda item: -item[1][1]):
+            lines.append(f'{name:<28}{calls:>8}{total:>11.4f}{self_time:>11.4f}{1000 * total / turns:>10.3f}')
+        lines.append('')
+        for name, count in self.counters.items():
+            lines.append(f'{name:<28}{count:>8}')
+        return '\n'.join(lines)
+
+    # Write the results as JSON if the path ends in .json, otherwise as collapsed stacks (self time in microseconds)
+    def dump(self, path):
+        with open(path, 'w') as file:
+            if path.endswith('.json'):
+                json.dump({'timers': {name: {'calls': calls, 'total': total, 'self': self_time}
+                                      for name, (calls, total, self_time) in self.timers.items()},
+                           'counters': self.counters}, file, indent=2)
+                file.write('\n')
+            else:
+                for path_name, self_time in sorted(self.paths.items()):
+                    file.write(f'{path_name} {round(self_time * 1e6)}\n')
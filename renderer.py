@@ -0,0 +1,36 @@
+import sys
+
+CLEAR_SCREEN = '\x1b[2J\x1b[H'
+CLEAR_LINE = '\x1b[K'
+CLEAR_BELOW = '\x1b[J'
+
+
+def move_to(row):
+    return f'\x1b[{row + 1};1H'
+
+
+# Draws frames (lists of lines) to the terminal, only rewriting the lines that changed since the last frame instead of
+# clearing the screen and printing everything again
+class FrameRenderer:
+    # Frames go to stream, or to whatever sys.stdout is at the time if that's None
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.last_frame = None
+
+    # Forget what's on screen, so the next frame is drawn from scratch. Use this when something else writes to the screen
+    def invalidate(self):
+        self.last_frame = None
+
+    def render(self, lines):
+        last_frame = self.last_frame
+        if last_frame is None or len(last_frame) != len(lines):
+            output = [CLEAR_SCREEN, '\n'.join(lines)]
+        else:
+            output = [move_to(row) + line + CLEAR_LINE for row, (line, old_line) in enumerate(zip(lines, last_frame))
+                      if line != old_line]
+        # Park the cursor under the frame and wipe anything left down there, like the echo of the last input()
+        output.append(move_to(len(lines)) + CLEAR_BELOW)
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write(''.join(output))
+        stream.flush()
+        self.last_frame = list(lines)
@@ -0,0 +1,51 @@
+import struct
+from hashlib import shake_128
+
+MASK32 = (1 << 32) - 1
+
+
+# Random numbers for one game, worked out from (seed, game index, shuffle number) with no state carried from one game or
+# shuffle to the next. Any game's deal, and any of its reshuffles, can be recreated on its own, so simulations can be
+# split across processes or machines however you like and still come out exactly the same. Each shuffle reads its
+# numbers from SHAKE-128 of its key, which is the same on every platform and Python version.
+#
+# Only has what the engine uses: shuffle, which takes the same lists random.Random.shuffle does
+class GameRandom:
+    def __init__(self, seed=0, game_index=0):
+        self.seed = seed
+        self.game_index = game_index
+        # Shuffles done so far. The first shuffle deals the game and the rest are its reshuffles
+        self.shuffles = 0
+
+    # The stream of random bytes for shuffle number n
+    def stream(self, n):
+        return shake_128(f'{self.seed}:{self.game_index}:{n}'.encode())
+
+    # Shuffle x in place, as the next shuffle of the game. Fisher-Yates, with each swap index taken from a 32-bit word of
+    # the stream by Lemire's multiply-and-reject method, so there's no bias
+    def shuffle(self, x):
+        stream = self.stream(self.shuffles)
+        self.shuffles += 1
+        words = len(x)
+        values = struct.unpack(f'<{words}I', stream.digest(4 * words))
+        k = 0
+        for i in reversed(range(1, len(x))):
+            bound = i + 1
+            # The stream only runs out if words were skipped below, which for a deck of cards is about one shuffle in a
+            # hundred million, so there's no harm in reading it again from the start
+            if k == len(values):
+                words *= 2
+                values = struct.unpack(f'<{words}I', stream.digest(4 * words))
+            product = values[k] * bound
+            k += 1
+            # A word whose low bits land below 2**32 % bound would favour some indices, so it's skipped. Checking
+            # against bound first saves working out the remainder nearly every time
+            if product & MASK32 < bound:
+                while product & MASK32 < (1 << 32) % bound:
+                    if k == len(values):
+                        words *= 2
+                        values = struct.unpack(f'<{words}I', stream.digest(4 * words))
+                    product = values[k] * bound
+                    k += 1
+            j = product >> 32
+            x[i], x[j] = x[j], x[i]
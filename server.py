@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# Network play. One asyncio process hosts any number of tables at once, with clients playing their seats over TCP and
+# the AI in the rest, all kept in one TableStore (see compact.py) rather than an Engine each. Nothing on the event loop
+# ever blocks: AI turns are a few microseconds of work with a yield after each one, a client's turn just waits on its
+# next message, and writes are buffered by the transport, with any client that stops reading dropped once it's too far
+# behind.
+#     python server.py --port 8808
+#     python client.py --port 8808
+#
+# The protocol is JSON, one message per line. A client sends
+#     {"type": "join"}                                  play three AIs
+#     {"type": "join", "table": "name", "humans": 2}    join the table called name, which starts once 2 players are in.
+#                                                       humans can be left out to join a table that's waiting, and
+#                                                       has to match it if it isn't
+#     {"type": "join", "humans": 2}                     open a table for 2 players, named #n by the server. Names
+#                                                       starting with # can only be used to join one of these
+#     {"type": "play", "card": 12}                      play the card with index 12 (see card.py)
+#     {"type": "suit", "suit": "h"}                     call hearts for the eight just played
+#     {"type": "watch", "table": "name"}                watch a table (see spectators.py for what spectators get)
+#     {"type": "watch", "table": "name", "seat": 1}     watch over seat 1's shoulder, if the server allows it
+# and gets back
+#     {"type": "seated", "table": "name", "seat": 0}
+#     {"type": "event", "event": [kind, seat, card, arg]}   an Event (see events.py). A card dealt or drawn into somebody
+#                                                           else's hand comes as 255, and the draw pile isn't sent
+#     {"type": "turn", "playable": [12, 29]}            your turn, and the cards you can play
+#     {"type": "suit"}                                  call a suit for the eight you just played
+#     {"type": "over", "winner": 2}                     the game's over (winner is null at the turn limit). Join again
+#                                                       to play another
+#     {"type": "error", "message": "..."}
+# A client with nothing to play draws automatically, like in the terminal game. If a client goes away mid-game, the AI
+# plays its seat out
+import argparse
+import asyncio
+import json
+import random
+
+from card import SUITS, cards_in
+from compact import TableStore
+from engine import Engine
+from events import DEAL, DRAW, NONE, STACK
+from spectators import PUBLIC, Channel
+
+# Bytes of messages a client can have waiting to be sent before it's dropped for not keeping up
+WRITE_LIMIT = 1 << 20
+# Longest message a client can send
+LINE_LIMIT = 1 << 12
+
+
+def encode(message):
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+
+# Same as encode() of an event message, for the message sent most by far
+def encode_event(kind, seat, card, arg):
+    return f'{{"type":"event","event":[{kind},{seat},{card},{arg}]}}\n'.encode()
+
+
+# One client's socket. Moves it sends when it's been asked for one go on a queue for its table
+class Connection:
+    def __init__(self, writer):
+        self.writer = writer
+        self.moves = asyncio.Queue()
+        self.table = None
+        self.seat = None
+        # The type of move ('play' or 'suit') the table's waiting on from this client, if any
+        self.asking = None
+        # The Watcher sending it a table, if it's spectating
+        self.watcher = None
+        self.closed = False
+
+    def send(self, message):
+        self.send_bytes(encode(message))
+
+    # Never waits: the transport buffers whatever the socket won't take yet
+    def send_bytes(self, data):
+        if self.closed:
+            return
+        if self.writer.transport.is_closing():
+            # The client's gone, which the reader will notice soon, but there's no point writing to it meanwhile
+            self.close()
+            return
+        self.writer.write(data)
+        if self.writer.transport.get_write_buffer_size() > WRITE_LIMIT:
+            self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.writer.close()
+            # Wake the table up if it's waiting on a move
+            self.moves.put_nowait(None)
+
+
+# One game, with human seats (the first humans seats) played by clients and the rest by the AI. It starts once every
+# human seat is taken. The game itself lives in the server's TableStore, from when it starts until it's over
+class Table:
+    def __init__(self, name, humans, store, game_index, on_finish):
+        self.name = name
+        self.humans = humans
+        self.store = store
+        self.game_index = game_index
+        # The table's slot in store, once it's started
+        self.slot = None
+        # Client in each human seat, or None if it's free
+        self.connections = [None] * humans
+        self.on_finish = on_finish
+        self.task = None
+        # Spectators' Channel, opened when the first one turns up
+        self.channel = None
+
+    def full(self):
+        return all(connection is not None and not connection.closed for connection in self.connections)
+
+    # Put connection in the first free seat. Before the game starts, a seat whose client has gone away is free again
+    def seat(self, connection):
+        seat = next(seat for seat, seated in enumerate(self.connections) if seated is None or seated.closed)
+        self.connections[seat] = connection
+        connection.table, connection.seat = self, seat
+        connection.send({'type': 'seated', 'table': self.name, 'seat': seat})
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    # Send the table to writer from now on, in view (PUBLIC, or a seat). Returns the Watcher doing it. The channel
+    # starts from the position as an Engine, which is the only time a table's ever materialized here
+    def watch(self, writer, view=PUBLIC):
+        if self.channel is None:
+            self.channel = Channel(self.store.materialize(self.slot) if self.slot is not None else Engine())
+        return self.channel.watch(writer, view)
+
+    # Pass each event on to the clients, each message encoded once for everybody who sees it the same way. Nobody gets
+    # the draw pile, and only the player a card's dealt or drawn to sees what it is
+    def on_event(self, event):
+        if self.channel is not None:
+            self.channel.publish(event)
+        if event.kind == STACK:
+            return
+        if event.kind == DEAL or event.kind == DRAW:
+            hidden = encode_event(event.kind, event.seat, NONE, event.arg)
+            shown = encode_event(*event)
+            for connection in self.connections:
+                connection.send_bytes(shown if connection.seat == event.seat else hidden)
+        else:
+            self.broadcast_bytes(encode_event(*event))
+
+    def broadcast_bytes(self, data):
+        for connection in self.connections:
+            connection.send_bytes(data)
+
+    async def run(self):
+        store = self.store
+        result = None
+        try:
+            self.slot = slot = store.open(self.game_index, self.on_event)
+            while result is None:
+                seat = store.player_up[slot]
+                connection = self.connections[seat] if seat < self.humans else None
+                if connection is not None and not connection.closed:
+                    result = await self.remote_turn(connection)
+                else:
+                    result = store.step(slot)
+                # Nobody's left to play for
+                if all(connection.closed for connection in self.connections):
+                    return
+                # Let the other tables and clients in between turns
+                await asyncio.sleep(0)
+            self.broadcast_bytes(encode({'type': 'over', 'winner': result.winner}))
+        finally:
+            for connection in self.connections:
+                connection.table = connection.seat = connection.asking = None
+            if self.channel is not None:
+                self.channel.close(result.winner if result is not None else None)
+            if self.slot is not None:
+                store.close(self.slot)
+            self.on_finish(self)
+
+    # A turn for a seat with a client: TableStore.step, with the choices awaited from the client instead of made by the
+    # AI. If the client goes away partway through, the AI finishes the turn
+    async def remote_turn(self, connection):
+        store, slot = self.store, self.slot
+        if store.out_of_turns(slot):
+            return store.result(slot, None)
+        store.begin_turn(slot)
+        playable = store.playable(slot)
+        if playable:
+            store.play(slot, await self.ask_play(connection, playable))
+        elif not store.draw_until_playable(slot):
+            store.pass_turn(slot)
+            return store.end_turn(slot)
+        if store.top[slot] // 4 == 7:
+            store.declare(slot, await self.ask_suit(connection))
+        return store.end_turn(slot)
+
+    # Wait for the client to send a move of type kind that valid() accepts, sending an error back for anything else.
+    # Returns None if the client goes away first
+    async def ask(self, connection, kind, message, valid):
+        # Anything still queued was sent before this question (like a second play sent for the last turn), so it can't be
+        # the answer to it. If the client closed meanwhile, the close marker goes with it, so check for that instead
+        while not connection.moves.empty():
+            connection.moves.get_nowait()
+        if connection.closed:
+            return None
+        connection.asking = kind
+        connection.send(message)
+        try:
+            while True:
+                move = await connection.moves.get()
+                if move is None or valid(move):
+                    return move
+                connection.send({'type': 'error', 'message': f'not a legal {kind}'})
+        finally:
+            connection.asking = None
+
+    # Index of the card the client plays out of the playable mask
+    async def ask_play(self, connection, playable):
+        indices = [card.index for card in cards_in(playable)]
+        move = await self.ask(connection, 'play', {'type': 'turn', 'playable': indices},
+                              lambda move: type(move.get('card')) is int and move['card'] in indices)
+        if move is None:
+            return self.store.ai_card(playable)
+        return move['card']
+
+    async def ask_suit(self, connection):
+        move = await self.ask(connection, 'suit', {'type': 'suit'},
+                              lambda move: move.get('suit') in SUITS and len(move['suit']) == 1)
+        if move is None:
+            return self.store.ai_suit(self.store.hand(self.slot, connection.seat))
+        return move['suit']
+
+
+# Seats clients at tables. Every table's deal is game n of seed, n counting up from 0 as tables are opened, so a
+# server's games can be dealt again with the same seed. Spectators can only watch over a seat's shoulder with
+# seat_views, since a player could otherwise watch their opponents' hands
+class Server:
+    def __init__(self, seed=0, seat_views=False):
+        self.store = TableStore(seed)
+        self.seat_views = seat_views
+        self.tables_opened = 0
+        # Every table that's waiting for players or being played, by name. This also keeps the tasks of tables being
+        # played from being garbage collected
+        self.tables = {}
+        # Named tables still waiting for players, by name
+        self.waiting = {}
+
+    def open_table(self, name, humans):
+        table = Table(name if name is not None else f'#{self.tables_opened}', humans, self.store, self.tables_opened,
+                      self.close_table)
+        self.tables_opened += 1
+        self.tables[table.name] = table
+        return table
+
+    def close_table(self, table):
+        self.waiting.pop(table.name, None)
+        self.tables.pop(table.name, None)
+        # A table that's played closes its spectators' channel itself, but one everybody left before it started doesn't
+        if table.task is None and table.channel is not None:
+            table.channel.close(None)
+
+    async def handle(self, reader, writer):
+        connection = Connection(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict):
+                    connection.send({'type': 'error', 'message': 'expected a JSON object'})
+                    continue
+                self.receive(connection, message)
+        # A line over the limit, or the client resetting the connection
+        except (ValueError, ConnectionError):
+            pass
+        finally:
+            connection.close()
+            if connection.watcher is not None:
+                connection.watcher.stop()
+            # Nobody's left at a table that hasn't started
+            table = connection.table
+            if table is not None and table.task is None and all(seated.closed for seated in table.connections
+                                                                   if seated is not None):
+                self.close_table(table)
+
+    def receive(self, connection, message):
+        kind = message.get('type')
+        if kind == 'join':
+            self.join(connection, message.get('table'), message.get('humans'))
+        elif kind == 'play' or kind == 'suit':
+            if connection.asking != kind:
+                connection.send({'type': 'error', 'message': f'not waiting for a {kind}'})
+            else:
+                connection.moves.put_nowait(message)
+        elif kind == 'watch':
+            self.watch(connection, message.get('table'), message.get('seat'))
+        else:
+            connection.send({'type': 'error', 'message': f'unknown message type {kind!r}'})
+
+    def join(self, connection, name, humans):
+        if connection.table is not None:
+            connection.send({'type': 'error', 'message': 'already at a table'})
+            return
+        if name is not None and not isinstance(name, str) or \
+                humans is not None and (type(humans) is not int or not 1 <= humans <= 4):
+            connection.send({'type': 'error', 'message': 'table has to be a name, and humans from 1 to 4'})
+            return
+        if connection.watcher is not None and not connection.watcher.task.done():
+            connection.send({'type': 'error', 'message': 'already watching a table'})
+            return
+        if name in self.tables and name not in self.waiting:
+            connection.send({'type': 'error', 'message': f'table {name} is already playing'})
+            return
+        table = self.waiting.get(name) if name is not None else None
+        # Names starting with # are the ones the server gives tables opened without one, so they can only be joined
+        if table is None and name is not None and name.startswith('#'):
+            connection.send({'type': 'error', 'message': f'no table called {name} is waiting for players'})
+            return
+        if table is not None and humans is not None and humans != table.humans:
+            connection.send({'type': 'error', 'message': f'table {name} is waiting for {table.humans} '
+                                                         f'player{"s" if table.humans > 1 else ""}, not {humans}'})
+            return
+        if table is None:
+            table = self.open_table(name, humans if humans is not None else 1)
+        table.seat(connection)
+        if table.full():
+            self.waiting.pop(table.name, None)
+            table.start()
+        else:
+            self.waiting[table.name] = table
+
+    def watch(self, connection, name, seat):
+        if connection.table is not None or connection.watcher is not None and not connection.watcher.task.done():
+            connection.send({'type': 'error', 'message': 'already at a table'})
+            return
+        if not isinstance(name, str) or name not in self.tables:
+            connection.send({'type': 'error', 'message': f'no table called {name}'})
+            return
+        if seat is not None and (not self.seat_views or type(seat) is not int or not 0 <= seat < 4):
+            connection.send({'type': 'error', 'message': 'seat views are off' if not self.seat_views else
+                             'seat has to be from 0 to 3'})
+            return
+        connection.watcher = self.tables[name].watch(connection.writer, PUBLIC if seat is None else seat)
+
+
+async def serve(host, port, seed, seat_views=False):
+    server = Server(seed, seat_views)
+    listener = await asyncio.start_server(server.handle, host, port, limit=LINE_LIMIT)
+    host, port = listener.sockets[0].getsockname()[:2]
+    print(f'Serving on {host}:{port} (seed {seed})', flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Host games of Los Ochos Locos over the network.')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8808, help='Port to listen on (default 8808, 0 for any free port)')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for the deals (default: random)')
+    parser.add_argument('--seat-views', action='store_true',
+                        help='Let spectators watch over a seat\'s shoulder, hand and all (for commentators)')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.seed if args.seed is not None else random.getrandbits(32),
+                          args.seat_views))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
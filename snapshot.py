@@ -0,0 +1,143 @@
+import mmap
+import os
+import struct
+
+from card import CARDS, SUITS
+from rng import GameRandom
+
+# A snapshot file is a fixed-size file header followed by any number of fixed-size records, so record i always lives at
+# HEADER_SIZE + i * RECORD_SIZE and can be read straight out of a memory map without looking at any other record.
+#
+# File header: magic, format version, record size, padding
+# Record: player up, number of human players, code the top card plays as, the four hand sizes, draw pile size, discard
+# pile size, whether the table deals from a GameRandom, its seed, game index and shuffles so far (so the reshuffles to
+# come are the same ones), turns taken, padding, then one byte per card (its index). Cards are stored as the four hands in seat order (each in rank
+# order), then the draw pile, then the discard pile, with each pile listed top card first. Every card is somewhere, so
+# there are always exactly 52 card bytes
+MAGIC = b'LOCOSNAP'
+VERSION = 2
+FILE_HEADER = struct.Struct('<8sHH4x')
+RECORD_HEADER = struct.Struct('<BBBBBBBBB?qIHI4x')
+HEADER_SIZE = FILE_HEADER.size
+RECORD_SIZE = RECORD_HEADER.size + 52
+
+
+# Pack a table (a Game or an Engine) into a snapshot record
+def pack(table):
+    hands = [player.hand for player in table.players]
+    top_code = table.discard.top.code if table.discard.cards else 0
+    # Anything else (like the random module) has no state to write down, so it's left out
+    rng = table.rng if isinstance(table.rng, GameRandom) else None
+    try:
+        header = RECORD_HEADER.pack(table.player_up, getattr(table, 'num_human_players', 0), top_code,
+                                    *(len(hand) for hand in hands), len(table.draw.cards), len(table.discard.cards),
+                                    rng is not None, rng.seed if rng else 0, rng.game_index if rng else 0,
+                                    rng.shuffles if rng else 0, table.turns)
+    except struct.error as e:
+        raise ValueError(f'table can\'t be written to a snapshot: {e}') from e
+    cards = [card.index for hand in hands for card in hand]
+    # The piles keep their top card at the end, so they're written backwards
+    cards.extend(card.index for card in reversed(table.draw.cards))
+    cards.extend(card.index for card in reversed(table.discard.cards))
+    if len(cards) != 52:
+        raise ValueError(f'table holds {len(cards)} cards instead of 52')
+    return header + bytes(cards)
+
+
+# Read the header fields of a record: (player_up, num_human_players, top_code, hand sizes, draw size, discard size,
+# (seed, game index, shuffles) or None if the table didn't deal from a GameRandom, turns)
+def unpack_header(record):
+    fields = RECORD_HEADER.unpack_from(record)
+    rng = fields[10:13] if fields[9] else None
+    return fields[0], fields[1], fields[2], fields[3:7], fields[7], fields[8], rng, fields[13]
+
+
+# Put the position in a snapshot record onto a table (a Game or an Engine)
+def restore(table, record):
+    player_up, num_human_players, top_code, hand_sizes, draw_size, discard_size, rng, turns = unpack_header(record)
+    cards = [CARDS[index] for index in record[RECORD_HEADER.size:RECORD_SIZE]]
+    position = 0
+    for player, size in zip(table.players, hand_sizes):
+        player.hand = cards[position:position + size]
+        position += size
+    table.draw.cards = cards[position:position + draw_size][::-1]
+    position += draw_size
+    table.discard.cards = cards[position:position + discard_size][::-1]
+    # Put the declared suit back on a top eight
+    if table.discard.cards and table.discard.top.num_rank == 8:
+        table.discard.top = table.discard.top.declare(SUITS[top_code % 4])
+    table.player_up = player_up
+    table.turns = turns
+    if rng is not None:
+        seed, game_index, shuffles = rng
+        table.rng = GameRandom(seed, game_index)
+        table.rng.shuffles = shuffles
+    # Seat the players last, so anything they set up when they sit down sees the whole position
+    for player in table.players:
+        player.sit(table)
+
+
+# Appends records to a snapshot file, creating it (with its header) if needed
+class SnapshotWriter:
+    def __init__(self, path):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'ab')
+        if new_file:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION, RECORD_SIZE))
+
+    def append(self, table):
+        self.file.write(pack(table))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Random access to the records in a snapshot file, through a memory map
+class SnapshotReader:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size = FILE_HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a snapshot file')
+        if version != VERSION or record_size != RECORD_SIZE:
+            raise ValueError(f'{path} is snapshot format version {version}, expected version {VERSION}')
+
+    def __len__(self):
+        return (len(self.map) - HEADER_SIZE) // RECORD_SIZE
+
+    # Raw bytes of record i
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError('snapshot index out of range')
+        offset = HEADER_SIZE + i * RECORD_SIZE
+        return self.map[offset:offset + RECORD_SIZE]
+
+    def restore(self, i, table):
+        restore(table, self[i])
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Write a single-snapshot file, replacing whatever was there. The file is swapped in whole, so a crash mid-save can't
+# leave a half-written checkpoint behind
+def save(table, path):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(FILE_HEADER.pack(MAGIC, VERSION, RECORD_SIZE))
+        file.write(pack(table))
+    os.replace(temp_path, path)
@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+# Exact endgame solver. Once every card's location is known (a real table, or one determinization of it), the rest of
+# the game is a deterministic four-player game up until the discard pile has to be reshuffled, and once the hands are
+# small it can be searched all the way to the end. Run it on its own to solve positions from seeded games:
+#     python solver.py --positions 50 --cards 10
+import argparse
+import random
+from time import perf_counter
+
+from card import CARDS, EIGHTS, PLAYABLE, SUIT_MASKS, SUITS, popcount
+from ismcts import determinize, encode_play
+from player import AIPlayer
+
+# Moves are encoded like the tree search's: (code the card plays as << 6) | card index. Drawing until something
+# playable turns up is the same with DRAWN set, for the card that gets played at the end of it, and PASS is drawing
+# everything there is to draw without finding anything
+DRAWN = 1 << 12
+PASS = -2
+# Outcome of a position: the seat that wins, NO_WINNER for a stalemate, or UNKNOWN if it comes down to a reshuffle.
+# What a reshuffle brings is down to chance, so the search stops there rather than guess
+NO_WINNER = 4
+UNKNOWN = 5
+# Path depth of a repetition that no search has run into
+NO_REPEAT = 1 << 30
+MASK_64 = (1 << 64) - 1
+
+_rng = random.Random(0x10C05)
+Z_HAND = [[_rng.getrandbits(64) for _ in range(52)] for _ in range(4)]
+Z_PILE = [_rng.getrandbits(64) for _ in range(52)]
+Z_TOP_INDEX = [_rng.getrandbits(64) for _ in range(52)]
+Z_TOP_CODE = [_rng.getrandbits(64) for _ in range(52)]
+Z_UP = [_rng.getrandbits(64) for _ in range(4)]
+del _rng
+
+
+# Raised inside the search when it runs past its node budget
+class BudgetExceeded(Exception):
+    pass
+
+
+# A fully known position. Nothing gets shuffled during a search, so the draw pile never changes and only its length
+# (draw_len, with the next card at draw[draw_len - 1]) has to be tracked. Likewise only the size of the discard pile
+# under the top card matters, since all the search needs to know is whether there's anything there to reshuffle
+class Position:
+    __slots__ = ('hands', 'draw', 'draw_len', 'discard_len', 'top_index', 'top', 'player_up', 'key')
+
+    def __init__(self, hands, draw, discard_len, top_index, top, player_up):
+        self.hands = list(hands)
+        self.draw = list(draw)
+        self.draw_len = len(draw)
+        self.discard_len = discard_len
+        self.top_index = top_index
+        self.top = top
+        self.player_up = player_up
+        self.key = self.hash()
+
+    # Position of a table (a Game or an Engine), from the actual hands and draw pile
+    @classmethod
+    def from_table(cls, table):
+        top = table.discard.top
+        return cls([player.mask for player in table.players], [card.index for card in table.draw.cards],
+                   len(table.discard.cards) - 1, top.base.index, top.code, table.player_up)
+
+    # Position of an ismcts.Determinization
+    @classmethod
+    def from_determinization(cls, state):
+        return cls(state.hands, state.draw, len(state.discard), state.top_index, state.top, state.player_up)
+
+    # Cards in the hands, which is what decides how big the search gets. Cards in the draw pile only come out one way,
+    # so they hardly add to it
+    def size(self):
+        return sum(popcount(hand) for hand in self.hands)
+
+    # The hash covers where every card is, which together with the order of the draw pile (hashed once, as a salt) pins
+    # down the whole position. The salt keeps positions from different deals apart when they share a transposition table
+    def hash(self):
+        key = hash(tuple(self.draw)) & MASK_64
+        key ^= Z_TOP_INDEX[self.top_index] ^ Z_TOP_CODE[self.top] ^ Z_UP[self.player_up]
+        for seat, hand in enumerate(self.hands):
+            while hand:
+                low = hand & -hand
+                key ^= Z_HAND[seat][low.bit_length() - 1]
+                hand ^= low
+        for index in self.draw[:self.draw_len]:
+            key ^= Z_PILE[index]
+        return key
+
+
+# Bounded transposition table. Each bucket has two slots: one keeps whichever entry took the most work to compute, and
+# the other always takes the newest entry, so big subtrees stay cached without the table ever filling up for good
+class TranspositionTable:
+    def __init__(self, bits=20):
+        self.mask = (1 << bits) - 1
+        self.keys = [0] * (2 << bits)
+        # Entry data: work (nodes searched to get the result) << 3 | outcome
+        self.data = [0] * (2 << bits)
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def get(self, key):
+        self.probes += 1
+        slot = (key & self.mask) << 1
+        if self.keys[slot] == key:
+            self.hits += 1
+            return self.data[slot] & 7
+        if self.keys[slot + 1] == key:
+            self.hits += 1
+            return self.data[slot + 1] & 7
+        return None
+
+    def put(self, key, outcome, work):
+        self.stores += 1
+        slot = (key & self.mask) << 1
+        if self.keys[slot] == key or work >= self.data[slot] >> 3:
+            if self.keys[slot] not in (0, key):
+                # Bump the old entry down to the always-replace slot rather than losing it outright
+                if self.keys[slot + 1]:
+                    self.evictions += 1
+                self.keys[slot + 1], self.data[slot + 1] = self.keys[slot], self.data[slot]
+            self.keys[slot], self.data[slot] = key, work << 3 | outcome
+        else:
+            if self.keys[slot + 1] not in (0, key):
+                self.evictions += 1
+            self.keys[slot + 1], self.data[slot + 1] = key, work << 3 | outcome
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+
+# Depth-first max^n search. Every player takes a move that wins for them if there is one, then one that leaves the game
+# without a winner, and otherwise whichever losing move comes first in move ordering. A win cuts off the rest of a
+# player's moves, and move ordering tries the moves likeliest to win first so that happens early. A table where nobody
+# can play or draw passes forever, so a position that repeats one further up the search counts as no winner. That
+# depends on the path taken to get there, so results that lean on it aren't kept in the transposition table
+class Solver:
+    def __init__(self, table_bits=20, max_nodes=None):
+        self.table = TranspositionTable(table_bits)
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.budget = None
+        self.time = 0.0
+        # Keys of the positions on the current search path, and how deep each one is
+        self.path = {}
+        # Shallowest path depth a repetition has been found at in the subtree being searched
+        self.repeat = NO_REPEAT
+
+    # Outcome of pos with best play, and the move that gets it (None if drawing runs into a reshuffle the search
+    # stops at). pos is left as it was, unless the search runs out of budget partway through
+    def solve(self, pos):
+        outcomes = self.move_outcomes(pos)
+        if not outcomes:
+            return UNKNOWN, None
+        up = pos.player_up
+        move = max(outcomes, key=lambda move: score(up, outcomes[move]))
+        return outcomes[move], move
+
+    # Outcome of every legal move in pos, found by searching each one all the way out
+    def move_outcomes(self, pos):
+        return self.run(self._move_outcomes, pos)
+
+    # Outcome of declaring each of the four suits for an eight that's on top of the discard pile for the player up
+    def suit_outcomes(self, pos):
+        return self.run(self._suit_outcomes, pos)
+
+    def run(self, search, pos):
+        start = perf_counter()
+        self.budget = None if self.max_nodes is None else self.nodes + self.max_nodes
+        self.path.clear()
+        self.repeat = NO_REPEAT
+        try:
+            return search(pos)
+        finally:
+            self.time += perf_counter() - start
+
+    def _move_outcomes(self, pos):
+        outcomes = {}
+        self.path[pos.key] = 0
+        for move in self.moves(pos):
+            undo = self.make(pos, move)
+            outcomes[move] = self.outcome_after(pos, undo)
+            self.unmake(pos, undo)
+        return outcomes
+
+    def _suit_outcomes(self, pos):
+        outcomes = []
+        up, top = pos.player_up, pos.top
+        for suit in range(4):
+            pos.top = 28 + suit
+            pos.player_up = (up + 1) % 4
+            pos.key ^= Z_TOP_CODE[top] ^ Z_TOP_CODE[pos.top] ^ Z_UP[up] ^ Z_UP[pos.player_up]
+            outcomes.append(self.search(pos))
+            pos.key ^= Z_TOP_CODE[top] ^ Z_TOP_CODE[pos.top] ^ Z_UP[up] ^ Z_UP[pos.player_up]
+            pos.top, pos.player_up = top, up
+        return outcomes
+
+    # Outcome once a move has been made, which is either known straight away or takes a search
+    def outcome_after(self, pos, undo):
+        if undo[0] is not None:
+            return undo[0]
+        return self.search(pos)
+
+    def search(self, pos):
+        self.nodes += 1
+        if self.budget is not None and self.nodes > self.budget:
+            raise BudgetExceeded
+        key = pos.key
+        if key in self.path:
+            self.repeat = min(self.repeat, self.path[key])
+            return NO_WINNER
+        outcome = self.table.get(key)
+        if outcome is not None:
+            return outcome
+        start = self.nodes
+        up = pos.player_up
+        # With no moves, the player up has to draw into a reshuffle
+        best, best_score = UNKNOWN, -1
+        depth = len(self.path)
+        self.path[key] = depth
+        outer, self.repeat = self.repeat, NO_REPEAT
+        for move in self.moves(pos):
+            undo = self.make(pos, move)
+            outcome = self.outcome_after(pos, undo)
+            self.unmake(pos, undo)
+            if score(up, outcome) > best_score:
+                best, best_score = outcome, score(up, outcome)
+                if best_score == 4:
+                    break
+        del self.path[key]
+        # Repeating this position is settled here, but repeating one further up only holds on this path
+        if self.repeat >= depth:
+            self.table.put(key, best, self.nodes - start)
+            self.repeat = outer
+        else:
+            self.repeat = min(outer, self.repeat)
+        return best
+
+    # The card a player with nothing to play would end up playing after drawing, PASS if there isn't one, or None if
+    # it would take a reshuffle to find out
+    def drawn_card(self, pos):
+        playable = PLAYABLE[pos.top]
+        draw = pos.draw
+        for i in range(pos.draw_len - 1, -1, -1):
+            if playable >> draw[i] & 1:
+                return draw[i]
+        return None if pos.discard_len else PASS
+
+    # Legal moves for the player up, best guesses first
+    def moves(self, pos):
+        up = pos.player_up
+        hand = pos.hands[up]
+        playable = hand & PLAYABLE[pos.top]
+        if not playable:
+            # Drawing is the only option, so the only choice left is the suit if it's an eight that turns up
+            index = self.drawn_card(pos)
+            if index is None:
+                return []
+            if index == PASS:
+                return [PASS]
+            if index // 4 == 7:
+                return sorted((DRAWN | encode_play(index, 28 + suit) for suit in range(4)),
+                              key=lambda move: -popcount(hand & SUIT_MASKS[SUITS[(move >> 6) % 4]]))
+            return [DRAWN | encode_play(index, index)]
+        # Going out ends the search right away, and any suit will do for an eight
+        if hand == playable & -playable:
+            index = hand.bit_length() - 1
+            return [encode_play(index, index)]
+        next_hand = pos.hands[(up + 1) % 4]
+        ordered = []
+        while playable:
+            low = playable & -playable
+            index = low.bit_length() - 1
+            playable ^= low
+            if low & EIGHTS:
+                for suit in range(4):
+                    code = 28 + suit
+                    # Eights come after everything else, and the suits the player holds the most of come first
+                    ordered.append((2 - (not next_hand & PLAYABLE[code]), -popcount(hand & SUIT_MASKS[SUITS[suit]]),
+                                    encode_play(index, code)))
+            else:
+                # Plays that leave the next player nothing to play on come first
+                ordered.append((0 if not next_hand & PLAYABLE[index] else 1, 0, encode_play(index, index)))
+        ordered.sort()
+        return [move for _, _, move in ordered]
+
+    # Make a move for the player up, updating the hash as it goes. Returns what unmake needs to put it back, led by the
+    # seat that won if the move ended the game
+    def make(self, pos, move):
+        up = pos.player_up
+        hand = pos.hands[up]
+        undo = [None, hand, pos.draw_len, pos.discard_len, pos.top_index, pos.top, pos.key]
+        key = pos.key ^ Z_UP[up]
+        if move < 0 or move & DRAWN:
+            # Draw until the card the move ends with comes up, or the pile runs out for a pass
+            target = move & 63 if move != PASS else -1
+            draw, draw_len, zhand = pos.draw, pos.draw_len, Z_HAND[up]
+            while draw_len:
+                draw_len -= 1
+                index = draw[draw_len]
+                key ^= Z_PILE[index]
+                if index == target:
+                    break
+                hand |= 1 << index
+                key ^= zhand[index]
+            pos.draw_len = draw_len
+        else:
+            index = move & 63
+            hand &= ~(1 << index)
+            key ^= Z_HAND[up][index]
+        if move != PASS:
+            index, code = move & 63, (move >> 6) & 63
+            key ^= Z_TOP_INDEX[pos.top_index] ^ Z_TOP_INDEX[index] ^ Z_TOP_CODE[pos.top] ^ Z_TOP_CODE[code]
+            pos.discard_len += 1
+            pos.top_index, pos.top = index, code
+            if not hand:
+                undo[0] = up
+        pos.hands[up] = hand
+        pos.player_up = (up + 1) % 4
+        pos.key = key ^ Z_UP[pos.player_up]
+        return undo
+
+    def unmake(self, pos, undo):
+        pos.player_up = (pos.player_up - 1) % 4
+        _, pos.hands[pos.player_up], pos.draw_len, pos.discard_len, pos.top_index, pos.top, pos.key = undo
+
+    def rate(self):
+        return self.nodes / self.time if self.time else 0.0
+
+
+# How much seat likes an outcome: a win, then no winner, then a reshuffle (which, for all the search knows, is a win for
+# one player in four), then anybody else winning
+def score(seat, outcome):
+    if outcome == seat:
+        return 4
+    if outcome == NO_WINNER:
+        return 2
+    return 1 if outcome == UNKNOWN else 0
+
+
+# AI player that switches to exact search once few enough cards are left in the hands. It can't see
+# the other hands, so it solves several random deals of the unseen cards and goes with the move that does best across
+# them. Bigger positions, and any that blow the node budget, get the usual AIPlayer moves
+class EndgameAIPlayer(AIPlayer):
+    def __init__(self, player_num, threshold=10, samples=8, max_nodes=50000, rng=None, **kwargs):
+        super().__init__(player_num, verbose=kwargs.get('verbose', False))
+        self.threshold = threshold
+        self.samples = samples
+        self.solver = Solver(max_nodes=max_nodes)
+        self.rng = rng if rng is not None else random.Random()
+        self.pending_suit = None
+
+    def in_endgame(self):
+        table = self.table
+        return sum(player.hand_size() for player in table.players) <= self.threshold
+
+    def sample(self):
+        return Position.from_determinization(determinize(self, self.rng))
+
+    # Total score of each choice across sampled deals, or None if any of them was too big to solve. outcomes_of maps a
+    # position to the outcome of each choice
+    def sampled_scores(self, outcomes_of, choices):
+        totals = [0] * len(choices)
+        try:
+            for _ in range(self.samples):
+                outcomes = outcomes_of(self.sample())
+                for i, choice in enumerate(choices):
+                    totals[i] += score(self.player_num, outcomes[choice])
+        except BudgetExceeded:
+            return None
+        return totals
+
+    def play_card(self, set_message, card_up):
+        if not self.in_endgame():
+            return super().play_card(set_message, card_up)
+        moves = sorted(self.solver.moves(self.sample()))
+        totals = self.sampled_scores(self.solver.move_outcomes, moves)
+        if totals is None:
+            return super().play_card(set_message, card_up)
+        move = moves[totals.index(max(totals))]
+        card = CARDS[move & 63]
+        if card.num_rank == 8:
+            self.pending_suit = SUITS[(move >> 6) % 4]
+        self.remove_card(card)
+        return card
+
+    def choose_suit(self, set_message):
+        if self.pending_suit is not None:
+            suit, self.pending_suit = self.pending_suit, None
+            return suit
+        # An eight that came off the draw pile
+        if self.in_endgame():
+            totals = self.sampled_scores(self.solver.suit_outcomes, range(4))
+            if totals is not None:
+                return SUITS[totals.index(max(totals))]
+        return super().choose_suit(set_message)
+
+
+# Play seeded all-AI games until at most cards cards are left in the hands, and return the positions
+def sample_positions(count, cards, seed):
+    from engine import Engine
+    from tournament import game_rng
+    positions = []
+    game_index = 0
+    while len(positions) < count:
+        engine = Engine(rng=game_rng(seed, game_index))
+        game_index += 1
+        engine.start()
+        while True:
+            pos = Position.from_table(engine)
+            if pos.size() <= cards:
+                positions.append(pos)
+                break
+            if engine.step() is not None:
+                break
+    return positions
+
+
+def describe(move):
+    if move is None:
+        return 'draw into a reshuffle'
+    if move == PASS:
+        return 'pass'
+    card = CARDS[move & 63].declare(SUITS[(move >> 6) % 4]) if (move & 63) // 4 == 7 else CARDS[move & 63]
+    text = f'{card.rank}{card.suit}'
+    return f'draw to {text}' if move & DRAWN else text
+
+
+def play_games(num_games, cards, seed, max_nodes):
+    from engine import Engine
+    from tournament import game_rng
+    player = EndgameAIPlayer(0, threshold=cards, max_nodes=max_nodes, rng=random.Random(seed))
+    players = [player] + [AIPlayer(i, verbose=False) for i in range(1, 4)]
+    wins = [0] * 5
+    for game_index in range(num_games):
+        result = Engine(players, game_rng(seed, game_index)).play()
+        wins[NO_WINNER if result.winner is None else result.winner] += 1
+    solver = player.solver
+    print(f'Games played:       {num_games}')
+    for seat in range(4):
+        print(f'Player {seat + 1} win rate:  {wins[seat] / num_games:7.2%}')
+    print(f'Stalemates:         {wins[NO_WINNER] / num_games:7.2%}')
+    print(f'Nodes/sec:          {solver.rate():.0f}')
+    print(f'Table hit rate:     {solver.table.hit_rate():.2%} of {solver.table.probes} probes')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Solve crazy eights endgames exactly.')
+    parser.add_argument('--positions', type=int, default=20, help='Number of positions to solve')
+    parser.add_argument('--cards', type=int, default=10,
+                        help='Solve once this many cards are left in the hands')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the games the positions come from')
+    parser.add_argument('--table-bits', type=int, default=20, help='Transposition table has 2 * 2^bits entries')
+    parser.add_argument('--max-nodes', type=int, help='Give up on a position after this many nodes')
+    parser.add_argument('--verbose', action='store_true', help='Print every position\'s result')
+    parser.add_argument('--play', type=int, metavar='N',
+                        help='Instead, play N games with the endgame AI (switching at --cards) in seat 1 against the '
+                             'basic AI, and report how it does')
+    args = parser.parse_args()
+    if args.play:
+        play_games(args.play, args.cards, args.seed, args.max_nodes or 50000)
+        return
+
+    solver = Solver(args.table_bits, args.max_nodes)
+    outcomes = {'player up wins': 0, 'another player wins': 0, 'no winner': 0, 'reshuffle first': 0, 'over budget': 0}
+    for i, pos in enumerate(sample_positions(args.positions, args.cards, args.seed)):
+        nodes = solver.nodes
+        try:
+            outcome, move = solver.solve(pos)
+        except BudgetExceeded:
+            outcomes['over budget'] += 1
+            continue
+        if outcome == pos.player_up:
+            outcomes['player up wins'] += 1
+        elif outcome == NO_WINNER:
+            outcomes['no winner'] += 1
+        elif outcome == UNKNOWN:
+            outcomes['reshuffle first'] += 1
+        else:
+            outcomes['another player wins'] += 1
+        if args.verbose:
+            result = {NO_WINNER: 'no winner', UNKNOWN: 'reshuffle first'}.get(outcome, f'player {outcome + 1} wins')
+            print(f'Position {i + 1}: player {pos.player_up + 1} up, {pos.size()} cards, {result}, '
+                  f'best move {describe(move)}, {solver.nodes - nodes} nodes')
+
+    table = solver.table
+    print(f'Positions solved:   {args.positions - outcomes["over budget"]}')
+    for name, count in outcomes.items():
+        print(f'  {name + ":":<20}{count}')
+    print(f'Nodes:              {solver.nodes}')
+    print(f'Nodes/sec:          {solver.rate():.0f}')
+    print(f'Table hit rate:     {table.hit_rate():.2%} of {table.probes} probes')
+    print(f'Table stores:       {table.stores} ({table.evictions} evictions)')
+
+
+if __name__ == '__main__':
+    main()
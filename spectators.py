@@ -0,0 +1,198 @@
+# Spectators for server.py's tables. Everybody watching a table sees it one of five ways: the public view, or over the
+# shoulder of one of the four seats, which adds that seat's hand. Each event is turned into a state delta once per view
+# and encoded once, and those same bytes go to everyone with that view, so the work per event doesn't grow with the
+# number of spectators. A view's deltas go into a ring of the last BACKLOG of them, and each spectator has a task
+# copying from the ring to its socket as fast as the socket takes them, many deltas per write when it's behind. A
+# spectator that falls off the end of the ring skips ahead to a keyframe (the whole state as of now), which is shared
+# by everyone catching up on the same view at the same time.
+#
+# A spectator gets
+#     {"type": "keyframe", "seq": 1, "top": 30, "card": 30, "draw": 23, "discard": 1, "counts": [7, 7, 7, 7], "up": 0,
+#      "turns": 0, "winner": null}
+#     {"type": "delta", "seq": 2, "event": [kind, seat, card, arg], "up": 1, "turns": 1}
+#     {"type": "over", "winner": 2}
+# where a delta has just the fields that changed, and a view over a seat's shoulder adds "hand" (a bitmask of card
+# indices) to keyframes and to deltas that change it. seq counts deltas, so a keyframe with seq n is followed by delta
+# n + 1. top is the code the top card plays as, so a called eight shows up as top changing with card staying the same
+import asyncio
+import json
+from collections import deque
+from itertools import islice
+
+from card import popcount
+from events import DEAL, DRAW, NONE, PLAY, RESHUFFLE, STACK, START, SUIT, TURN, VICTORY
+
+# The public view. Views 0 to 3 are over the shoulder of that seat
+PUBLIC = 4
+VIEWS = 5
+# Deltas kept for each view. A spectator further behind than this gets a keyframe instead
+BACKLOG = 256
+# Bytes a spectator's socket can have waiting before its task stops to let it drain
+WRITE_HIGH_WATER = 1 << 16
+
+
+def encode(message):
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+
+# What the spectators know about a table, kept up to date from its events
+class Mirror:
+    def __init__(self, engine):
+        self.hands = [player.mask for player in engine.players]
+        self.counts = [popcount(hand) for hand in self.hands]
+        cards = engine.discard.cards
+        self.top = cards[-1].code if cards else None
+        self.card = cards[-1].base.index if cards else None
+        self.draw = len(engine.draw.cards)
+        self.discard = len(cards)
+        self.up = engine.player_up
+        self.turns = engine.turns
+        self.winner = None
+
+    # Apply an event. Returns the fields it changed, and the seat whose hand changed (or None)
+    def apply(self, event):
+        kind, seat, card = event.kind, event.seat, event.card
+        if kind == DEAL or kind == DRAW:
+            self.hands[seat] |= 1 << card
+            self.counts[seat] += 1
+            self.draw -= 1
+            return {'counts': self.counts, 'draw': self.draw}, seat
+        if kind == PLAY:
+            self.hands[seat] &= ~(1 << card)
+            self.counts[seat] -= 1
+            self.top = self.card = card
+            self.discard += 1
+            return {'top': self.top, 'card': self.card, 'discard': self.discard, 'counts': self.counts}, seat
+        if kind == TURN:
+            self.up = seat
+            self.turns += 1
+            return {'up': self.up, 'turns': self.turns}, None
+        if kind == SUIT:
+            self.top = 28 + event.arg
+            return {'top': self.top}, None
+        if kind == START:
+            self.top = self.card = card
+            self.draw -= 1
+            self.discard = 1
+            return {'top': self.top, 'card': self.card, 'draw': self.draw, 'discard': self.discard}, None
+        if kind == RESHUFFLE:
+            self.draw, self.discard = self.discard - 1, 1
+            return {'draw': self.draw, 'discard': self.discard}, None
+        if kind == VICTORY:
+            self.winner = seat
+            return {'winner': self.winner}, None
+        return {}, None
+
+    def keyframe(self, view):
+        message = {'top': self.top, 'card': self.card, 'draw': self.draw, 'discard': self.discard,
+                   'counts': self.counts, 'up': self.up, 'turns': self.turns, 'winner': self.winner}
+        if view != PUBLIC:
+            message['hand'] = self.hands[view]
+        return message
+
+
+# One spectator: a task writing whatever its view has that it hasn't sent yet, whenever there's some
+class Watcher:
+    def __init__(self, channel, writer, view):
+        self.channel = channel
+        self.writer = writer
+        self.view = view
+        # seq of the last delta sent, or None if it needs a keyframe
+        self.cursor = None
+        writer.transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self):
+        channel = self.channel
+        try:
+            while not self.writer.transport.is_closing():
+                changed = channel.changed[self.view]
+                data = channel.catch_up(self)
+                if data:
+                    self.writer.write(data)
+                    await self.writer.drain()
+                elif channel.closed:
+                    self.writer.write(channel.over)
+                    return
+                else:
+                    await changed.wait()
+        except ConnectionError:
+            pass
+        finally:
+            channel.watchers[self.view].discard(self)
+
+    def stop(self):
+        self.task.cancel()
+
+
+# Everything going out to one table's spectators
+class Channel:
+    def __init__(self, engine):
+        self.mirror = Mirror(engine)
+        self.seq = 0
+        # The last BACKLOG encoded deltas of each view, ending with delta seq
+        self.logs = [deque(maxlen=BACKLOG) for _ in range(VIEWS)]
+        self.watchers = [set() for _ in range(VIEWS)]
+        # Set (and replaced) whenever a view gets a new delta, to wake its watchers
+        self.changed = [asyncio.Event() for _ in range(VIEWS)]
+        # (seq, encoded keyframe) of each view, made when somebody first needs one
+        self.keyframes = [None] * VIEWS
+        self.closed = False
+        self.over = None
+
+    def watch(self, writer, view=PUBLIC):
+        watcher = Watcher(self, writer, view)
+        self.watchers[view].add(watcher)
+        return watcher
+
+    def publish(self, event):
+        if event.kind == STACK:
+            return
+        changed, seat = self.mirror.apply(event)
+        self.seq += 1
+        public = private = None
+        for view in range(VIEWS):
+            log = self.logs[view]
+            if not self.watchers[view]:
+                # Nobody to send it to. Whoever watches next starts from a keyframe
+                log.clear()
+                continue
+            if view == seat:
+                if private is None:
+                    private = encode({'type': 'delta', 'seq': self.seq, 'event': list(event), **changed,
+                                      'hand': self.mirror.hands[seat]})
+                log.append(private)
+            else:
+                if public is None:
+                    hidden = event.kind == DEAL or event.kind == DRAW
+                    public = encode({'type': 'delta', 'seq': self.seq,
+                                     'event': [event.kind, event.seat, NONE if hidden else event.card, event.arg],
+                                     **changed})
+                log.append(public)
+            self.changed[view].set()
+            self.changed[view] = asyncio.Event()
+
+    # Everything watcher's view has that it hasn't been sent, as one block of bytes: the deltas since its cursor, or a
+    # keyframe if it's never had one or the deltas it needs are gone
+    def catch_up(self, watcher):
+        view = watcher.view
+        log = self.logs[view]
+        first = self.seq - len(log) + 1
+        if watcher.cursor is None or watcher.cursor + 1 < first:
+            watcher.cursor = self.seq
+            if self.keyframes[view] is None or self.keyframes[view][0] != self.seq:
+                self.keyframes[view] = (self.seq, encode({'type': 'keyframe', 'seq': self.seq,
+                                                          **self.mirror.keyframe(view)}))
+            return self.keyframes[view][1]
+        if watcher.cursor == self.seq:
+            return b''
+        data = b''.join(islice(log, watcher.cursor + 1 - first, None))
+        watcher.cursor = self.seq
+        return data
+
+    # The game's over. Watchers send what they have left, then the winner
+    def close(self, winner):
+        self.closed = True
+        self.over = encode({'type': 'over', 'winner': winner})
+        for view in range(VIEWS):
+            self.changed[view].set()
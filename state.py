@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# Game state with make/unmake for look-ahead search. Everything lives in a few ints and lists of ints that apply()
+# changes in place, and undo() puts back from a stack, so exploring a position never means copying a Game, its players,
+# or its Decks. Run it on its own to check that undoing always puts back exactly what was there:
+#     python state.py --check
+import argparse
+import random
+
+from card import CARDS, EIGHTS, PLAYABLE, SUITS
+from rng import GameRandom
+
+# Actions are small ints. A play is (code the card plays as << 6) | card index, so an eight carries the suit it's
+# called as (28 + the suit's position in SUITS) and any other card just plays as itself. Drawing is one card at a time,
+# and the player who drew goes again. Passing is only legal when there's nothing to play and nothing left to draw
+DRAW = -1
+PASS = -2
+
+
+def encode_play(index, code):
+    return code << 6 | index
+
+
+def describe(action):
+    if action == DRAW:
+        return 'draw'
+    if action == PASS:
+        return 'pass'
+    card = CARDS[action & 63]
+    return f'{card.rank}{card.suit}' + (f'→{SUITS[(action >> 6) % 4]}' if card.num_rank == 8 else '')
+
+
+# A position with every card known: hands as masks, and the draw pile and the discard pile (sans the top card) as lists
+# of card indices with the top at the end, like a Deck. The top card is top_index, and top is the code it plays as,
+# which is where an eight's called suit lives. Reshuffles are dealt by a GameRandom and numbered by how many shuffles
+# the game has had, so undoing one and making it again deals the same cards, and a state taken from a seeded table
+# reshuffles exactly like the Engine would
+class GameState:
+    __slots__ = ('hands', 'draw', 'discard', 'top_index', 'top', 'player_up', 'winner', 'rng', 'shuffles', 'stack')
+
+    def __init__(self, hands, draw, discard, top_index, top, player_up, rng=None, shuffles=0):
+        self.hands = list(hands)
+        self.draw = list(draw)
+        self.discard = list(discard)
+        self.top_index = top_index
+        self.top = top
+        self.player_up = player_up
+        # Seat that went out, or None while the game's on
+        self.winner = None
+        self.rng = rng if rng is not None else GameRandom()
+        # Shuffles done so far, counting the deal
+        self.shuffles = shuffles
+        # What undo() needs, pushed a few ints at a time and led (from the end) by the action
+        self.stack = []
+
+    # State of a table (a Game or an Engine). A table dealt by a GameRandom reshuffles with the same one, and so the
+    # same way; any other table gets a fresh one
+    @classmethod
+    def from_table(cls, table):
+        rng, shuffles = GameRandom(), 0
+        if isinstance(table.rng, GameRandom):
+            rng, shuffles = GameRandom(table.rng.seed, table.rng.game_index), table.rng.shuffles
+        top = table.discard.top
+        return cls([player.mask for player in table.players], [card.index for card in table.draw.cards],
+                   [card.base.index for card in table.discard.cards[:-1]], top.base.index, top.code,
+                   table.player_up, rng, shuffles)
+
+    # Everything that makes up the position, as one value that can be compared or hashed
+    def snapshot(self):
+        return (tuple(self.hands), tuple(self.draw), tuple(self.discard), self.top_index, self.top, self.player_up,
+                self.winner, self.shuffles)
+
+    # Actions that can be applied now. Empty once somebody's won
+    def legal_actions(self):
+        if self.winner is not None:
+            return []
+        playable = self.hands[self.player_up] & PLAYABLE[self.top]
+        if not playable:
+            return [DRAW] if self.draw or self.discard else [PASS]
+        actions = []
+        while playable:
+            low = playable & -playable
+            index = low.bit_length() - 1
+            if low & EIGHTS:
+                actions.extend(encode_play(index, 28 + suit) for suit in range(4))
+            else:
+                actions.append(encode_play(index, index))
+            playable ^= low
+        return actions
+
+    # Whether drawing now would reshuffle the discard pile first
+    def reshuffle_due(self):
+        return not self.draw
+
+    # Apply an action for the player up. The action has to be one of legal_actions(); nothing here checks
+    def apply(self, action):
+        up = self.player_up
+        stack = self.stack
+        if action == DRAW:
+            if not self.draw:
+                # The discard pile is shuffled in place, so its old order goes on the stack. This is the only time apply
+                # allocates anything, and it's once per reshuffle
+                stack.append(self.discard[:])
+                self.draw, self.discard = self.discard, self.draw
+                self.rng.shuffles = self.shuffles
+                self.rng.shuffle(self.draw)
+                self.shuffles += 1
+            else:
+                stack.append(None)
+            index = self.draw.pop()
+            self.hands[up] |= 1 << index
+            stack.append(index)
+            stack.append(DRAW)
+            return
+        if action == PASS:
+            # The Engine still reshuffles the empty discard pile, which uses up a shuffle
+            self.shuffles += 1
+        else:
+            index = action & 63
+            stack.append(self.top_index)
+            stack.append(self.top)
+            self.hands[up] &= ~(1 << index)
+            self.discard.append(self.top_index)
+            self.top_index, self.top = index, action >> 6
+            if not self.hands[up]:
+                self.winner = up
+        stack.append(action)
+        self.player_up = (up + 1) % 4
+
+    # Take back the last action applied
+    def undo(self):
+        stack = self.stack
+        action = stack.pop()
+        if action == DRAW:
+            index = stack.pop()
+            reshuffled = stack.pop()
+            self.hands[self.player_up] &= ~(1 << index)
+            self.draw.append(index)
+            if reshuffled is not None:
+                # The draw pile was empty before the reshuffle
+                self.draw, self.discard = self.discard, reshuffled
+                self.shuffles -= 1
+            return
+        self.player_up = up = (self.player_up - 1) % 4
+        if action == PASS:
+            self.shuffles -= 1
+        else:
+            self.top = stack.pop()
+            self.top_index = stack.pop()
+            self.hands[up] |= 1 << (action & 63)
+            self.discard.pop()
+            self.winner = None
+
+
+# Random walks from seeded deals: apply random legal actions, and now and then undo a random number of them, making sure
+# every undo gets back the exact state from before. Half the time the same actions are then made again, which has to
+# land on the same states as the first time, reshuffles included. Returns how many undos were checked, and how many
+# of the actions applied were reshuffles and passes
+def check(games=200, seed=0, steps=400):
+    from engine import Engine
+    rng = random.Random(seed)
+    checked = reshuffles = passes = 0
+
+    def expect(state, snapshot, game_index):
+        if state.snapshot() != snapshot:
+            raise AssertionError(f'game {game_index} of seed {seed}: {state.snapshot()} != {snapshot}')
+
+    for game_index in range(games):
+        engine = Engine(rng=GameRandom(seed, game_index))
+        engine.start()
+        # Start some walks partway through a game, where reshuffles come up sooner
+        for _ in range(rng.randrange(60)):
+            if engine.step() is not None:
+                break
+        state = GameState.from_table(engine)
+        if any(not hand for hand in state.hands):
+            continue
+        # Passes only come up with every card but the top one in somebody's hand, which real games almost never get to,
+        # so every fourth walk starts from there
+        if game_index % 4 == 3:
+            for i, index in enumerate(state.draw + state.discard):
+                state.hands[i % 4] |= 1 << index
+            state.draw, state.discard = [], []
+        history = [state.snapshot()]
+        actions = []
+        for _ in range(steps):
+            legal = state.legal_actions()
+            if legal and rng.random() < 0.8:
+                actions.append(rng.choice(legal))
+                reshuffles += actions[-1] == DRAW and state.reshuffle_due()
+                passes += actions[-1] == PASS
+                state.apply(actions[-1])
+                history.append(state.snapshot())
+            elif actions:
+                count = rng.randint(1, len(actions))
+                for i in range(count):
+                    state.undo()
+                    checked += 1
+                    expect(state, history[-2 - i], game_index)
+                if rng.random() < 0.5:
+                    for i in range(count, 0, -1):
+                        state.apply(actions[-i])
+                        expect(state, history[-i], game_index)
+                else:
+                    del actions[-count:], history[-count:]
+        while actions:
+            state.undo()
+            actions.pop()
+            history.pop()
+            checked += 1
+            expect(state, history[-1], game_index)
+        if state.stack:
+            raise AssertionError(f'game {game_index} of seed {seed}: undo stack not empty after undoing everything')
+    return checked, reshuffles, passes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that undoing actions puts the game state back exactly.')
+    parser.add_argument('--check', action='store_true', help='Run the apply/undo property check')
+    parser.add_argument('--games', type=int, default=200, help='Games to walk (default 200)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if not args.check:
+        parser.error('nothing to do (try --check)')
+    checked, reshuffles, passes = check(args.games, args.seed)
+    print(f'{checked} undos checked ({reshuffles} reshuffles and {passes} passes applied), '
+          'all restored the exact state')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+# The modules live at the top of the repository, so make them importable whichever way pytest is run
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
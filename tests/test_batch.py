@@ -0,0 +1,13 @@
+# The numpy batch simulator has to play exactly the same games as the engine, game for game
+import pytest
+
+pytest.importorskip('numpy')
+
+from benchmarks.bench_batch import as_tuple, run_batch, run_engine  # noqa: E402
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_batch_matches_engine(seed):
+    # A batch size that doesn't divide the games, so a short last batch is played too
+    expected = [as_tuple(result) for result in run_engine(seed, 300)]
+    assert [as_tuple(result) for result in run_batch(seed, 300, 128)] == expected
@@ -0,0 +1,8 @@
+# The compact table store has to play every game exactly like the Engine: straight through, from a materialized
+# midpoint, and with a listener hearing the same events
+from compact import check
+
+
+def test_store_matches_engine():
+    mismatches, _, _ = check(300, seed=0)
+    assert mismatches == 0
@@ -0,0 +1,19 @@
+# Humans who never answer have the AI play for them, so their games come out just like the AI's own
+import pytest
+
+from inputs import ScriptedInput, check
+
+
+def test_silent_humans_play_like_the_ai():
+    mismatches, _ = check(20, seed=0)
+    assert mismatches == 0
+
+
+def test_scripted_input():
+    lines = ScriptedInput(['a', None, 'b'])
+    assert lines.read_line() == 'a'
+    # A player who doesn't answer times out, or is skipped over by a read without a clock
+    assert lines.read_line(timeout=1) is None
+    assert lines.read_line() == 'b'
+    with pytest.raises(EOFError):
+        lines.read_line()
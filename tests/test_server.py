@@ -0,0 +1,70 @@
+# Asking a client for a move, and seating clients
+import asyncio
+import json
+
+from compact import TableStore
+from server import LINE_LIMIT, Server, Table
+
+
+# Stands in for a Connection: a move queue, and the messages sent to the client
+class Client:
+    def __init__(self):
+        self.moves = asyncio.Queue()
+        self.closed = False
+        self.asking = None
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+
+def ask(client, answers):
+    async def run():
+        table = Table('test', 1, TableStore(0), 0, None)
+        task = asyncio.ensure_future(table.ask(client, 'play', {'type': 'turn'}, lambda move: True))
+        await asyncio.sleep(0)
+        for answer in answers:
+            client.moves.put_nowait(answer)
+        return await task
+    return asyncio.run(run())
+
+
+# A second play sent for the last turn is still queued when the next turn comes, and mustn't answer it
+def test_ask_ignores_moves_sent_before_it():
+    client = Client()
+    client.moves.put_nowait({'type': 'play', 'card': 1})
+    assert ask(client, [{'type': 'play', 'card': 2}]) == {'type': 'play', 'card': 2}
+    assert client.sent == [{'type': 'turn'}] and client.asking is None
+
+
+def test_ask_after_close():
+    client = Client()
+    client.closed = True
+    client.moves.put_nowait(None)
+    assert ask(client, []) is None and client.sent == []
+
+
+# Join messages sent one client each, and the first reply each one gets
+def join_replies(joins):
+    async def run():
+        server = Server(0)
+        listener = await asyncio.start_server(server.handle, '127.0.0.1', 0, limit=LINE_LIMIT)
+        port = listener.sockets[0].getsockname()[1]
+        replies, writers = [], []
+        for join in joins:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writers.append(writer)
+            writer.write((json.dumps(dict(join, type='join')) + '\n').encode())
+            replies.append(json.loads(await reader.readline()))
+        for writer in writers:
+            writer.close()
+        listener.close()
+        return replies
+    return asyncio.run(run())
+
+
+def test_join_checks_humans():
+    replies = join_replies([{'table': 'friday', 'humans': 3}, {'table': 'friday', 'humans': 2},
+                            {'table': 'friday'}, {'table': 'friday', 'humans': 3}])
+    assert [reply['type'] for reply in replies] == ['seated', 'error', 'seated', 'seated']
+    assert [reply.get('seat') for reply in replies] == [0, None, 1, 2]
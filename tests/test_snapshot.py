@@ -0,0 +1,63 @@
+# A game resumed from a checkpoint has to carry on exactly as if it had never stopped, reshuffles and turn count included
+import contextlib
+import io
+from itertools import repeat
+
+import pytest
+
+from engine import Engine
+from events import TURN
+from game import Game
+from inputs import ScriptedInput
+from rng import GameRandom
+
+
+class Stop(Exception):
+    pass
+
+
+# A one-human Game of seed 0 where the human never answers, so the AI plays every seat
+def quiet_game():
+    game = Game(1)
+    game.max_turns = Engine.MAX_TURNS
+    game.input = ScriptedInput(repeat(None))
+    game.turn_time = game.auto_advance = 30
+    game.renderer.stream = io.StringIO()
+    return game
+
+
+def play(game):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return game.play()
+
+
+# Game indexes whose games reshuffle after the checkpoint at turn 30
+@pytest.mark.parametrize('game_index', [10, 12, 14])
+def test_resume_plays_the_same_game(game_index, tmp_path):
+    path = str(tmp_path / 'game.snap')
+    game = quiet_game()
+    game.rng = GameRandom(0, game_index)
+    expected = play(game)
+
+    game = quiet_game()
+    game.rng = GameRandom(0, game_index)
+    game.save_path = path
+
+    # Stop the game after the checkpoint at the start of turn 30
+    def stop(event):
+        if event.kind == TURN and game.turns == 30:
+            raise Stop
+    game.subscribe(stop)
+    with pytest.raises(Stop):
+        play(game)
+    reshuffles = game.reshuffles
+
+    resumed = Game.load(path)
+    resumed.max_turns = Engine.MAX_TURNS
+    resumed.input = ScriptedInput(repeat(None))
+    resumed.turn_time = resumed.auto_advance = 30
+    resumed.renderer.stream = io.StringIO()
+    assert resumed.turns == 29
+    result = play(resumed)
+    assert (result.winner, result.turns) == (expected.winner, expected.turns)
+    assert resumed.rng.shuffles - 1 == expected.reshuffles and expected.reshuffles > reshuffles
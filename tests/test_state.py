@@ -0,0 +1,51 @@
+# Undoing an action has to put the state back exactly, whatever the action was
+import random
+
+from card import CARDS
+from state import PASS, GameState, check
+
+
+def test_undo_restores_state():
+    checked, reshuffles, passes = check(games=60, seed=0)
+    assert checked and reshuffles
+
+
+# Every card in a hand but the top card, the ace of clubs, and nothing in the first hand that plays on it. Random walks
+# almost never get here, so the pass is set up rather than waited for
+def passing_state():
+    top = 0
+    stuck = [card.index for card in CARDS if card.suit != CARDS[top].suit and card.num_rank not in (1, 8)][:10]
+    rest = [card.index for card in CARDS if card.index != top and card.index not in stuck]
+    hands = [sum(1 << index for index in stuck)] + [sum(1 << index for index in rest[seat::3]) for seat in range(3)]
+    return GameState(hands, [], [], top, CARDS[top].code, 0)
+
+
+def test_pass_undo():
+    state = passing_state()
+    before = state.snapshot()
+    assert state.legal_actions() == [PASS]
+    state.apply(PASS)
+    assert state.player_up == 1 and state.snapshot() != before
+    state.undo()
+    assert state.snapshot() == before and not state.stack
+
+
+# Walk on from the pass, undoing back to it one action at a time
+def test_walk_through_pass():
+    rng = random.Random(0)
+    for _ in range(20):
+        state = passing_state()
+        history = [state.snapshot()]
+        actions = 0
+        while actions < 40:
+            legal = state.legal_actions()
+            if not legal:
+                break
+            state.apply(rng.choice(legal))
+            history.append(state.snapshot())
+            actions += 1
+        for snapshot in reversed(history[:-1]):
+            state.undo()
+            assert state.snapshot() == snapshot
+        assert not state.stack
+
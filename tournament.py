@@ -0,0 +1,134 @@
+import random
+import sys
+from multiprocessing import Pool
+from time import perf_counter
+
+from engine import Engine
+from ismcts import SearchAIPlayer
+from player import AIPlayer
+from rng import GameRandom
+
+# Number of games handed to a worker at a time
+CHUNK_SIZE = 500
+
+
+# Running totals for a batch of simulated games. Only sums are kept, so memory use doesn't grow with the number of games
+class Stats:
+    def __init__(self):
+        self.games = 0
+        self.wins = [0, 0, 0, 0]
+        self.stalemates = 0
+        self.turns = 0
+        self.cards_drawn = 0
+        self.reshuffles = 0
+        self.games_reshuffled = 0
+        # Totals across search AI players, for reporting playouts/sec
+        self.playouts = 0
+        self.search_time = 0.0
+
+    def add_result(self, result):
+        self.games += 1
+        if result.winner is None:
+            self.stalemates += 1
+        else:
+            self.wins[result.winner] += 1
+        self.turns += result.turns
+        self.cards_drawn += result.cards_drawn
+        self.reshuffles += result.reshuffles
+        if result.reshuffles > 0:
+            self.games_reshuffled += 1
+
+    def merge(self, other):
+        self.games += other.games
+        for i in range(4):
+            self.wins[i] += other.wins[i]
+        self.stalemates += other.stalemates
+        self.turns += other.turns
+        self.cards_drawn += other.cards_drawn
+        self.reshuffles += other.reshuffles
+        self.games_reshuffled += other.games_reshuffled
+        self.playouts += other.playouts
+        self.search_time += other.search_time
+
+    def summary(self, elapsed):
+        games = max(self.games, 1)
+        lines = [f'Games played:       {self.games}']
+        for i in range(4):
+            lines.append(f'Player {i + 1} win rate:  {self.wins[i] / games:7.2%}')
+        lines.append(f'Stalemates:         {self.stalemates / games:7.2%}')
+        lines.append(f'Average turns:      {self.turns / games:.2f}')
+        lines.append(f'Average draws:      {self.cards_drawn / games:.2f}')
+        lines.append(f'Reshuffles/game:    {self.reshuffles / games:.4f}')
+        lines.append(f'Games reshuffled:   {self.games_reshuffled / games:7.2%}')
+        if self.search_time:
+            lines.append(f'Search playouts:    {self.playouts / self.search_time:.0f} playouts/sec')
+        lines.append(f'Throughput:         {self.games / max(elapsed, 1e-9):.0f} games/sec')
+        return '\n'.join(lines)
+
+
+# Each game gets its own generator keyed by (seed, game number), so results don't depend on how games are split up, and
+# any one game can be played again without playing the ones before it
+def game_rng(seed, game_index):
+    return GameRandom(seed, game_index)
+
+
+# Per-process set of AI players, reused for every game the worker plays
+_players = None
+
+
+# search_seats are the seats (0-3) that get a SearchAIPlayer, built with search_options
+def _init_worker(search_seats=(), search_options=None):
+    global _players
+    _players = [SearchAIPlayer(i, **(search_options or {})) if i in search_seats else AIPlayer(i, verbose=False)
+                for i in range(4)]
+
+
+# Play games [start, stop) and return their combined stats
+def play_chunk(seed, start, stop):
+    stats = Stats()
+    searchers = [player for player in _players if isinstance(player, SearchAIPlayer)]
+    for game_index in range(start, stop):
+        # Search players get their own stream, so their random choices don't depend on which worker plays the game
+        for player in searchers:
+            player.rng = random.Random(f'search-{seed}-{game_index}-{player.player_num}')
+        stats.add_result(Engine(_players, game_rng(seed, game_index)).play())
+    for player in searchers:
+        stats.playouts += player.playouts
+        stats.search_time += player.search_time
+        player.playouts, player.search_time = 0, 0.0
+    return stats
+
+
+def _play_chunk(args):
+    return play_chunk(*args)
+
+
+# Play num_games all-AI games over a pool of jobs processes, printing progress as chunks come back. The games are numbers
+# start to start + num_games - 1 of seed, so separate runs can cover separate ranges of the same seed
+def simulate(num_games, jobs=1, seed=0, out=sys.stdout, progress_interval=1.0, search_seats=(), search_options=None,
+             start=0):
+    stats = Stats()
+    start_time = last_report = perf_counter()
+
+    def report(partial):
+        nonlocal last_report
+        stats.merge(partial)
+        now = perf_counter()
+        if now - last_report >= progress_interval:
+            last_report = now
+            out.write(f'{stats.games}/{num_games} games ({stats.games / (now - start_time):.0f} games/sec)\n')
+            out.flush()
+
+    # Chunks are generated lazily so a multi-million game run doesn't build its whole work list in memory
+    stop = start + num_games
+    chunks = ((seed, first, min(first + CHUNK_SIZE, stop)) for first in range(start, stop, CHUNK_SIZE))
+    if jobs > 1:
+        with Pool(jobs, initializer=_init_worker, initargs=(search_seats, search_options)) as pool:
+            for partial in pool.imap_unordered(_play_chunk, chunks):
+                report(partial)
+    else:
+        _init_worker(search_seats, search_options)
+        for chunk in chunks:
+            report(play_chunk(*chunk))
+    out.write(stats.summary(perf_counter() - start_time) + '\n')
+    return stats
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+import argparse
+import sys
+from math import log, sqrt
+from multiprocessing import Pool, cpu_count
+from statistics import NormalDist
+from time import perf_counter
+
+from card import CARDS, EIGHTS, PLAYABLE, SUIT_MASKS, SUITS, popcount
+from engine import Engine
+from player import AIPlayer
+from tournament import game_rng
+
+# Bitmasks of the four cards of each rank, by index // 4
+RANK_MASKS = [0b1111 << 4 * rank for rank in range(13)]
+
+
+# AIPlayer with its heuristics turned into numbers. With every parameter at its default it plays exactly like AIPlayer
+class TunableAIPlayer(AIPlayer):
+    DEFAULTS = {
+        # Eights are saved for when nothing else plays until the hand is down to this many cards
+        'hold_eights': 0,
+        # Preference for playing a card whose suit the rest of the hand has plenty of, so there's something to follow
+        'suit_weight': 0.0,
+        # Preference for playing a card whose rank the rest of the hand still holds, to keep a way to change suits
+        'rank_weight': 0.0,
+        # When calling a suit, how much each card of it already played counts against it (fewer left for the others)
+        'call_seen_weight': 0.0,
+    }
+
+    def __init__(self, player_num, params=None, **kwargs):
+        super().__init__(player_num, verbose=kwargs.get('verbose', False))
+        self.params = dict(self.DEFAULTS, **(params or {}))
+        self.hold_eights = self.params['hold_eights']
+        self.suit_weight = self.params['suit_weight']
+        self.rank_weight = self.params['rank_weight']
+        self.call_seen_weight = self.params['call_seen_weight']
+
+    def play_card(self, set_message, card_up):
+        playable = self.mask & PLAYABLE[card_up.code]
+        if playable & ~EIGHTS and popcount(self.mask) > self.hold_eights:
+            playable &= ~EIGHTS
+        if self.suit_weight or self.rank_weight:
+            best, best_score = None, None
+            while playable:
+                low = playable & -playable
+                playable ^= low
+                index = low.bit_length() - 1
+                rest = self.mask ^ low
+                score = (self.suit_weight * popcount(rest & SUIT_MASKS[SUITS[index % 4]]) +
+                         self.rank_weight * popcount(rest & RANK_MASKS[index // 4]))
+                # Ties go to the lowest card, like AIPlayer
+                if best_score is None or score > best_score:
+                    best, best_score = low, score
+            low = best
+        else:
+            low = playable & -playable
+        self.mask ^= low
+        return CARDS[low.bit_length() - 1]
+
+    def choose_suit(self, set_message):
+        if not self.call_seen_weight:
+            return super().choose_suit(set_message)
+        seen = {suit: 0 for suit in SUITS}
+        for card in self.table.discard.cards:
+            seen[card.base.suit] += 1
+        return max('cdhs', key=lambda suit: popcount(self.mask & SUIT_MASKS[suit]) - self.call_seen_weight * seen[suit])
+
+
+# Sequential probability ratio test on the per-pair differences in wins (each -1, 0, or 1) between a candidate and the
+# baseline. H0 is that the candidate is no better, H1 that it wins delta more often. The differences are treated as
+# normal with the variance estimated from the data so far (a generalized SPRT), which is what makes it work for
+# three-valued outcomes. Stops as soon as the log-likelihood ratio crosses either bound, which for a clear difference
+# (or a clear lack of one) takes far fewer games than a fixed-size test with the same error rates
+class SPRT:
+    def __init__(self, delta, alpha=0.05, beta=0.05):
+        self.delta = delta
+        self.alpha = alpha
+        self.beta = beta
+        self.lower = log(beta / (1 - alpha))
+        self.upper = log((1 - beta) / alpha)
+        self.n = 0
+        self.total = 0
+        self.total_sq = 0
+
+    def add(self, difference):
+        self.n += 1
+        self.total += difference
+        self.total_sq += difference * difference
+
+    def mean(self):
+        return self.total / self.n if self.n else 0.0
+
+    def variance(self):
+        return self.total_sq / self.n - self.mean() ** 2 if self.n else 0.0
+
+    def llr(self):
+        variance = self.variance()
+        if self.n < 2 or variance <= 0:
+            return 0.0
+        return self.n * self.delta * (2 * self.mean() - self.delta) / (2 * variance)
+
+    # 'H1' (the candidate is better), 'H0' (it isn't), or None to keep going
+    def decision(self):
+        llr = self.llr()
+        if llr >= self.upper:
+            return 'H1'
+        if llr <= self.lower:
+            return 'H0'
+        return None
+
+    # Pairs a fixed-size one-sided test would need for the same error rates at the same variance
+    def fixed_pairs(self):
+        z = NormalDist().inv_cdf(1 - self.alpha) + NormalDist().inv_cdf(1 - self.beta)
+        return int((z * sqrt(self.variance()) / self.delta) ** 2) + 1
+
+
+# Play pairs [start, stop) of seed. Pair i is deal i played twice, once with the candidate in seat i % 4 and the baseline
+# everywhere else, and once with the baseline in every seat, so the luck of the deal cancels out and every seat gets its
+# turn. The all-baseline game only depends on the deal, so it's skipped when its winner is already known. Returns
+# whether the candidate won each pair's first game, and the winners of the all-baseline games it played (None if it
+# didn't play them)
+def play_pairs(seed, start, stop, candidate, baseline, play_baseline=True):
+    candidate_wins = []
+    baseline_winners = [] if play_baseline else None
+    baselines = [TunableAIPlayer(seat, baseline) for seat in range(4)]
+    candidates = [TunableAIPlayer(seat, candidate) for seat in range(4)]
+    for pair in range(start, stop):
+        seat = pair % 4
+        players = baselines[:seat] + [candidates[seat]] + baselines[seat + 1:]
+        candidate_wins.append(Engine(players, game_rng(seed, pair)).play().winner == seat)
+        if play_baseline:
+            baseline_winners.append(Engine(baselines, game_rng(seed, pair)).play().winner)
+    return candidate_wins, baseline_winners
+
+
+def _play_pairs(args):
+    return args[0], play_pairs(*args[1:])
+
+
+# Test candidate against baseline, batch pairs at a time over jobs processes, until the SPRT decides or max_pairs pairs
+# have been played. baseline_winners caches the all-baseline games by pair, so testing several candidates in a row only
+# plays those games once. Batches are taken in order, so where the test stops doesn't depend on jobs
+def run_test(candidate, baseline, sprt, seed=0, jobs=1, batch=200, max_pairs=100000, baseline_winners=None):
+    baseline_winners = baseline_winners if baseline_winners is not None else []
+    games = 0
+    tasks = ((start, seed, start, min(start + batch, max_pairs), candidate, baseline, start >= len(baseline_winners))
+             for start in range(0, max_pairs, batch))
+    pool = Pool(jobs) if jobs > 1 else None
+    try:
+        results = pool.imap(_play_pairs, tasks) if pool else map(_play_pairs, tasks)
+        for start, (candidate_wins, winners) in results:
+            games += len(candidate_wins)
+            if winners is not None:
+                games += len(winners)
+                if start == len(baseline_winners):
+                    baseline_winners.extend(winners)
+            else:
+                winners = baseline_winners[start:start + len(candidate_wins)]
+            for pair, (won, winner) in enumerate(zip(candidate_wins, winners), start):
+                sprt.add(int(won) - int(winner == pair % 4))
+            if sprt.decision() is not None:
+                break
+    finally:
+        if pool:
+            pool.terminate()
+    return games
+
+
+# Parse 'name=value' strings into a parameter dict for TunableAIPlayer
+def parse_params(specs):
+    params = {}
+    for spec in specs:
+        name, _, value = spec.partition('=')
+        if name not in TunableAIPlayer.DEFAULTS or not value:
+            raise ValueError(f'expected one of {", ".join(TunableAIPlayer.DEFAULTS)} as name=value, not {spec!r}')
+        number = float(value)
+        # The whole-number parameters are counts of cards
+        if isinstance(TunableAIPlayer.DEFAULTS[name], int):
+            if not number.is_integer() or number < 0:
+                raise ValueError(f'{name} is a number of cards, so it takes a whole number 0 or more, not {value!r}')
+            number = int(number)
+        params[name] = number
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune the AI by self-play, stopping each test as soon as it\'s decided.')
+    parser.add_argument('--candidate', nargs='+', action='append', required=True, metavar='NAME=VALUE',
+                        help='Parameters for a candidate AI. Repeat to test several candidates in turn. Parameters: '
+                             + ', '.join(f'{name} (default {value})' for name, value in TunableAIPlayer.DEFAULTS.items()))
+    parser.add_argument('--baseline', nargs='*', default=[], metavar='NAME=VALUE',
+                        help='Parameters for the baseline AI (default: the plain AI)')
+    parser.add_argument('--delta', type=float, default=0.02,
+                        help='Improvement in win rate the test looks for (default 0.02)')
+    parser.add_argument('--alpha', type=float, default=0.05, help='False positive rate (default 0.05)')
+    parser.add_argument('--beta', type=float, default=0.05, help='False negative rate (default 0.05)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the deals')
+    parser.add_argument('--jobs', type=int, default=cpu_count() or 1, help='Worker processes (default: all cores)')
+    parser.add_argument('--batch', type=int, default=200, help='Pairs per batch handed to a worker')
+    parser.add_argument('--max-pairs', type=int, default=100000, help='Give up on a test after this many pairs')
+    args = parser.parse_args()
+    try:
+        baseline = parse_params(args.baseline)
+        candidates = [parse_params(specs) for specs in args.candidate]
+    except ValueError as error:
+        parser.error(str(error))
+
+    baseline_winners = []
+    for candidate in candidates:
+        sprt = SPRT(args.delta, args.alpha, args.beta)
+        start = perf_counter()
+        games = run_test(candidate, baseline, sprt, args.seed, max(args.jobs, 1), args.batch, args.max_pairs,
+                         baseline_winners)
+        elapsed = perf_counter() - start
+        decision = sprt.decision()
+        fixed = sprt.fixed_pairs()
+        error = 1.96 * sqrt(sprt.variance() / max(sprt.n, 1))
+        print(' '.join(f'{name}={value}' for name, value in candidate.items()) or 'defaults')
+        print(f'  Result:           {"better" if decision == "H1" else "not better" if decision == "H0" else "undecided"}'
+              f' (LLR {sprt.llr():.2f}, bounds {sprt.lower:.2f} to {sprt.upper:.2f})')
+        print(f'  Win rate change:  {sprt.mean():+.2%} ± {error:.2%}')
+        print(f'  Pairs used:       {sprt.n} ({games} games played, {elapsed:.1f} sec)')
+        print(f'  Fixed-N test:     {fixed} pairs ({2 * fixed} games) for the same error rates')
+        print(f'  Games saved:      {1 - sprt.n / fixed:.0%}' if sprt.n < fixed else
+              '  Games saved:      none')
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()